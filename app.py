@@ -1,20 +1,67 @@
-from flask import Flask
+from flask import Flask, Response, g, request
 from flask_cors import CORS
-import os
+import logging
+import time
 
-from webserver import endpoints
+from usecases.model_registry import model_registry, YOLO_MODEL
+from usecases.inference_pool import inference_pool
+from usecases.metrics import metrics, request_seconds, requests_total
+from utilities.constants import warm_models_on_startup
 
-app = Flask(__name__)
-CORS(app)
+logging.basicConfig(level=logging.INFO)
 
 
-# Register Blueprints for endpoints and Swagger UI
-app.register_blueprint(endpoints.swagger_ui_blueprint)
-app.register_blueprint(endpoints.blueprint)
+def create_app(sync_face_index: bool = True) -> Flask:
+    """Build the Flask app; `sync_face_index` warms the face index and starts the change feed.
+
+    Spawned worker processes (inference pool, enrollment pool) re-import this
+    module as __main__, so everything with side effects - the database
+    connection and migrations, index warm-up, model loading - happens here
+    rather than at import time.
+    """
+    from webserver import endpoints
+
+    app = Flask(__name__)
+    CORS(app)
+
+    # Register Blueprints for endpoints and Swagger UI
+    app.register_blueprint(endpoints.swagger_ui_blueprint)
+    app.register_blueprint(endpoints.blueprint)
+
+    if sync_face_index:
+        endpoints.start_face_index_sync()
+
+    # Load and warm the shared models before the first request arrives
+    if warm_models_on_startup:
+        model_registry.warmup(YOLO_MODEL)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        # Label by route pattern, not raw path, to keep the series count bounded
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = str(response.status_code)
+        requests_total.inc(endpoint, request.method, status)
+        if 'request_start' in g:
+            request_seconds.observe(time.perf_counter() - g.request_start, endpoint, request.method, status)
+        return response
+
+    @app.route("/check-alive")
+    def check_status():
+        return "I am here"
+
+    @app.route("/metrics")
+    def get_metrics():
+        """Prometheus scrape endpoint"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
 
-@app.route("/check-alive")
-def check_status():
-    return "I am here"
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8080)
\ No newline at end of file
+    if inference_pool.enabled:
+        inference_pool.start()
+    create_app().run(host="0.0.0.0", port=8080)
@@ -0,0 +1,347 @@
+"""Latency benchmarks for the recognition pipeline, stage by stage and end to end.
+
+Each stage is timed over warm iterations and reported as p50/p95/p99
+latency, throughput and the growth in peak RSS. Results are written to
+benchmarks/results/<timestamp>.json so two runs can be compared:
+
+    python -m benchmarks.run_benchmarks --people 1000,10000,100000 --image faces/alice.jpg
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/20241020-101500.json
+
+Stages whose dependencies are missing (OpenCV, face_recognition,
+ultralytics, a Postgres server) are recorded as skipped rather than
+failing the run. The face_match stage calls FaceDatabase.find_similar_face
+over synthetic people held in memory, without a database. The endpoint
+stage drives /live_detection through the Flask test client, with the LLM
+replaced by the local stub server and known faces held in the in-memory
+index; importing the app connects to (and migrates) the configured
+database, so it only runs with --db.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import ExitStack
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+STAGES = ['decode', 'face_encode', 'face_match', 'face_match_pgvector', 'yolo', 'live_detection']
+
+
+class SkipStage(Exception):
+    """Raised when a stage cannot run in this environment"""
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int) -> Dict:
+    """Time `fn` after warming it up and summarize the latency distribution"""
+    for _ in range(warmup):
+        fn()
+    rss_before = peak_rss_bytes()
+    samples = np.empty(iterations)
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - t0
+    total = time.perf_counter() - start
+    samples_ms = samples * 1000
+    return {
+        'iterations': iterations,
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p95_ms': float(np.percentile(samples_ms, 95)),
+        'p99_ms': float(np.percentile(samples_ms, 99)),
+        'mean_ms': float(samples_ms.mean()),
+        'throughput_per_s': iterations / total if total > 0 else None,
+        'peak_rss_growth_bytes': peak_rss_bytes() - rss_before
+    }
+
+
+def synthetic_embeddings(count: int, rng: np.random.Generator) -> np.ndarray:
+    """Random unit-scale vectors shaped like face_recognition encodings"""
+    embeddings = rng.normal(0, 0.1, size=(count, 128))
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True) * 0.9
+
+
+def synthetic_face_index(count: int, rng: np.random.Generator):
+    """A resident FaceIndex holding `count` synthetic people"""
+    from usecases.face_index import FaceIndex
+
+    face_index = FaceIndex()
+    metadata = [{'first_name': f'Person{i}', 'last_name': 'Synthetic', 'relationship': 'friend', 'notes': ''}
+                for i in range(count)]
+    face_index.load(list(range(1, count + 1)), synthetic_embeddings(count, rng), metadata)
+    return face_index
+
+
+def synthetic_face_database(count: int, rng: np.random.Generator, patients: int = 100):
+    """A FaceDatabase serving `count` synthetic people from memory instead of Postgres.
+
+    Lookups take the service's path - index locking, patient shards, the
+    configured quantization and its exact re-rank - with loaders that read
+    the synthetic rows.
+    """
+    from usecases.face_database import FaceDatabase
+    from usecases.quantized_face_index import make_face_index
+    from usecases.sharded_face_index import ShardedFaceIndex
+
+    ids = np.arange(1, count + 1)
+    embeddings = synthetic_embeddings(count, rng).astype(np.float32)
+    patient_ids = ids % patients
+    metadata = [{'first_name': f'Person{i}', 'last_name': 'Synthetic', 'relationship': 'friend', 'notes': ''}
+                for i in range(count)]
+
+    def load_exact_embeddings(person_ids: List[int]) -> np.ndarray:
+        return embeddings[np.asarray(person_ids) - 1]
+
+    def load_patient_faces(patient_id: int):
+        rows = np.flatnonzero(patient_ids == patient_id)
+        return ids[rows].tolist(), embeddings[rows], [metadata[row] for row in rows]
+
+    # Bypass __init__, which opens the connection pool and runs migrations
+    face_db = FaceDatabase.__new__(FaceDatabase)
+    face_db.face_index = make_face_index(rerank_loader=load_exact_embeddings)
+    face_db.face_index.load(ids.tolist(), embeddings, metadata)
+    face_db.patient_shards = ShardedFaceIndex(load_patient_faces)
+    return face_db
+
+
+def load_jpeg(image_path: Optional[str]) -> bytes:
+    """The given image, or a synthetic 640x480 JPEG when none is given"""
+    if image_path:
+        with open(image_path, 'rb') as f:
+            return f.read()
+    try:
+        import cv2
+    except ImportError as e:
+        raise SkipStage(f'no --image and OpenCV unavailable: {e}')
+    frame = np.random.default_rng(0).integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+
+def bench_decode(args, rng) -> Dict:
+    try:
+        from usecases.live_detection import decode_frame
+    except ImportError as e:
+        raise SkipStage(str(e))
+    frame_b64 = base64.b64encode(load_jpeg(args.image)).decode('ascii')
+    return measure(lambda: decode_frame(frame_b64), args.iterations, args.warmup)
+
+
+def bench_face_encode(args, rng) -> Dict:
+    if not args.image:
+        raise SkipStage('needs --image with a face')
+    try:
+        from usecases.face_identification import add_person_from_image
+    except ImportError as e:
+        raise SkipStage(str(e))
+    image_bytes = load_jpeg(args.image)
+    return measure(lambda: add_person_from_image(image_bytes), args.iterations, args.warmup)
+
+
+def bench_face_match(args, rng) -> Dict:
+    """FaceDatabase.find_similar_face on the in-memory backend, over everyone and within one patient"""
+    from utilities.constants import face_search_backend
+    if face_search_backend != 'memory':
+        raise SkipStage(f'FACE_SEARCH_BACKEND is {face_search_backend}; see face_match_pgvector')
+    results = {}
+    for count in args.people:
+        face_db = synthetic_face_database(count, rng)
+        queries = synthetic_embeddings(64, rng)
+        for label, patient_id in (('', None), ('_one_patient', 1)):
+            state = {'i': 0}
+
+            def query():
+                state['i'] += 1
+                return face_db.find_similar_face(queries[state['i'] % len(queries)], threshold=0.55,
+                                                 patient_id=patient_id)
+
+            results[f'{count}_people{label}'] = measure(query, args.iterations, args.warmup)
+    return results
+
+
+def bench_face_match_pgvector(args, rng) -> Dict:
+    """find_similar_face_pgvector against the configured Postgres (seed it with usecases.ann_recall_check)"""
+    if not args.db:
+        raise SkipStage('needs --db and a reachable Postgres')
+    from usecases.face_database import FaceDatabase
+
+    face_db = FaceDatabase()
+    queries = synthetic_embeddings(64, rng)
+    state = {'i': 0}
+
+    def query():
+        state['i'] += 1
+        return face_db.find_similar_face_pgvector(queries[state['i'] % len(queries)], threshold=0.55, k=5)
+
+    try:
+        return measure(query, args.iterations, args.warmup)
+    finally:
+        face_db.pool.close()
+
+
+def bench_yolo(args, rng) -> Dict:
+    try:
+        from usecases.live_detection import decode_frame
+        from usecases.model_registry import model_registry, YOLO_MODEL
+    except ImportError as e:
+        raise SkipStage(str(e))
+    _, frame = decode_frame(base64.b64encode(load_jpeg(args.image)))
+    model_registry.warmup(YOLO_MODEL)
+    return measure(lambda: model_registry.predict(YOLO_MODEL, frame, imgsz=640, verbose=False),
+                   args.iterations, args.warmup)
+
+
+def bench_live_detection(args, rng) -> Dict:
+    """POST /live_detection through the Flask test client with a stub LLM and in-memory faces"""
+    if not args.db:
+        # The endpoints module builds a FaceDatabase on import, against DB_HOST
+        raise SkipStage('needs --db and a reachable Postgres (DB_HOST) to import the app')
+    try:
+        import app as flask_app
+        from webserver import endpoints
+        from usecases.llm_cache import llm_caches
+        from usecases.llm_client import llm_client
+        from usecases.llm_stub_server import start_stub_server
+    except ImportError as e:
+        raise SkipStage(str(e))
+
+    frame_b64 = base64.b64encode(load_jpeg(args.image)).decode('ascii')
+    url = endpoints.CORE_PREFIX + '/reinforce_memory/live_detection'
+
+    # Every patched global is restored on exit, whichever setup step fails
+    with ExitStack() as stack:
+        stub = start_stub_server(latency=args.llm_latency)
+        stack.callback(stub.shutdown)
+        stack.enter_context(mock.patch.object(
+            llm_client, 'url', f"http://127.0.0.1:{stub.server_address[1]}/gemini-media-inference"))
+        # Every request should reach the LLM: no response cache, and a fresh session each time
+        stack.enter_context(mock.patch.dict(llm_caches, clear=True))
+        stack.enter_context(mock.patch.object(
+            endpoints.face_db, 'face_index', synthetic_face_index(args.people[-1], rng)))
+
+        client = flask_app.create_app(sync_face_index=False).test_client()
+
+        def request():
+            response = client.post(url, json={'frame': frame_b64, 'session_id': uuid.uuid4().hex})
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f"live_detection returned {response.status_code}: {response.get_data(as_text=True)}")
+
+        return measure(request, args.iterations, args.warmup)
+
+
+BENCHMARKS = {
+    'decode': bench_decode,
+    'face_encode': bench_face_encode,
+    'face_match': bench_face_match,
+    'face_match_pgvector': bench_face_match_pgvector,
+    'yolo': bench_yolo,
+    'live_detection': bench_live_detection
+}
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit
+    }
+
+
+def flatten(results: Dict) -> Dict[str, Dict]:
+    """{stage or stage/variant: metrics} for stages that ran"""
+    flat = {}
+    for stage, result in results.items():
+        if 'p50_ms' in result:
+            flat[stage] = result
+        else:
+            flat.update({f'{stage}/{variant}': metrics for variant, metrics in result.items()
+                         if isinstance(metrics, dict) and 'p50_ms' in metrics})
+    return flat
+
+
+def print_report(results: Dict, baseline: Optional[Dict] = None):
+    current = flatten(results)
+    previous = flatten(baseline['stages']) if baseline else {}
+    header = f"{'stage':<40}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}"
+    print(header + (f"{'p50 vs base':>14}" if baseline else ''))
+    for stage, metrics in current.items():
+        line = (f"{stage:<40}{metrics['p50_ms']:>10.2f}{metrics['p95_ms']:>10.2f}"
+                f"{metrics['p99_ms']:>10.2f}{metrics['throughput_per_s'] or 0:>10.1f}")
+        if stage in previous:
+            change = (metrics['p50_ms'] - previous[stage]['p50_ms']) / previous[stage]['p50_ms'] * 100
+            line += f"{change:>+13.1f}%"
+        print(line)
+    for stage, result in results.items():
+        if 'skipped' in result:
+            print(f"{stage:<40}skipped: {result['skipped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', default=','.join(STAGES), help='Comma-separated stages to run')
+    parser.add_argument('--people', default='1000,10000',
+                        help='Comma-separated synthetic database sizes for face matching')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--image', help='JPEG with a face; defaults to a synthetic frame without faces')
+    parser.add_argument('--db', action='store_true', help='Run the stages that use the configured DB (pgvector search, the endpoint)')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Seconds the stub LLM waits per call')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Where to write the JSON results (default: benchmarks/results/)')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+    args.people = [int(count) for count in args.people.split(',')]
+
+    rng = np.random.default_rng(args.seed)
+    results = {}
+    for stage in args.stages.split(','):
+        print(f"Running {stage}...", file=sys.stderr)
+        try:
+            results[stage] = BENCHMARKS[stage](args, rng)
+        except SkipStage as e:
+            results[stage] = {'skipped': str(e)}
+
+    run = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'parameters': {'iterations': args.iterations, 'warmup': args.warmup, 'people': args.people,
+                       'image': args.image, 'llm_latency': args.llm_latency, 'seed': args.seed},
+        'stages': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
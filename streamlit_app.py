@@ -2,11 +2,14 @@
 import streamlit as st
 import cv2
 import base64
+import json
 import requests
 import time
+import uuid
 
 # Define the Flask endpoint URL
 FLASK_ENDPOINT = "http://127.0.0.1:8080/use-case-svc/api/v1/reinforce_memory/live_detection"
+FLASK_STREAM_ENDPOINT = FLASK_ENDPOINT + "/stream"
 
 st.title("Live Detection Stream")
 st.text("Captures frames from the webcam every second, sends them to the server, and displays the response.")
@@ -15,6 +18,10 @@ st.text("Captures frames from the webcam every second, sends them to the server,
 if "streaming" not in st.session_state:
     st.session_state.streaming = False
 
+# Stable id so the server can tell when this client's scene has changed
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
 # Start the webcam capture using OpenCV
 cap = cv2.VideoCapture(0)
 
@@ -50,9 +57,34 @@ if st.button("Start Live Stream"):
 if st.button("Stop Live Stream"):
     st.session_state.streaming = False
 
+# Show messages word by word as the server generates them
+stream_responses = st.checkbox("Stream responses as they are generated", value=True)
+
 # List to hold responses for display
 responses = []
 
+
+def render_responses(messages):
+    """Update responses in the scrolling container"""
+    with col2:
+        response_container.markdown(
+            '<div class="response-container">' +
+            ''.join([f"<p>{msg}</p>" for msg in messages]) +
+            '</div>',
+            unsafe_allow_html=True
+        )
+
+
+def iter_sse(response):
+    """Yield (event, payload) pairs from a server-sent events response"""
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
+            event = "message"
+
 # Capture frames while streaming is active
 while st.session_state.streaming:
     # Capture a frame
@@ -65,8 +97,38 @@ while st.session_state.streaming:
     _, buffer = cv2.imencode('.jpg', frame)
     frame_base64 = base64.b64encode(buffer).decode('utf-8')
 
+    payload = {"frame": frame_base64, "session_id": st.session_state.session_id}
+
+    if stream_responses:
+        # Render partial text as tokens arrive
+        with col1:
+            image_placeholder.image(frame, channels="BGR")
+        try:
+            with requests.post(FLASK_STREAM_ENDPOINT, json=payload, stream=True) as response:
+                if response.status_code != 200:
+                    st.error(f"Error: Received status code {response.status_code}")
+                else:
+                    scene_changed, partial = True, ""
+                    for event, data in iter_sse(response):
+                        if event == "analysis":
+                            scene_changed = data.get("scene_changed", True)
+                        elif event == "token" and scene_changed:
+                            partial += data.get("text", "")
+                            render_responses(responses + [partial])
+                        elif event == "done" and scene_changed:
+                            responses.append(data.get("response", partial))
+                            if len(responses) > 10:
+                                responses.pop(0)
+                            render_responses(responses)
+                        elif event == "error":
+                            st.error(f"Error: {data.get('error')}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            st.error(f"Streaming request failed: {e}")
+        time.sleep(1)
+        continue
+
     # Send the frame to the Flask backend
-    response = requests.post(FLASK_ENDPOINT, json={"frame": frame_base64})
+    response = requests.post(FLASK_ENDPOINT, json=payload)
 
     # Process the response
     if response.status_code == 200:
@@ -74,8 +136,10 @@ while st.session_state.streaming:
             result = response.json()  # Try parsing JSON
             response_text = result.get("response", "No response text available")
 
-            # Append the response text and keep only the latest 10 responses
-            responses.append(response_text)
+            # Append new messages only; unchanged scenes repeat the previous one
+            if result.get("scene_changed", True):
+                responses.append(response_text)
+            # Keep only the latest 10 responses
             if len(responses) > 10:
                 responses.pop(0)
 
@@ -83,14 +147,7 @@ while st.session_state.streaming:
             with col1:
                 image_placeholder.image(frame, channels="BGR")
 
-            # Update responses in the scrolling container
-            with col2:
-                response_container.markdown(
-                    '<div class="response-container">' +
-                    ''.join([f"<p>{msg}</p>" for msg in responses]) +
-                    '</div>',
-                    unsafe_allow_html=True
-                )
+            render_responses(responses)
         except requests.exceptions.JSONDecodeError:
             st.error("Received a non-JSON response from the server.")
     else:
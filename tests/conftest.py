@@ -0,0 +1,33 @@
+import os
+
+import psycopg2
+import pytest
+
+
+@pytest.fixture(scope='session')
+def face_db():
+    """A FaceDatabase on the Postgres named by DB_HOST; tests using it skip when there is none"""
+    if 'DB_HOST' not in os.environ:
+        pytest.skip('DB_HOST is not set; no Postgres to test against')
+    from usecases.face_database import FaceDatabase
+
+    try:
+        db = FaceDatabase()
+        with db.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'Postgres is unreachable: {e}')
+    yield db
+    db.pool.close()
+
+
+@pytest.fixture
+def patient(face_db):
+    """A fresh patient, deleted with their people afterwards"""
+    patient_id = face_db.add_patient('Test', 'Patient')
+    yield patient_id
+    with face_db.pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM people WHERE patient_id = %s", (patient_id,))
+            cur.execute("DELETE FROM patients WHERE patient_id = %s", (patient_id,))
@@ -0,0 +1,41 @@
+import io
+import zipfile
+
+import pytest
+
+pytest.importorskip('face_recognition')
+
+from usecases import bulk_enrollment  # noqa: E402
+from usecases.bulk_enrollment import enroll_people, read_images_from_archive  # noqa: E402
+
+
+def archive(*members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_images_are_keyed_by_their_path_in_the_archive():
+    images = read_images_from_archive(archive(('alice/1.jpg', b'a'), ('bob/1.jpg', b'b'), ('notes.txt', b'x')))
+    assert images == {'alice/1.jpg': b'a', 'bob/1.jpg': b'b'}
+
+
+def test_duplicate_members_are_rejected():
+    with pytest.warns(UserWarning):
+        data = archive(('alice/1.jpg', b'a'), ('alice/1.jpg', b'b'))
+    with pytest.raises(ValueError, match='more than once'):
+        read_images_from_archive(data)
+
+
+def test_oversized_member_is_rejected_before_it_is_inflated(monkeypatch):
+    monkeypatch.setattr(bulk_enrollment, 'bulk_enrollment_max_image_bytes', 1024)
+    with pytest.raises(ValueError, match='per-image size limit'):
+        read_images_from_archive(archive(('bomb.png', b'\0' * 4096)))
+
+
+def test_bulk_enrollment_requires_a_patient():
+    people = [{'first_name': 'Ada', 'last_name': 'Test', 'relationship': 'friend', 'images': ['a.jpg']}]
+    with pytest.raises(ValueError, match='patient_id'):
+        enroll_people(None, people, {'a.jpg': b''}, patient_id=None)
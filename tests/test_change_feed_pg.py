@@ -0,0 +1,56 @@
+"""Two replicas kept in sync through the people_changes feed.
+
+This process follows the feed while a second process, the change_feed CLI,
+writes people. Runs only against a reachable Postgres (see conftest.face_db).
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+import pytest
+
+from usecases.change_feed import ChangeFeed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def other_replica(*args) -> str:
+    """Run a change_feed command in a separate process and return its output"""
+    result = subprocess.run([sys.executable, '-m', 'usecases.change_feed', *args], cwd=ROOT,
+                            capture_output=True, text=True, timeout=60, check=True)
+    return result.stdout
+
+
+def wait_for(condition, timeout: float = 15.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def feed(face_db):
+    feed = ChangeFeed(face_db, poll_seconds=0.5)
+    feed.start()
+    face_db.load_face_index()
+    yield feed
+    feed.stop()
+
+
+def test_people_written_by_another_process_reach_this_index(face_db, feed, patient):
+    def resident(person_id):
+        with face_db.face_index.lock:
+            return face_db.face_index._position(person_id) >= 0
+
+    output = other_replica('add', '--patient-id', str(patient), '--first-name', 'Feed')
+    person_id = int(re.search(r'Added person (\d+)', output).group(1))
+    assert wait_for(lambda: resident(person_id))
+    assert feed.stats()['changes_applied'] >= 1
+
+    other_replica('delete', '--person-id', str(person_id))
+    assert wait_for(lambda: not resident(person_id))
+    assert feed.stats()['last_change_id'] > 0
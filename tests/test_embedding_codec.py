@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from usecases.embedding_codec import EMBEDDING_DTYPE, decode_embedding, decode_embeddings, encode_embedding
+
+
+def test_single_embedding_round_trips_as_float32():
+    embedding = np.random.default_rng(0).normal(0, 0.1, 128)
+    data = encode_embedding(embedding)
+
+    assert len(data) == 128 * 4
+    decoded = decode_embedding(data)
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, embedding.astype(np.float32))
+
+
+def test_layout_is_big_endian_float4():
+    data = encode_embedding(np.arange(128, dtype=np.float64))
+    assert data[:8] == np.array([0.0, 1.0], dtype='>f4').tobytes()
+    assert EMBEDDING_DTYPE.byteorder == '>'
+
+
+def test_missing_embedding_decodes_to_none():
+    assert decode_embedding(None) is None
+
+
+def test_wrong_dimension_is_rejected():
+    with pytest.raises(ValueError):
+        encode_embedding(np.zeros(64))
+
+
+def test_column_decodes_into_one_matrix():
+    embeddings = np.random.default_rng(1).normal(0, 0.1, (5, 128)).astype(np.float32)
+    # Postgres hands bytea back as memoryview
+    column = [memoryview(encode_embedding(row)) for row in embeddings]
+
+    matrix = decode_embeddings(column)
+    assert matrix.shape == (5, 128)
+    np.testing.assert_array_equal(matrix, embeddings)
+    assert decode_embeddings([]).shape == (0, 128)
+
+
+def test_truncated_column_is_rejected():
+    with pytest.raises(ValueError):
+        decode_embeddings([encode_embedding(np.zeros(128))[:-4]])
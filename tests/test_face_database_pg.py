@@ -0,0 +1,47 @@
+"""FaceDatabase against a real Postgres with pgvector.
+
+Runs only when DB_HOST (and DB_NAME, DB_USER, DB_PASSWORD) point at a reachable
+database, e.g. a local docker postgres with the pgvector extension available.
+"""
+import numpy as np
+
+
+def embeddings(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(0, 0.055, size=(count, 128)).astype(np.float32)
+
+
+def test_migrations_are_recorded_and_not_rerun(face_db):
+    assert face_db.apply_migrations() == []
+    with face_db.pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM schema_migrations")
+            assert cur.fetchone()[0] >= 7
+
+
+def test_added_person_is_found_by_both_backends(face_db, patient):
+    vectors = embeddings(2)
+    person_id = face_db.add_person(patient, 'Ada', 'Test', 'friend', vectors[0], 'likes tea')
+
+    pgvector = face_db.find_similar_face_pgvector(vectors[0] + 0.005, patient_id=patient)
+    assert [match['id'] for match in pgvector] == [person_id]
+    assert pgvector[0]['personal context'] == 'likes tea'
+
+    resident = face_db.find_similar_face(vectors[0] + 0.005, patient_id=patient)
+    assert [match['id'] for match in resident] == [person_id]
+    assert face_db.find_similar_face(vectors[1], patient_id=patient) == []
+
+
+def test_add_people_returns_ids_in_input_order(face_db, patient):
+    vectors = embeddings(3, seed=1)
+    person_ids = face_db.add_people([{
+        'patient_id': patient, 'first_name': name, 'last_name': 'Test',
+        'relationship': 'family', 'face_embedding': vector
+    } for name, vector in zip(['a', 'b', 'c'], vectors)])
+
+    assert len(person_ids) == 3
+    for person_id, vector in zip(person_ids, vectors):
+        assert face_db.find_similar_face_pgvector(vector, patient_id=patient)[0]['id'] == person_id
+
+    assert face_db.delete_person(person_ids[0])
+    assert all(match['id'] != person_ids[0]
+               for match in face_db.find_similar_face(vectors[0], patient_id=patient))
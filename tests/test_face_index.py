@@ -0,0 +1,58 @@
+import numpy as np
+
+from usecases.face_index import FaceIndex
+
+
+def person(name: str) -> dict:
+    return {'first_name': name, 'last_name': 'Test', 'relationship': 'friend', 'notes': None}
+
+
+def embeddings(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(0, 0.055, size=(count, 128)).astype(np.float32)
+
+
+def test_search_finds_loaded_people_nearest_first():
+    vectors = embeddings(3)
+    index = FaceIndex()
+    index.load([1, 2, 3], vectors, [person('a'), person('b'), person('c')])
+
+    matches = index.search(vectors[1] + 0.01, threshold=0.55)
+    assert [match['id'] for match in matches][:1] == [2]
+    assert matches[0]['first_name'] == 'b'
+    assert index.search(np.full(128, 5.0, dtype=np.float32), threshold=0.55) == []
+
+
+def test_upsert_adds_then_replaces_in_place():
+    vectors = embeddings(3)
+    index = FaceIndex(initial_capacity=1)
+    index.upsert(7, vectors[0], person('before'))
+    index.upsert(8, vectors[1], person('other'))
+    index.upsert(7, vectors[2], person('after'))
+
+    assert len(index) == 2
+    match = index.search(vectors[2], threshold=0.1)[0]
+    assert (match['id'], match['first_name']) == (7, 'after')
+    assert all(match['id'] != 7 for match in index.search(vectors[0], threshold=0.1))
+
+
+def test_add_ignores_a_person_already_present():
+    vectors = embeddings(2)
+    index = FaceIndex()
+    index.add(1, vectors[0], person('a'))
+    index.add(1, vectors[1], person('b'))
+    assert len(index) == 1
+    assert index.search(vectors[0], threshold=0.1)[0]['first_name'] == 'a'
+
+
+def test_remove_moves_the_last_row_into_the_gap():
+    vectors = embeddings(3)
+    index = FaceIndex()
+    index.load([1, 2, 3], vectors, [person('a'), person('b'), person('c')])
+
+    assert index.remove(1)
+    assert not index.remove(1)
+    assert len(index) == 2
+    assert index.search(vectors[0], threshold=0.1) == []
+    # The row moved from the end keeps its own embedding and metadata
+    match = index.search(vectors[2], threshold=0.1)[0]
+    assert (match['id'], match['first_name']) == (3, 'c')
@@ -0,0 +1,77 @@
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')
+
+from usecases import face_tracker  # noqa: E402
+from usecases.face_tracker import FaceTracker  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=10.0)
+    monkeypatch.setattr(face_tracker, 'time', types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+class Identify:
+    """Stands in for encoding + matching; each encoded box gets a distinct match"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, locations):
+        self.calls.append(list(locations))
+        return [(np.zeros(128), [{'id': len(self.calls) * 100 + i}]) for i in range(len(locations))]
+
+
+def box(top, left, size=100):
+    # (top, right, bottom, left)
+    return top, left + size, top + size, left
+
+
+def test_overlapping_box_reuses_the_track(clock):
+    tracker, identify = FaceTracker(iou_threshold=0.3, refresh_seconds=5, max_missing_seconds=2), Identify()
+    first, encoded, reused = tracker.process([box(0, 0)], identify)
+    assert (encoded, reused) == (1, 0)
+
+    clock.value += 0.1
+    second, encoded, reused = tracker.process([box(5, 5)], identify)
+    assert (encoded, reused) == (0, 1)
+    assert second == first
+    assert len(identify.calls) == 1
+
+
+def test_faces_are_paired_with_their_own_tracks(clock):
+    tracker, identify = FaceTracker(iou_threshold=0.3), Identify()
+    first, _, _ = tracker.process([box(0, 0), box(0, 400)], identify)
+
+    # Same faces, listed in the other order and moved slightly
+    second, encoded, _ = tracker.process([box(0, 405), box(3, 0)], identify)
+    assert encoded == 0
+    assert second == [first[1], first[0]]
+
+
+def test_new_and_stale_faces_are_encoded(clock):
+    tracker, identify = FaceTracker(iou_threshold=0.3, refresh_seconds=5, max_missing_seconds=60), Identify()
+    tracker.process([box(0, 0)], identify)
+
+    _, encoded, reused = tracker.process([box(0, 0), box(0, 400)], identify)
+    assert (encoded, reused) == (1, 1)
+    assert identify.calls[-1] == [box(0, 400)]
+
+    clock.value += 5
+    _, encoded, _ = tracker.process([box(0, 0), box(0, 400)], identify)
+    assert encoded == 2
+
+
+def test_tracks_missing_too_long_are_dropped(clock):
+    tracker, identify = FaceTracker(iou_threshold=0.3, refresh_seconds=60, max_missing_seconds=1), Identify()
+    tracker.process([box(0, 0)], identify)
+    clock.value += 2
+    tracker.process([], identify)
+
+    _, encoded, _ = tracker.process([box(0, 0)], identify)
+    assert encoded == 1
@@ -0,0 +1,51 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import pytest
+
+from usecases.inference_pool import InferencePool, _release_when_done
+
+
+class BrokenExecutor:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        raise BrokenProcessPool('a worker died')
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+def test_broken_pool_is_dropped_for_the_next_submit():
+    pool = InferencePool(workers=1)
+    broken = BrokenExecutor()
+    pool._executor = broken
+
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(print)
+    assert pool._executor is None
+    assert broken.shut_down
+    assert pool.stats()['in_flight'] == 0
+
+
+def test_frame_outlives_a_task_still_running():
+    shm = shared_memory.SharedMemory(create=True, size=16)
+    running, finished = Future(), Future()
+    finished.set_result(None)
+
+    _release_when_done(shm, [finished, running])
+    attached = shared_memory.SharedMemory(name=shm.name)
+    attached.close()
+
+    running.set_result(None)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=shm.name)
+
+
+def test_frame_is_released_at_once_when_nothing_runs():
+    shm = shared_memory.SharedMemory(create=True, size=16)
+    _release_when_done(shm, [])
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=shm.name)
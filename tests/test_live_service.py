@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+for module in ('cv2', 'face_recognition', 'ultralytics'):
+    pytest.importorskip(module)
+
+from usecases import live_service  # noqa: E402
+from usecases.face_tracker import SessionFaceTrackers  # noqa: E402
+from usecases.live_service import LiveDetectionService  # noqa: E402
+from usecases.scene_state import SceneStateTracker  # noqa: E402
+
+ANALYSIS = {'identified_people': [{'id': 1, 'name': 'Ada'}], 'objects': ['person'],
+            'faces_encoded': 1, 'faces_reused': 0}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """A service whose frame analysis and LLM calls are canned; records the LLM calls made"""
+    calls = []
+
+    def generate(frame_bytes, context, cache=None, person_ids=None):
+        calls.append(person_ids)
+        return {'response': 'Hi, Ada'}
+
+    async def generate_async(frame_bytes, context, cache=None, person_ids=None):
+        return generate(frame_bytes, context, cache=cache, person_ids=person_ids)
+
+    def stream(frame_bytes, context, cache=None, person_ids=None):
+        calls.append(person_ids)
+        yield from ['Hi, ', 'Ada']
+
+    monkeypatch.setattr(live_service, 'decode_frame', lambda frame_data: (b'jpeg', None))
+    monkeypatch.setattr(live_service, 'analyze_frame', lambda *args, **kwargs: dict(ANALYSIS))
+    monkeypatch.setattr(live_service, 'frame_context', lambda analysis: (True, {'name': 'Ada'}))
+    monkeypatch.setattr(live_service, 'generate_message_with_llm', generate)
+    monkeypatch.setattr(live_service, 'generate_message_with_llm_async', generate_async)
+    monkeypatch.setattr(live_service, 'stream_message_with_llm', stream)
+    monkeypatch.setattr(live_service, 'llm_caches', {})
+
+    service = LiveDetectionService(None, SceneStateTracker(), SessionFaceTrackers())
+    service.calls = calls
+    return service
+
+
+def test_unchanged_scene_reuses_the_sessions_last_message(service):
+    first = service.analyze('frame', 'kitchen')
+    assert first.payload(service.message(first))['scene_changed'] is True
+
+    second = service.analyze('frame', 'kitchen')
+    assert second.payload(service.message(second)) == {
+        'response': 'Hi, Ada', 'identified_people': ANALYSIS['identified_people'], 'scene_changed': False}
+    assert service.calls == [[1]]
+
+
+def test_without_a_session_id_every_frame_gets_a_new_message(service):
+    for _ in range(2):
+        live = service.analyze('frame', None)
+        assert asyncio.run(service.message_async(live)) == {'response': 'Hi, Ada'}
+    assert service.calls == [[1], [1]]
+    assert service.scene_tracker.stats()['sessions'] == 0
+
+
+def test_stream_sends_analysis_tokens_then_done_and_replays_when_unchanged(service):
+    events = list(service.stream(service.analyze('frame', 'hall')))
+    assert [event.split('\n')[0] for event in events] == [
+        'event: analysis', 'event: token', 'event: token', 'event: done']
+    assert 'Hi, Ada' in events[-1]
+
+    replay = list(service.stream(service.analyze('frame', 'hall')))
+    assert [event.split('\n')[0] for event in replay] == ['event: analysis', 'event: token', 'event: done']
+    assert len(service.calls) == 1
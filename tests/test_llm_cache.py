@@ -0,0 +1,71 @@
+import types
+
+import pytest
+
+from usecases import llm_cache
+from usecases.llm_cache import ResponseCache, context_cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(llm_cache, 'time', types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_key_ignores_whitespace_case_and_object_order():
+    a = context_cache_key('live', {'objects': ['Cup', 'chair', 'cup'], 'scene': '  A  kitchen '}, [2, 1])
+    b = context_cache_key('live', {'scene': 'a kitchen', 'objects': ['chair', 'cup']}, [1, 2, 2])
+    assert a == b
+
+
+def test_key_separates_prompts_people_and_ordered_lists():
+    base = context_cache_key('live', {'objects': ['cup']}, [1])
+    assert context_cache_key('unknown', {'objects': ['cup']}, [1]) != base
+    assert context_cache_key('live', {'objects': ['cup']}, [2]) != base
+    # Only the object list is treated as a set
+    assert context_cache_key('live', {'people': ['ann', 'bob']}) != context_cache_key('live', {'people': ['bob', 'ann']})
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(max_entries=4, ttl_seconds=30)
+    cache.set('k', {'response': 'hello'})
+
+    clock.value += 29
+    assert cache.get('k') == {'response': 'hello'}
+    clock.value += 2
+    assert cache.get('k') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_entries=2, ttl_seconds=30)
+    cache.set('a', {'response': 'a'})
+    cache.set('b', {'response': 'b'})
+    cache.get('a')
+    cache.set('c', {'response': 'c'})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'response': 'a'}
+    assert cache.get('c') == {'response': 'c'}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disk_store_survives_a_new_cache(clock, tmp_path):
+    path = str(tmp_path / 'cache' / 'live.sqlite3')
+    ResponseCache(ttl_seconds=30, disk_path=path).set('k', {'response': 'kept'})
+
+    assert ResponseCache(ttl_seconds=30, disk_path=path).get('k') == {'response': 'kept'}
+    clock.value += 31
+    assert ResponseCache(ttl_seconds=30, disk_path=path).get('k') is None
+
+
+def test_refreshing_view_skips_reads_but_stores(clock):
+    cache = ResponseCache(ttl_seconds=30)
+    cache.set('k', {'response': 'old'})
+    refreshing = cache.refreshing()
+
+    assert refreshing.get('k') is None
+    refreshing.set('k', {'response': 'new'})
+    assert cache.get('k') == {'response': 'new'}
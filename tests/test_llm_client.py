@@ -0,0 +1,81 @@
+import asyncio
+import socket
+
+import pytest
+
+from usecases.llm_client import LLMClient, LLMClientError
+from usecases.llm_stub_server import start_stub_server
+
+REPLY = "Ann is your daughter"
+
+
+@pytest.fixture
+def stub(request):
+    server = start_stub_server(fail_first=getattr(request, 'param', 0), reply=REPLY)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(url: str, max_retries: int = 2) -> LLMClient:
+    return LLMClient(url=url, max_retries=max_retries, backoff_base=0.001, backoff_max=0.01,
+                     connect_timeout=1, read_timeout=5)
+
+
+def stub_url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/gemini-media-inference"
+
+
+@pytest.mark.parametrize('stub', [2], indirect=True)
+def test_post_retries_transient_failures(stub):
+    assert client_for(stub_url(stub)).post_media(b'jpeg', 'who is this?') == {'response': REPLY}
+    assert stub.requests_seen == 3
+
+
+@pytest.mark.parametrize('stub', [5], indirect=True)
+def test_post_gives_up_after_max_retries(stub):
+    with pytest.raises(LLMClientError, match='503'):
+        client_for(stub_url(stub), max_retries=1).post_media(b'jpeg', 'who is this?')
+    assert stub.requests_seen == 2
+
+
+def test_unreachable_server_raises_client_error():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    with pytest.raises(LLMClientError):
+        client_for(f"http://127.0.0.1:{port}/gemini-media-inference", max_retries=1).post_media(b'jpeg', 'hi')
+
+
+@pytest.mark.parametrize('stub', [1], indirect=True)
+def test_stream_retries_before_the_first_byte(stub):
+    chunks = list(client_for(stub_url(stub)).stream_media(b'jpeg', 'who is this?'))
+    assert len(chunks) > 1
+    assert ''.join(chunks) == REPLY
+    assert stub.requests_seen == 2
+
+
+def test_backoff_is_jittered_capped_and_honours_retry_after():
+    client = LLMClient(url='http://unused', backoff_base=0.5, backoff_max=4)
+    assert all(0 <= client._backoff(1) <= 1.0 for _ in range(50))
+    assert all(0 <= client._backoff(10) <= 4 for _ in range(50))
+    assert client._backoff(0, '2') == 2
+    assert client._backoff(0, '60') == 4
+    assert 0 <= client._backoff(0, 'Wed, 21 Oct 2015 07:28:00 GMT') <= 0.5
+
+
+@pytest.mark.parametrize('stub', [2], indirect=True)
+def test_async_post_and_stream_retry(stub):
+    async def run():
+        client = client_for(stub_url(stub))
+        try:
+            response = await client.post_media_async(b'jpeg', 'who is this?')
+            chunks = [chunk async for chunk in client.stream_media_async(b'jpeg', 'who is this?')]
+        finally:
+            await client.aclose()
+        return response, chunks
+
+    response, chunks = asyncio.run(run())
+    assert response == {'response': REPLY}
+    assert ''.join(chunks) == REPLY
+    assert stub.requests_seen == 4
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+pytest.importorskip('ultralytics')
+
+from usecases import multi_stream  # noqa: E402
+from usecases.multi_stream import CameraSource, MultiStreamManager  # noqa: E402
+
+
+def write_video(path, frames: int = 10, size=(64, 48), fps: float = 50.0) -> str:
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    if not writer.isOpened():
+        pytest.skip('OpenCV has no MJPG writer in this build')
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class FakeResult:
+    def __init__(self, frame):
+        self.frame = frame
+
+    def plot(self, img=None):
+        return self.frame if img is None else img
+
+
+class FakeRegistry:
+    """Stands in for YOLO: returns each frame as its own annotated result"""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, name, frames, **kwargs):
+        self.batches.append(len(frames))
+        return [FakeResult(frame) for frame in frames]
+
+
+def test_video_file_is_paced_resized_and_looped(tmp_path):
+    camera = CameraSource('file', write_video(tmp_path / 'clip.avi', frames=10), width=80, height=60)
+    camera.start()
+    try:
+        # 10 frames at 50 fps: going past 10 means the file rewound instead of ending
+        assert wait_for(lambda: camera.frames_captured > 15)
+        frame, captured_at = camera.take_frame()
+        assert frame.shape == (60, 80, 3)
+        assert captured_at is not None
+        assert not camera.failed
+    finally:
+        camera.stop()
+
+
+def test_unreadable_file_is_given_up_on(tmp_path):
+    path = tmp_path / 'broken.avi'
+    path.write_bytes(b'not a video')
+    camera = CameraSource('broken', str(path), max_failures=3, max_backoff=0.01)
+    camera.start()
+    try:
+        assert wait_for(lambda: camera.failed)
+        assert camera.frames_captured == 0
+    finally:
+        camera.stop()
+
+
+def test_manager_batches_every_camera_and_notifies_listeners(tmp_path, monkeypatch):
+    registry = FakeRegistry()
+    monkeypatch.setattr(multi_stream, 'model_registry', registry)
+    manager = MultiStreamManager({
+        'lobby': write_video(tmp_path / 'lobby.avi'),
+        'kitchen': write_video(tmp_path / 'kitchen.avi')
+    })
+    seen = {}
+    lock = threading.Lock()
+
+    def listener(camera_id, seq, jpeg_bytes):
+        with lock:
+            seen[camera_id] = seq
+        assert jpeg_bytes[:2] == b'\xff\xd8'
+
+    manager.add_frame_listener(listener)
+    manager.start()
+    try:
+        assert wait_for(lambda: len(seen) == 2 and min(seen.values()) >= 3)
+    finally:
+        manager.stop()
+
+    stats = manager.stats()
+    assert set(stats['cameras']) == {'lobby', 'kitchen'}
+    assert all(camera['frames_processed'] >= 3 for camera in stats['cameras'].values())
+    assert stats['frames_detected'] + stats['frames_reused'] >= 6
+    assert registry.batches and max(registry.batches) <= 2
+    assert manager.latest_frame('lobby')[1] is not None
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from usecases.quantized_face_index import QuantizedFaceIndex, make_face_index
+
+METADATA = {'first_name': 'Test', 'last_name': 'Person', 'relationship': 'friend', 'notes': None}
+
+
+def people(count: int, seed: int = 0) -> np.ndarray:
+    # Spread like face_recognition encodings: different people ~0.7-1.0 apart
+    return np.random.default_rng(seed).normal(0, 0.055, size=(count, 128)).astype(np.float32)
+
+
+def self_match_rate(index: QuantizedFaceIndex, embeddings: np.ndarray) -> float:
+    results = index.search_batch(embeddings, threshold=0.55, k=1)
+    return float(np.mean([bool(found) and found[0]['id'] == i + 1 for i, found in enumerate(results)]))
+
+
+@pytest.mark.parametrize('mode', ['float16', 'int8', 'pq'])
+def test_incremental_enrollment_into_empty_index_matches_itself(mode):
+    embeddings = people(300)
+    index = QuantizedFaceIndex(mode, rerank=0)
+    for count, embedding in enumerate(embeddings, start=1):
+        index.add(count, embedding, METADATA)
+        if count in (1, 10, 255, 256, 300):
+            assert self_match_rate(index, embeddings[:count]) == 1.0, f"{count} people enrolled"
+
+
+def test_pq_keeps_exact_rows_until_it_can_train():
+    embeddings = people(256)
+    index = QuantizedFaceIndex('pq', rerank=0)
+    for person_id, embedding in enumerate(embeddings[:255], start=1):
+        index.add(person_id, embedding, METADATA)
+    assert index._codes.dtype == np.float32
+    assert index.search(embeddings[0])[0]['similarity'] == pytest.approx(1.0)
+
+    index.add(256, embeddings[255], METADATA)
+    assert index._codes.dtype == np.uint8
+    assert index.codec.codebooks.shape[1] == 256
+
+
+def test_small_load_is_searched_exactly_and_grows_into_codes():
+    embeddings = people(400)
+    index = QuantizedFaceIndex('pq', rerank=0)
+    index.load(list(range(1, 11)), embeddings[:10], [METADATA] * 10)
+    assert self_match_rate(index, embeddings[:10]) == 1.0
+
+    for person_id in range(11, 401):
+        index.add(person_id, embeddings[person_id - 1], METADATA)
+    assert index._codes.dtype == np.uint8
+    assert self_match_rate(index, embeddings) == 1.0
+
+
+def test_exact_rows_skip_the_rerank_loader():
+    embeddings = people(5)
+    calls = []
+
+    def loader(person_ids):
+        calls.append(person_ids)
+        return embeddings[np.asarray(person_ids) - 1]
+
+    index = QuantizedFaceIndex('pq', rerank=8, rerank_loader=loader)
+    index.load(list(range(1, 6)), embeddings, [METADATA] * 5)
+    assert index.search(embeddings[2])[0]['id'] == 3
+    assert calls == []
+
+
+def test_only_pq_reranks_by_default():
+    def loader(person_ids):
+        return np.zeros((len(person_ids), 128), dtype=np.float32)
+
+    assert make_face_index('int8', rerank=64, rerank_loader=loader).rerank_loader is None
+    assert make_face_index('float16', rerank=64, rerank_loader=loader).rerank_loader is None
+    assert make_face_index('pq', rerank=64, rerank_loader=loader).rerank_loader is loader
+    assert make_face_index('pq', rerank=0, rerank_loader=loader).rerank_loader is None
+    assert make_face_index('int8', rerank=64, rerank_loader=loader, rerank_modes=['int8']).rerank_loader is loader
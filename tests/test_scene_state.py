@@ -0,0 +1,65 @@
+import types
+
+import pytest
+
+from usecases import scene_state
+from usecases.scene_state import SceneStateTracker, jaccard_distance
+
+ANN = {'id': 1}
+BOB = {'id': 2}
+UNKNOWN = {'id': None}
+MESSAGE = {'response': 'Ann is here'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=100.0)
+    monkeypatch.setattr(scene_state, 'time', types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def tracker(clock):
+    tracker = SceneStateTracker(cooldown_seconds=30, object_change_threshold=0.5,
+                                session_ttl_seconds=600, max_sessions=10)
+    tracker.update('s', [ANN], ['cup', 'chair'], MESSAGE)
+    return tracker
+
+
+def test_jaccard_distance():
+    assert jaccard_distance(frozenset(), frozenset()) == 0.0
+    assert jaccard_distance(frozenset('ab'), frozenset('ab')) == 0.0
+    assert jaccard_distance(frozenset('ab'), frozenset('bc')) == pytest.approx(2 / 3)
+    assert jaccard_distance(frozenset('a'), frozenset()) == 1.0
+
+
+def test_unchanged_scene_reuses_the_last_message(tracker):
+    assert tracker.lookup('s', [ANN], ['chair', 'cup']) == (MESSAGE, False)
+
+
+def test_small_object_drift_is_not_a_new_scene(tracker):
+    # {cup, chair} -> {cup, chair, table}: distance 1/3, under the 0.5 threshold
+    assert tracker.last_response('s', [ANN], ['cup', 'chair', 'table']) == MESSAGE
+
+
+def test_large_object_drift_is_a_new_scene(tracker):
+    # {cup, chair} -> {cup, bed, lamp}: distance 3/4
+    assert tracker.lookup('s', [ANN], ['cup', 'bed', 'lamp']) == (None, False)
+
+
+def test_any_identity_change_is_a_new_scene(tracker):
+    assert tracker.last_response('s', [ANN, BOB], ['cup', 'chair']) is None
+    assert tracker.last_response('s', [ANN, UNKNOWN], ['cup', 'chair']) is None
+    assert tracker.last_response('other-session', [ANN], ['cup', 'chair']) is None
+
+
+def test_cooldown_asks_for_a_fresh_message(tracker, clock):
+    clock.value += 30
+    assert tracker.lookup('s', [ANN], ['cup', 'chair']) == (None, True)
+
+
+def test_stats_count_reused_and_refreshed(tracker):
+    tracker.last_response('s', [ANN], ['cup', 'chair'])
+    tracker.last_response('s', [BOB], ['cup', 'chair'])
+    stats = tracker.stats()
+    assert (stats['llm_calls_skipped'], stats['llm_calls_made']) == (1, 1)
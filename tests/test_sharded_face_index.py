@@ -0,0 +1,75 @@
+import numpy as np
+
+from usecases.face_index import FaceIndex
+from usecases.sharded_face_index import ShardedFaceIndex
+
+
+def person(name: str) -> dict:
+    return {'first_name': name, 'last_name': 'Test', 'relationship': 'friend', 'notes': None}
+
+
+def embeddings(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(0, 0.055, size=(count, 128)).astype(np.float32)
+
+
+def test_shards_load_once_and_only_apply_changes_to_resident_patients():
+    vectors = embeddings(4)
+    loads = []
+
+    def loader(patient_id):
+        loads.append(patient_id)
+        if patient_id == 1:
+            return [1, 2], vectors[:2], [person('a'), person('b')]
+        return [], np.empty((0, 128), dtype=np.float32), []
+
+    shards = ShardedFaceIndex(loader)
+    assert shards.search_batch(1, vectors[:1], threshold=0.1)[0][0]['id'] == 1
+    shards.search_batch(1, vectors[:1], threshold=0.1)
+    assert loads == [1]
+
+    shards.upsert(1, 3, vectors[2], person('c'))
+    shards.upsert(2, 4, vectors[3], person('d'))  # patient 2 is not resident: skipped, loaded later
+    assert shards.search_batch(1, vectors[2:3], threshold=0.1)[0][0]['id'] == 3
+    assert shards.stats()['people'] == 3
+
+    shards.remove(1, patient_id=1)
+    assert shards.search_batch(1, vectors[:1], threshold=0.1) == [[]]
+    shards.remove(3)
+    assert shards.search_batch(1, vectors[2:3], threshold=0.1) == [[]]
+
+
+def test_shards_evict_least_recently_used_beyond_the_memory_cap():
+    vectors = embeddings(3)
+
+    def loader(patient_id):
+        return [patient_id], vectors[patient_id - 1:patient_id], [person(str(patient_id))]
+
+    one_shard = FaceIndex(initial_capacity=8)
+    one_shard.load([1], vectors[:1], [person('1')])
+    shards = ShardedFaceIndex(loader, max_bytes=2 * one_shard.nbytes)
+    for patient_id in (1, 2, 1, 3):
+        shards.shard(patient_id)
+
+    stats = shards.stats()
+    assert stats['shards'] == 2
+    assert stats['evictions'] == 1
+    shards.shard(1)
+    assert shards.stats()['misses'] == 3  # 1, 2 and 3; patient 1 stayed resident
+
+
+def test_writes_during_a_load_are_replayed_before_the_shard_is_published():
+    vectors = embeddings(3)
+    shards = None
+
+    def loader(patient_id):
+        rows = [1, 2], vectors[:2], [person('a'), person('b')]
+        # Committed after the SELECT above, while the shard is still being built
+        shards.add(1, 3, vectors[2], person('c'))
+        shards.remove(2, patient_id=1)
+        return rows
+
+    shards = ShardedFaceIndex(loader)
+    assert shards.search_batch(1, vectors[2:3], threshold=0.1)[0][0]['id'] == 3
+    assert shards.search_batch(1, vectors[1:2], threshold=0.1) == [[]]
+    assert shards.stats()['people'] == 2
+    assert shards._pending == {}
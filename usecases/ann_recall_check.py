@@ -0,0 +1,60 @@
+"""Check HNSW recall against exact search on a local Postgres with pgvector.
+
+Example against a throwaway container:
+
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres pgvector/pgvector:pg16
+    DB_HOST=localhost DB_NAME=postgres DB_USER=postgres DB_PASSWORD=postgres \
+        python -m usecases.ann_recall_check --seed 5000 --queries 200
+"""
+import argparse
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+from usecases.embedding_codec import encode_embedding
+from usecases.face_database import FaceDatabase, to_vector_literal
+
+
+def seed_synthetic_people(face_db: FaceDatabase, count: int) -> int:
+    """Insert `count` random 128-d embeddings under a dedicated patient"""
+    rng = np.random.default_rng(0)
+    patient_id = face_db.add_patient("Recall", "Check")
+    embeddings = rng.normal(0.0, 0.1, size=(count, 128))
+    rows = [
+        (patient_id, f"Synthetic{i}", "Person", "synthetic",
+         psycopg2.Binary(encode_embedding(embedding)), to_vector_literal(embedding), None)
+        for i, embedding in enumerate(embeddings)
+    ]
+    with face_db.pool.connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO people
+                    (patient_id, first_name, last_name,
+                     relationship, face_embedding_f32, face_embedding_vec, notes)
+                VALUES %s
+            """, rows, template="(%s, %s, %s, %s, %s, %s::vector, %s)", page_size=1000)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=0, help='Insert this many synthetic people first')
+    parser.add_argument('--queries', type=int, default=100, help='Number of sampled queries')
+    parser.add_argument('--k', type=int, default=5, help='Neighbours compared per query')
+    parser.add_argument('--min-recall', type=float, default=0.95, help='Exit non-zero below this recall')
+    args = parser.parse_args()
+
+    face_db = FaceDatabase()
+    if args.seed:
+        print(f"Seeded {seed_synthetic_people(face_db, args.seed)} synthetic people")
+
+    report = face_db.measure_ann_recall(sample_size=args.queries, k=args.k)
+    print(f"recall@{report['k']} = {report['recall']:.4f} "
+          f"over {report['queries']} queries (ef_search={report['ef_search']})")
+    if report['recall'] < args.min_recall:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import io
+import os
+import zipfile
+from typing import Dict, List
+
+import numpy as np
+
+from usecases.face_database import FaceDatabase
+from usecases.face_identification import encode_images_parallel
+from utilities.constants import bulk_enrollment_max_bytes, bulk_enrollment_max_image_bytes
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def read_images_from_archive(archive_bytes: bytes) -> Dict[str, bytes]:
+    """Extract image files from a zip archive, keyed by their path inside the archive.
+
+    Sizes are checked against the declared uncompressed sizes before anything
+    is inflated; zipfile never reads a member past its declared size.
+    """
+    images = {}
+    with zipfile.ZipFile(io.BytesIO(archive_bytes)) as archive:
+        entries = [info for info in archive.infolist()
+                   if not info.is_dir() and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS]
+        for info in entries:
+            if info.file_size > bulk_enrollment_max_image_bytes:
+                raise ValueError(f"Image {info.filename} exceeds the bulk enrollment per-image size limit")
+        if sum(info.file_size for info in entries) > bulk_enrollment_max_bytes:
+            raise ValueError("Archive exceeds the bulk enrollment size limit")
+        for info in entries:
+            if info.filename in images:
+                raise ValueError(f"Archive contains {info.filename} more than once")
+            images[info.filename] = archive.read(info)
+    return images
+
+
+def enroll_people(face_db: FaceDatabase,
+                  people: List[Dict],
+                  images: Dict[str, bytes],
+                  patient_id: int,
+                  average_embeddings: bool = True) -> Dict:
+    """Enroll several people from many photos in one pass.
+
+    :param face_db: Database the people are written to.
+    :param people: Manifest entries with first_name, last_name, relationship,
+                   personal_context and the list of image file names for that person.
+    :param images: Encoded image bytes keyed by file name (path inside the archive for zipped images).
+    :param patient_id: Existing patient the people belong to.
+    :param average_embeddings: Store one mean embedding per person instead of one row per photo.
+    :return: Person ids per manifest entry and the images that could not be used.
+    """
+    if not people:
+        raise ValueError("No people provided")
+    if patient_id is None:
+        raise ValueError("A patient_id is required for bulk enrollment")
+
+    for person in people:
+        for field in ('first_name', 'last_name', 'relationship'):
+            if not person.get(field):
+                raise ValueError(f"Missing '{field}' for a person in the manifest")
+        missing = [name for name in person.get('images', []) if name not in images]
+        if missing:
+            raise ValueError(f"Images not found in upload: {', '.join(missing)}")
+        if not person.get('images'):
+            raise ValueError(f"No images listed for {person['first_name']} {person['last_name']}")
+
+    # Encode every referenced image once, in parallel across cores
+    file_names = sorted({name for person in people for name in person['images']})
+    encoded = dict(zip(file_names, encode_images_parallel([images[name] for name in file_names])))
+    failed_images = {name: error for name, (_, error) in encoded.items() if error}
+
+    rows, owners = [], []
+    for index, person in enumerate(people):
+        embeddings = [encoded[name][0] for name in person['images'] if encoded[name][0] is not None]
+        if not embeddings:
+            continue
+        if average_embeddings:
+            embeddings = [np.mean(embeddings, axis=0)]
+        for embedding in embeddings:
+            rows.append({
+                'patient_id': patient_id,
+                'first_name': person['first_name'],
+                'last_name': person['last_name'],
+                'relationship': person['relationship'],
+                'face_embedding': embedding,
+                'notes': person.get('personal_context')
+            })
+            owners.append(index)
+
+    person_ids = face_db.add_people(rows)
+
+    results = [{
+        'first_name': person['first_name'],
+        'last_name': person['last_name'],
+        'person_ids': [],
+        'images_used': sum(1 for name in person['images'] if name not in failed_images)
+    } for person in people]
+    for owner, person_id in zip(owners, person_ids):
+        results[owner]['person_ids'].append(person_id)
+
+    return {
+        'patient_id': patient_id,
+        'people': results,
+        'failed_images': failed_images
+    }
@@ -0,0 +1,277 @@
+"""Keeps each replica's in-memory face indexes in sync with the people table.
+
+A trigger (migration V5) appends every insert, update and delete on people
+to people_changes and sends a NOTIFY on the people_changes channel. Each
+replica LISTENs on a dedicated connection and, when woken (or every poll
+interval, in case a notification was missed or LISTEN is unavailable),
+applies the changes after the last position it has seen. Only the changed
+rows are re-read, so replicas never reload the whole table.
+
+A position is (txid, change_id). change_id values are handed out before
+their transaction commits, so a lower one can become visible after a
+higher one. The feed therefore only reads changes from transactions older
+than the snapshot's xmin (the oldest transaction still in flight); no
+change can appear behind those later, so the position never skips one.
+A long-running write transaction delays the feed until it ends.
+
+Try it with a local Postgres and two processes:
+
+    python -m usecases.change_feed watch
+    python -m usecases.change_feed add --patient-id 1 --first-name Ada
+    python -m usecases.change_feed delete --person-id 42
+"""
+import argparse
+import logging
+import select
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import psycopg2
+import psycopg2.extensions
+
+from usecases.embedding_codec import decode_embedding
+from usecases.face_database import FaceDatabase
+from utilities.constants import (change_feed_poll_seconds, change_feed_batch_size, change_feed_retention_hours)
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'people_changes'
+
+# (txid, change_id) of the last change applied; changes after it are still to come
+FeedPosition = Tuple[int, int]
+
+
+class ChangeFeed:
+    """Background listener that applies people changes to a FaceDatabase's indexes"""
+
+    def __init__(self,
+                 face_db: FaceDatabase,
+                 poll_seconds: float = change_feed_poll_seconds,
+                 batch_size: int = change_feed_batch_size,
+                 retention_hours: float = change_feed_retention_hours):
+        self.face_db = face_db
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.retention_hours = retention_hours
+        self.position: Optional[FeedPosition] = None
+        self.last_change_id: Optional[int] = None
+        self.running = False
+        self.thread = None
+        self._listen_conn = None
+        self._wake = threading.Event()
+        self._apply_lock = threading.Lock()
+        self._last_prune = 0.0
+        self._applied = 0
+        self._notifications = 0
+        self._polls = 0
+        self._lag_seconds = 0.0
+
+    def current_position(self) -> FeedPosition:
+        """A position every change visible from now on comes after"""
+        with self.face_db.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")
+                return int(cur.fetchone()[0]), 0
+
+    def _connect_listener(self):
+        """Open the LISTEN connection; on failure the feed keeps polling"""
+        try:
+            conn = psycopg2.connect(**self.face_db.connection_params)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            self._listen_conn = conn
+            logger.info("Change feed listening for notifications")
+        except psycopg2.Error as e:
+            self._listen_conn = None
+            logger.warning(f"Change feed LISTEN unavailable, polling every {self.poll_seconds}s: {e}")
+
+    def _wait_for_changes(self):
+        """Block until a notification arrives or the poll interval passes"""
+        conn = self._listen_conn
+        if conn is None:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            self._polls += 1
+            return
+        try:
+            ready, _, _ = select.select([conn], [], [], self.poll_seconds)
+            if ready:
+                conn.poll()
+                self._notifications += len(conn.notifies)
+                conn.notifies.clear()
+            else:
+                self._polls += 1
+        except (psycopg2.Error, OSError, ValueError) as e:
+            logger.warning(f"Change feed lost its LISTEN connection: {e}")
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+            self._listen_conn = None
+
+    def apply_pending(self) -> int:
+        """Apply every settled change after the current position; returns how many were applied"""
+        with self._apply_lock:
+            applied = self._apply_batches()
+        self._applied += applied
+        return applied
+
+    def _apply_batches(self) -> int:
+        applied = 0
+        while True:
+            with self.face_db.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    # The joined row is the person's current state, so replaying is idempotent.
+                    # Transactions older than xmin have all ended, so nothing new can sort before them
+                    cur.execute("""
+                        SELECT c.change_id, c.person_id, c.patient_id, c.op,
+                               EXTRACT(EPOCH FROM now() - c.changed_at),
+                               p.id, p.patient_id, p.first_name, p.last_name,
+                               p.relationship, p.notes, p.face_embedding_f32, c.txid::text
+                        FROM people_changes c
+                        LEFT JOIN people p ON p.id = c.person_id
+                        WHERE (c.txid, c.change_id) > (%s::text::xid8, %s)
+                          AND c.txid < pg_snapshot_xmin(pg_current_snapshot())
+                        ORDER BY c.txid, c.change_id
+                        LIMIT %s
+                    """, (str(self.position[0]), self.position[1], self.batch_size))
+                    rows = cur.fetchall()
+            for row in rows:
+                self._apply(row)
+                self.position = (int(row[12]), row[0])
+                self.last_change_id = row[0]
+            if rows:
+                self._lag_seconds = max(0.0, float(rows[-1][4]))
+            applied += len(rows)
+            if len(rows) < self.batch_size:
+                return applied
+
+    def _apply(self, row):
+        (_, person_id, change_patient_id, op, _,
+         current_id, patient_id, first_name, last_name, relationship, notes, embedding, _) = row
+        face_index, shards = self.face_db.face_index, self.face_db.patient_shards
+        if op == 'D':
+            shards.remove(person_id, patient_id=change_patient_id)
+            if current_id is None:
+                face_index.remove(person_id)
+            return
+
+        if current_id is None or embedding is None:
+            # Deleted since, or not encoded yet; a later change covers it
+            return
+        face_embedding = decode_embedding(embedding)
+        metadata = {'first_name': first_name, 'last_name': last_name, 'relationship': relationship, 'notes': notes}
+        with face_index.lock:
+            if face_index.loaded:
+                face_index.upsert(person_id, face_embedding, metadata)
+        shards.upsert(patient_id, person_id, face_embedding, metadata)
+
+    def _prune(self):
+        """Drop change log entries older than the retention window, at most once an hour"""
+        if time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        with self.face_db.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM people_changes WHERE changed_at < now() - %s * interval '1 hour'",
+                            (self.retention_hours,))
+
+    def run(self):
+        self._connect_listener()
+        while self.running:
+            self._wait_for_changes()
+            if not self.running:
+                break
+            try:
+                self.apply_pending()
+                self._prune()
+            except Exception as e:
+                logger.error(f"Change feed failed to apply changes: {e}")
+            if self._listen_conn is None and self.running:
+                self._connect_listener()
+
+    def start(self, from_position: Optional[FeedPosition] = None):
+        """Begin following the feed from the current position.
+
+        Anything already resident is dropped so it reloads from a snapshot
+        taken after this point; changes after it are applied incrementally.
+        With `from_position` the resident index is kept, as already current
+        up to that position (see people_bulk.warm_face_index).
+        """
+        if self.running:
+            return
+        if from_position is not None:
+            self.position = from_position
+        else:
+            self.position = self.current_position()
+            with self.face_db.face_index.lock:
+                self.face_db.face_index.clear()
+        self.face_db.patient_shards.clear()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True, name='change-feed')
+        self.thread.start()
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            self._wake.set()
+            self.thread.join(timeout=self.poll_seconds + 1)
+            if self._listen_conn is not None:
+                self._listen_conn.close()
+                self._listen_conn = None
+
+    def stats(self) -> Dict:
+        return {
+            'running': self.running,
+            'listening': self._listen_conn is not None,
+            'last_change_id': self.last_change_id or 0,
+            'position_txid': self.position[0] if self.position else 0,
+            'changes_applied': self._applied,
+            'notifications': self._notifications,
+            'polls': self._polls,
+            'lag_seconds': self._lag_seconds
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('watch', help='Follow the feed and print the index size as changes arrive')
+    add = commands.add_parser('add', help='Insert a person with a random embedding')
+    add.add_argument('--patient-id', type=int, required=True)
+    add.add_argument('--first-name', default='Test')
+    add.add_argument('--last-name', default='Person')
+    delete = commands.add_parser('delete', help='Delete a person')
+    delete.add_argument('--person-id', type=int, required=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    face_db = FaceDatabase()
+    if args.command == 'add':
+        embedding = np.random.default_rng().normal(0, 0.1, 128)
+        person_id = face_db.add_person(args.patient_id, args.first_name, args.last_name, 'friend', embedding, '')
+        print(f"Added person {person_id}")
+    elif args.command == 'delete':
+        print("Deleted" if face_db.delete_person(args.person_id) else "No such person")
+    else:
+        feed = ChangeFeed(face_db)
+        feed.start()
+        face_db.load_face_index()
+        applied = 0
+        try:
+            while True:
+                time.sleep(1)
+                stats = feed.stats()
+                if stats['changes_applied'] != applied:
+                    applied = stats['changes_applied']
+                    print(f"Applied {applied} changes (last {stats['last_change_id']}, "
+                          f"listening={stats['listening']}); index holds {len(face_db.face_index)} people")
+        except KeyboardInterrupt:
+            feed.stop()
+
+
+if __name__ == "__main__":
+    main()
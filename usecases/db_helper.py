@@ -85,9 +85,9 @@ class FaceDatabase:
                         p.first_name,
                         p.last_name,
                         p.relationship,
-                        1 - (p.face_embedding <-> %s::vector) as similarity
+                        1 - (p.face_embedding_vec <-> %s::vector) as similarity
                     FROM people p
-                    WHERE 1 - (p.face_embedding <-> %s::vector) > %s
+                    WHERE 1 - (p.face_embedding_vec <-> %s::vector) > %s
                     ORDER BY similarity DESC
                     LIMIT 5
                 """, (vector_str, vector_str, threshold))
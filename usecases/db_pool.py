@@ -0,0 +1,171 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict
+
+import psycopg2
+from psycopg2 import pool
+
+from usecases.metrics import db_errors_total
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool with health checks and checkout metrics"""
+
+    def __init__(self,
+                 connection_params: Dict,
+                 min_size: int = 1,
+                 max_size: int = 10,
+                 checkout_timeout: float = 30.0,
+                 health_check_interval: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.connection_params = connection_params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        # The underlying pool is created on first checkout so that importing the
+        # service does not require the database to be reachable
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        # Keyed by the connection itself: ids are reused once a closed connection is collected
+        self._last_used: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+        self._metrics_lock = threading.Lock()
+        self._in_use = 0
+        self._checkouts = 0
+        self._checkout_timeouts = 0
+        self._stale_discarded = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    def _get_pool(self) -> pool.ThreadedConnectionPool:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = pool.ThreadedConnectionPool(
+                        self.min_size, self.max_size, **self.connection_params
+                    )
+        return self._pool
+
+    def _discard(self, conn):
+        """Close a connection and remove it from the pool"""
+        self._last_used.pop(conn, None)
+        try:
+            self._get_pool().putconn(conn, close=True)
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn) -> bool:
+        """Check a connection that has been idle longer than the health check interval"""
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(conn)
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _checkout_healthy(self):
+        # Every stale connection is replaced at most once per slot
+        for _ in range(self.max_size + 1):
+            conn = self._get_pool().getconn()
+            if self._is_healthy(conn):
+                return conn
+            with self._metrics_lock:
+                self._stale_discarded += 1
+            self._discard(conn)
+        raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of one request.
+
+        The transaction is committed when the block exits normally and rolled
+        back if it raises; broken connections are dropped instead of returned.
+        """
+        wait_start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._metrics_lock:
+                self._checkout_timeouts += 1
+            db_errors_total.inc('checkout_timeout')
+            raise PoolTimeoutError(
+                f"Timed out after {self.checkout_timeout}s waiting for a database connection"
+            )
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            db_errors_total.inc('connect')
+            raise
+
+        wait_seconds = time.perf_counter() - wait_start
+        with self._metrics_lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_seconds_total += wait_seconds
+            self._wait_seconds_max = max(self._wait_seconds_max, wait_seconds)
+
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            db_errors_total.inc('connection_lost')
+            raise
+        except Exception as e:
+            if isinstance(e, psycopg2.Error):
+                db_errors_total.inc('query')
+            try:
+                conn.rollback()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                broken = True
+            raise
+        finally:
+            with self._metrics_lock:
+                self._in_use -= 1
+            if broken or conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[conn] = time.monotonic()
+                self._get_pool().putconn(conn)
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        """Snapshot of pool size, checkout counts and wait times"""
+        with self._metrics_lock:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "checkout_timeouts": self._checkout_timeouts,
+                "stale_connections_discarded": self._stale_discarded,
+                "wait_seconds_total": self._wait_seconds_total,
+                "wait_seconds_max": self._wait_seconds_max,
+                "wait_seconds_avg": self._wait_seconds_total / self._checkouts if self._checkouts else 0.0,
+            }
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
@@ -0,0 +1,36 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from usecases.face_index import EMBEDDING_DIM
+
+# Packed big-endian float32, the same byte layout Postgres' float4send produces,
+# so migrations can backfill the column in SQL
+EMBEDDING_DTYPE = np.dtype('>f4')
+
+
+def encode_embedding(embedding: np.ndarray) -> bytes:
+    """Pack an embedding into EMBEDDING_DIM * 4 bytes"""
+    embedding = np.asarray(embedding).reshape(-1)
+    if embedding.shape[0] != EMBEDDING_DIM:
+        raise ValueError(f"Expected a {EMBEDDING_DIM}-d embedding, got {embedding.shape[0]}")
+    return embedding.astype(EMBEDDING_DTYPE).tobytes()
+
+
+def decode_embedding(data: Optional[bytes]) -> Optional[np.ndarray]:
+    """Unpack a single stored embedding into a native float32 array"""
+    if data is None:
+        return None
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE).astype(np.float32)
+
+
+def decode_embeddings(values: Iterable[bytes], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Decode a whole result set column into one (n, dim) float32 matrix.
+
+    The buffers are concatenated once and reinterpreted in a single
+    vectorized pass, with no per-row Python parsing.
+    """
+    data = b''.join(bytes(value) for value in values)
+    if len(data) % (dim * EMBEDDING_DTYPE.itemsize):
+        raise ValueError("Embedding buffers are not a whole number of vectors")
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE).astype(np.float32).reshape(-1, dim)
@@ -1,45 +1,157 @@
+import logging
 import os
-import psycopg2
+import re
 import numpy as np
-from typing import List, Dict
-from utilities.constants import db_password, db_user
-import ast  # Add this import at the top of your file
+from typing import List, Dict, Optional, Tuple
+from utilities.constants import (db_password, db_user, db_host, db_port, db_pool_min_size, db_pool_max_size,
+                                 db_pool_checkout_timeout, db_pool_health_check_interval,
+                                 face_search_backend, hnsw_ef_search, vector_backfill_batch_size)
+import psycopg2
+from psycopg2.extras import execute_values
+from usecases.db_pool import ConnectionPool
+from usecases.embedding_codec import encode_embedding, decode_embeddings
+from usecases.quantized_face_index import make_face_index
+from usecases.sharded_face_index import ShardedFaceIndex
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+# Any constant works; it only has to be the same for every replica running migrations
+MIGRATION_LOCK_ID = 7245001
+
+
+def migration_files() -> List[Tuple[int, str]]:
+    """(version, path) of each migration script, ordered by its V<n>_ prefix"""
+    versions = []
+    for name in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r'V(\d+)_.*\.sql$', name)
+        if match:
+            versions.append((int(match.group(1)), os.path.join(MIGRATIONS_DIR, name)))
+    return sorted(versions)
+
+
+def to_vector_literal(embedding: np.ndarray) -> str:
+    """Format an embedding as a pgvector text literal"""
+    return '[' + ','.join(repr(float(x)) for x in np.asarray(embedding).ravel()) + ']'
 
 
 class FaceDatabase:
     def __init__(self):
         # Database connection parameters
         self.connection_params = {
-            "host": "34.42.252.84",
+            "host": db_host,
+            "port": db_port,
             "database": os.getenv("DB_NAME", "cloud-sql-recallme"),
             "user": db_user,
             "password": db_password
         }
 
+        # Shared connection pool used by every query
+        self.pool = ConnectionPool(
+            self.connection_params,
+            min_size=db_pool_min_size,
+            max_size=db_pool_max_size,
+            checkout_timeout=db_pool_checkout_timeout,
+            health_check_interval=db_pool_health_check_interval
+        )
+
+        # Resident embedding index, loaded lazily on the first lookup (quantized if configured)
+        self.face_index = make_face_index(rerank_loader=self.load_exact_embeddings)
+        # Per-patient shards for patient-scoped lookups, loaded lazily and evicted under a memory cap
+        self.patient_shards = ShardedFaceIndex(self.load_patient_faces)
+
         # Initialize database on first run
         self.setup_database()
 
     def setup_database(self):
-        """Set up database tables using SQL file"""
+        """Set up database tables by applying the migrations not yet recorded in schema_migrations"""
         try:
-            with psycopg2.connect(**self.connection_params) as conn:
-                with conn.cursor() as cur:
-                    # Read and execute SQL file
-                    sql_path = os.path.join(
-                        os.path.dirname(__file__),
-                        'migrations',
-                        'V1_create_tables.sql'
+            applied = self.apply_migrations()
+            logger.info(f"Database setup completed, applied migrations {applied or 'none'}")
+            self.backfill_vector_embeddings()
+            self.backfill_binary_embeddings()
+        except Exception as e:
+            logger.error(f"Error setting up database: {e}")
+
+    def apply_migrations(self) -> List[int]:
+        """Run pending migrations in version order, each recorded once applied; returns their versions.
+
+        Replicas starting together serialize on an advisory lock, so each
+        migration runs exactly once. Databases created before the table existed
+        re-run every script once, which is safe because those were all idempotent.
+        """
+        applied = []
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
+                """)
+                cur.execute("SELECT version FROM schema_migrations")
+                done = {row[0] for row in cur.fetchall()}
+                for version, sql_path in migration_files():
+                    if version in done:
+                        continue
                     with open(sql_path, 'r') as sql_file:
                         cur.execute(sql_file.read())
+                    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                                (version, os.path.basename(sql_path)))
+                    applied.append(version)
+        return applied
+
+    def _backfill_column(self, column: str, expression: str, source_filter: str, batch_size: int) -> int:
+        """Fill a derived embedding column in committed batches so no single statement locks the table"""
+        total = 0
+        while True:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        UPDATE people
+                        SET {column} = {expression}
+                        WHERE id IN (
+                            SELECT id FROM people
+                            WHERE {column} IS NULL
+                              AND {source_filter}
+                            ORDER BY id
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                    """, (batch_size,))
+                    updated = cur.rowcount
                     conn.commit()
-                    print("Database setup completed successfully!")
-        except Exception as e:
-            print(f"Error setting up database: {e}")
+            total += updated
+            if updated < batch_size:
+                break
+        if total:
+            logger.info(f"Backfilled {total} rows of {column}")
+        return total
+
+    def backfill_vector_embeddings(self, batch_size: int = vector_backfill_batch_size) -> int:
+        """Copy FLOAT8[] embeddings into the pgvector column"""
+        return self._backfill_column(
+            'face_embedding_vec',
+            'face_embedding::vector(128)',
+            'array_length(face_embedding, 1) = 128',
+            batch_size
+        )
+
+    def backfill_binary_embeddings(self, batch_size: int = vector_backfill_batch_size) -> int:
+        """Pack FLOAT8[] embeddings into the float32 bytea column"""
+        return self._backfill_column(
+            'face_embedding_f32',
+            """(SELECT string_agg(float4send(x::float4), ''::bytea ORDER BY ord)
+                FROM unnest(face_embedding) WITH ORDINALITY AS u(x, ord))""",
+            'array_length(face_embedding, 1) = 128',
+            batch_size
+        )
 
     def add_patient(self, first_name: str, last_name: str) -> int:
         """Add a new patient"""
-        with psycopg2.connect(**self.connection_params) as conn:
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO patients (first_name, last_name)
@@ -59,28 +171,125 @@ class FaceDatabase:
                    face_embedding: np.ndarray,
                    notes: str) -> int:
         """Add a new person to the database"""
-        with psycopg2.connect(**self.connection_params) as conn:
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                # Convert numpy array to list
-                embedding_list = face_embedding.tolist()
                 cur.execute("""
                     INSERT INTO people 
                         (patient_id, first_name, last_name, 
-                         relationship, face_embedding, notes)
-                    VALUES (%s, %s, %s, %s, %s, %s)
+                         relationship, face_embedding_f32, face_embedding_vec, notes)
+                    VALUES (%s, %s, %s, %s, %s, %s::vector, %s)
                     RETURNING id
                 """, (patient_id, first_name, last_name,
-                      relationship, embedding_list, notes))
+                      relationship, psycopg2.Binary(encode_embedding(face_embedding)),
+                      to_vector_literal(face_embedding), notes))
                 person_id = cur.fetchone()[0]
                 conn.commit()
-                return person_id
 
+        # Keep the resident indexes in sync; unloaded ones pick the row up on first load
+        metadata = {
+            'first_name': first_name,
+            'last_name': last_name,
+            'relationship': relationship,
+            'notes': notes
+        }
+        with self.face_index.lock:
+            if self.face_index.loaded:
+                self.face_index.add(person_id, face_embedding, metadata)
+        self.patient_shards.add(patient_id, person_id, face_embedding, metadata)
+        return person_id
 
-    def find_similar_face(self,
-                          face_embedding: np.ndarray,
-                          threshold: float = 0.55) -> List[Dict]:
-        """Find similar faces in database"""
-        with psycopg2.connect(**self.connection_params) as conn:
+
+    def delete_person(self, person_id: int) -> bool:
+        """Delete a person and drop them from the resident indexes"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM people WHERE id = %s RETURNING patient_id", (person_id,))
+                row = cur.fetchone()
+                conn.commit()
+        if row is None:
+            return False
+        self.face_index.remove(person_id)
+        self.patient_shards.remove(person_id, patient_id=row[0])
+        return True
+
+    def add_people(self, people: List[Dict]) -> List[int]:
+        """Add many people in a single batched insert.
+
+        Each entry carries the same fields as add_person. Ids are returned in
+        input order.
+        """
+        if not people:
+            return []
+        rows = [(
+            person['patient_id'], person['first_name'], person['last_name'],
+            person['relationship'], psycopg2.Binary(encode_embedding(person['face_embedding'])),
+            to_vector_literal(person['face_embedding']), person.get('notes')
+        ) for person in people]
+
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                returned = execute_values(cur, """
+                    INSERT INTO people 
+                        (patient_id, first_name, last_name, 
+                         relationship, face_embedding_f32, face_embedding_vec, notes)
+                    VALUES %s
+                    RETURNING id
+                """, rows, template="(%s, %s, %s, %s, %s, %s::vector, %s)",
+                    page_size=len(rows), fetch=True)
+                person_ids = [row[0] for row in returned]
+                conn.commit()
+
+        with self.face_index.lock:
+            for person_id, person in zip(person_ids, people):
+                metadata = {
+                    'first_name': person['first_name'],
+                    'last_name': person['last_name'],
+                    'relationship': person['relationship'],
+                    'notes': person.get('notes')
+                }
+                if self.face_index.loaded:
+                    self.face_index.add(person_id, person['face_embedding'], metadata)
+                self.patient_shards.add(person['patient_id'], person_id, person['face_embedding'], metadata)
+        return person_ids
+
+    @staticmethod
+    def _index_rows(rows) -> Tuple[List[int], np.ndarray, List[Dict]]:
+        """Split (id, first_name, last_name, relationship, face_embedding_f32, notes) rows for FaceIndex.load"""
+        ids = [row[0] for row in rows]
+        embeddings = decode_embeddings(row[4] for row in rows)
+        metadata = [{
+            'first_name': first_name,
+            'last_name': last_name,
+            'relationship': relationship,
+            'notes': notes
+        } for _, first_name, last_name, relationship, _, notes in rows]
+        return ids, embeddings, metadata
+
+    def load_face_index(self):
+        """Load every known person into the in-memory face index"""
+        with self.face_index.lock:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT 
+                            p.id,
+                            p.first_name,
+                            p.last_name,
+                            p.relationship,
+                            p.face_embedding_f32,
+                            p.notes
+                        FROM people p
+                        WHERE p.face_embedding_f32 IS NOT NULL
+                    """)
+                    rows = cur.fetchall()
+
+            ids, embeddings, metadata = self._index_rows(rows)
+            self.face_index.load(ids, embeddings, metadata)
+            logger.info(f"Loaded {len(ids)} face embeddings into the index")
+
+    def load_patient_faces(self, patient_id: int) -> Tuple[List[int], np.ndarray, List[Dict]]:
+        """One patient's people, for their in-memory shard"""
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     SELECT 
@@ -88,42 +297,181 @@ class FaceDatabase:
                         p.first_name,
                         p.last_name,
                         p.relationship,
-                        p.face_embedding,
+                        p.face_embedding_f32,
                         p.notes
                     FROM people p
-                """)
+                    WHERE p.patient_id = %s
+                      AND p.face_embedding_f32 IS NOT NULL
+                """, (patient_id,))
                 rows = cur.fetchall()
-                results = []
-                for row in rows:
-                    person_id = row[0]
-                    first_name = row[1]
-                    last_name = row[2]
-                    relationship = row[3]
-                    embedding_str = row[4]  # This is the string representation
-                    notes = row[5]
-
-                    # Parse the string into a list of floats
-                    try:
-                        embedding_list = ast.literal_eval(embedding_str)
-                    except (SyntaxError, ValueError) as parse_error:
-                        print(f"Error parsing embedding for person ID {person_id}: {parse_error}")
-                        continue  # Skip this record if parsing fails
-
-                    db_embedding = np.array(embedding_list, dtype=float)
-
-                    # Compute Euclidean distance
-                    distance = np.linalg.norm(face_embedding - db_embedding)
-                    if distance < threshold:
-                        similarity = 1 - distance  # Adjust based on your similarity measure
-                        results.append({
-                            'id': person_id,
-                            'first_name': first_name,
-                            'last_name': last_name,
-                            'relationship': relationship,
-                            'similarity': similarity,
-                            'personal context': notes
-                        })
-                # Sort results by similarity
-                results.sort(key=lambda x: x['similarity'], reverse=True)
-                return results[:5]
+        return self._index_rows(rows)
+
+    def load_exact_embeddings(self, person_ids: List[int]) -> np.ndarray:
+        """Stored float32 embeddings for `person_ids`, in order; people deleted since are rows of inf"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT p.id, p.face_embedding_f32
+                    FROM people p
+                    WHERE p.id = ANY(%s)
+                      AND p.face_embedding_f32 IS NOT NULL
+                """, (list(person_ids),))
+                rows = cur.fetchall()
+        embeddings = np.full((len(person_ids), self.face_index.dim), np.inf, dtype=np.float32)
+        if rows:
+            found = dict(zip((row[0] for row in rows), decode_embeddings(row[1] for row in rows)))
+            for i, person_id in enumerate(person_ids):
+                if person_id in found:
+                    embeddings[i] = found[person_id]
+        return embeddings
+
+    def _nearest_people(self, cur, face_embedding: np.ndarray, k: int) -> List[tuple]:
+        """Run the k-nearest-neighbour query on the pgvector column"""
+        vector_str = to_vector_literal(face_embedding)
+        cur.execute("""
+            SELECT 
+                p.id,
+                p.first_name,
+                p.last_name,
+                p.relationship,
+                p.notes,
+                p.face_embedding_vec <-> %s::vector AS distance
+            FROM people p
+            WHERE p.face_embedding_vec IS NOT NULL
+            ORDER BY p.face_embedding_vec <-> %s::vector
+            LIMIT %s
+        """, (vector_str, vector_str, k))
+        return cur.fetchall()
+
+    def find_similar_face_pgvector(self,
+                                   face_embedding: np.ndarray,
+                                   threshold: float = 0.55,
+                                   k: int = 5,
+                                   patient_id: Optional[int] = None) -> List[Dict]:
+        """Find similar faces with the HNSW index, filtering by threshold in Postgres.
+
+        With a patient_id only that patient's people are compared, by an exact
+        scan over the rows found through the patient_id index.
+        """
+        vector_str = to_vector_literal(face_embedding)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                if patient_id is not None:
+                    # MATERIALIZED keeps the planner from pushing the ORDER BY into the
+                    # global HNSW index, which would post-filter and could miss matches
+                    cur.execute("""
+                        WITH contacts AS MATERIALIZED (
+                            SELECT id, first_name, last_name, relationship, notes, face_embedding_vec
+                            FROM people
+                            WHERE patient_id = %s
+                              AND face_embedding_vec IS NOT NULL
+                        )
+                        SELECT id, first_name, last_name, relationship, notes, distance
+                        FROM (
+                            SELECT id, first_name, last_name, relationship, notes,
+                                   face_embedding_vec <-> %s::vector AS distance
+                            FROM contacts
+                        ) nearest
+                        WHERE distance < %s
+                        ORDER BY distance
+                        LIMIT %s
+                    """, (patient_id, vector_str, threshold, k))
+                    rows = cur.fetchall()
+                else:
+                    cur.execute("SET LOCAL hnsw.ef_search = %s", (max(hnsw_ef_search, k),))
+                    # The inner ORDER BY ... LIMIT is what the HNSW index can answer;
+                    # the threshold is applied to those candidates only
+                    cur.execute("""
+                        SELECT id, first_name, last_name, relationship, notes, distance
+                        FROM (
+                            SELECT 
+                                p.id,
+                                p.first_name,
+                                p.last_name,
+                                p.relationship,
+                                p.notes,
+                                p.face_embedding_vec <-> %s::vector AS distance
+                            FROM people p
+                            WHERE p.face_embedding_vec IS NOT NULL
+                            ORDER BY p.face_embedding_vec <-> %s::vector
+                            LIMIT %s
+                        ) nearest
+                        WHERE distance < %s
+                        ORDER BY distance
+                    """, (vector_str, vector_str, k, threshold))
+                    rows = cur.fetchall()
+
+        return [{
+            'id': person_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'relationship': relationship,
+            'similarity': 1 - float(distance),
+            'personal context': notes
+        } for person_id, first_name, last_name, relationship, notes, distance in rows]
+
+    def measure_ann_recall(self, sample_size: int = 100, k: int = 5, noise: float = 0.02) -> Dict:
+        """Compare HNSW results with an exact sequential scan on sampled queries.
+
+        Queries are stored embeddings with a little Gaussian noise added so
+        they do not trivially match themselves.
+        """
+        rng = np.random.default_rng()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT face_embedding_f32 FROM people
+                    WHERE face_embedding_vec IS NOT NULL
+                      AND face_embedding_f32 IS NOT NULL
+                    ORDER BY random()
+                    LIMIT %s
+                """, (sample_size,))
+                samples = decode_embeddings(row[0] for row in cur.fetchall())
+
+                hits, expected = 0, 0
+                for sample in samples:
+                    query = sample + rng.normal(0.0, noise, sample.shape)
+
+                    cur.execute("SET LOCAL hnsw.ef_search = %s", (max(hnsw_ef_search, k),))
+                    cur.execute("SET LOCAL enable_indexscan = on")
+                    ann_ids = {row[0] for row in self._nearest_people(cur, query, k)}
+
+                    # Without index scans the planner falls back to an exact scan and sort
+                    cur.execute("SET LOCAL enable_indexscan = off")
+                    exact_ids = {row[0] for row in self._nearest_people(cur, query, k)}
+
+                    hits += len(ann_ids & exact_ids)
+                    expected += len(exact_ids)
+
+        return {
+            'queries': len(samples),
+            'k': k,
+            'ef_search': max(hnsw_ef_search, k),
+            'recall': hits / expected if expected else 1.0
+        }
+
+    def find_similar_face(self,
+                          face_embedding: np.ndarray,
+                          threshold: float = 0.55,
+                          patient_id: Optional[int] = None) -> List[Dict]:
+        """Find similar faces in database, among one patient's people when patient_id is given"""
+        return self.find_similar_faces(face_embedding, threshold=threshold, patient_id=patient_id)[0]
+
+    def find_similar_faces(self,
+                           face_embeddings: np.ndarray,
+                           threshold: float = 0.55,
+                           patient_id: Optional[int] = None) -> List[List[Dict]]:
+        """Find similar faces for several query faces; one result list per face"""
+        face_embeddings = np.asarray(face_embeddings).reshape(-1, self.face_index.dim)
+        if face_search_backend == 'pgvector':
+            return [self.find_similar_face_pgvector(embedding, threshold=threshold, k=5, patient_id=patient_id)
+                    for embedding in face_embeddings]
+
+        if patient_id is not None:
+            return self.patient_shards.search_batch(patient_id, face_embeddings, threshold=threshold, k=5)
 
+        if not self.face_index.loaded:
+            with self.face_index.lock:
+                if not self.face_index.loaded:
+                    self.load_face_index()
+        return self.face_index.search_batch(face_embeddings, threshold=threshold, k=5)
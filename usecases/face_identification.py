@@ -1,23 +1,116 @@
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 import numpy as np
 import face_recognition
+from utilities.constants import enrollment_workers
 
-def add_person_from_image(image_path: str) -> np.ndarray:
-    """Extract face embedding from an image file"""
-    # Load the image file
-    image = face_recognition.load_image_file(image_path)
-    if image is None:
-        raise ValueError(f"Image at path {image_path} could not be read")
+_executor = None
+_executor_lock = threading.Lock()
+
+def face_area(location: Tuple[int, int, int, int]) -> int:
+    """Area of a (top, right, bottom, left) face box"""
+    top, right, bottom, left = location
+    return (bottom - top) * (right - left)
+
+
+def face_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    intersection = max(0, bottom - top) * max(0, right - left)
+    union = face_area(a) + face_area(b) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def locate_faces_in_regions(image: np.ndarray,
+                            regions: np.ndarray,
+                            padding: float = 0.15) -> List[Tuple[int, int, int, int]]:
+    """Run face localization only inside padded (x1, y1, x2, y2) regions of an image.
+
+    Returned boxes are in full-image (top, right, bottom, left) coordinates;
+    faces found twice in overlapping regions are kept once.
+    """
+    height, width = image.shape[:2]
+    face_locations = []
+    for x1, y1, x2, y2 in np.asarray(regions).reshape(-1, 4):
+        pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+        left, top = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+        right, bottom = min(width, int(x2 + pad_x)), min(height, int(y2 + pad_y))
+        if right <= left or bottom <= top:
+            continue
+
+        crop = np.ascontiguousarray(image[top:bottom, left:right])
+        for crop_top, crop_right, crop_bottom, crop_left in face_recognition.face_locations(crop):
+            location = (crop_top + top, crop_right + left, crop_bottom + top, crop_left + left)
+            if all(face_iou(location, existing) < 0.5 for existing in face_locations):
+                face_locations.append(location)
+    return face_locations
+
+
+def encode_all_faces(image: np.ndarray,
+                     face_locations: Optional[List[Tuple[int, int, int, int]]] = None
+                     ) -> Tuple[List[Tuple[int, int, int, int]], np.ndarray]:
+    """Locate (unless boxes are given) and encode every face in an RGB image.
+
+    :return: Face boxes as (top, right, bottom, left) and an (n, 128) embedding matrix.
+    """
+    if face_locations is None:
+        face_locations = face_recognition.face_locations(image)
+    if not face_locations:
+        return [], np.empty((0, 128))
+    face_encodings = face_recognition.face_encodings(image, face_locations)
+    return face_locations, np.array(face_encodings).reshape(-1, 128)
+
+
+def add_person_from_image(image_bytes: bytes) -> np.ndarray:
+    """Extract face embedding from an encoded image held in memory"""
+    # Decode the image straight from the buffer, no temporary file
+    try:
+        image = face_recognition.load_image_file(io.BytesIO(image_bytes))
+    except Exception as e:
+        raise ValueError(f"Image could not be read: {e}")
 
     # Detect face locations in the image
     face_locations = face_recognition.face_locations(image)
     if not face_locations:
         raise ValueError("No face found in the image")
 
-    # Get the face embedding for the first face found
-    face_encodings = face_recognition.face_encodings(image, face_locations)
+    # Enroll the largest face, which is the subject of the photo
+    largest_face = max(face_locations, key=face_area)
+    face_encodings = face_recognition.face_encodings(image, [largest_face])
     if not face_encodings:
         raise ValueError("Could not compute face embedding")
 
     face_embedding = face_encodings[0]
 
     return face_embedding
+
+
+def _encode_image(image_bytes: bytes) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    """Worker entry point: return (embedding, None) or (None, error message)"""
+    try:
+        return add_person_from_image(image_bytes), None
+    except ValueError as e:
+        return None, str(e)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn avoids forking a multi-threaded web server process
+            _executor = ProcessPoolExecutor(
+                max_workers=enrollment_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def encode_images_parallel(images: List[bytes]) -> List[Tuple[Optional[np.ndarray], Optional[str]]]:
+    """Compute face embeddings for many images across CPU cores, preserving order"""
+    if len(images) <= 1:
+        return [_encode_image(image_bytes) for image_bytes in images]
+    return list(_get_executor().map(_encode_image, images))
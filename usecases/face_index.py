@@ -0,0 +1,177 @@
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+EMBEDDING_DIM = 128
+
+
+def match_result(person_id: int, person: Dict, distance: float) -> Dict:
+    """The match dict returned by every face lookup"""
+    return {
+        'id': int(person_id),
+        'first_name': person['first_name'],
+        'last_name': person['last_name'],
+        'relationship': person['relationship'],
+        'similarity': 1 - float(distance),
+        'personal context': person.get('notes')
+    }
+
+
+class FaceIndex:
+    """Resident float32 index of known face embeddings.
+
+    Embeddings live in one contiguous matrix with parallel id and metadata
+    arrays, so a lookup is a single batched distance computation instead of
+    a row-by-row scan.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, initial_capacity: int = 64):
+        self.dim = dim
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._initial_capacity = initial_capacity
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the embedding, norm and id arrays"""
+        return self._matrix.nbytes + self._sq_norms.nbytes + self._ids.nbytes
+
+    def clear(self):
+        """Drop every embedding from the index"""
+        with self.lock:
+            self._matrix = np.empty((self._initial_capacity, self.dim), dtype=np.float32)
+            self._sq_norms = np.empty(self._initial_capacity, dtype=np.float32)
+            self._ids = np.empty(self._initial_capacity, dtype=np.int64)
+            self._metadata: List[Dict] = []
+            self._size = 0
+            self.loaded = False
+
+    def _reserve(self, capacity: int):
+        """Grow the backing arrays so they can hold at least `capacity` rows"""
+        if capacity <= self._matrix.shape[0]:
+            return
+        new_capacity = max(capacity, 2 * self._matrix.shape[0])
+        matrix = np.empty((new_capacity, self.dim), dtype=np.float32)
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        ids = np.empty(new_capacity, dtype=np.int64)
+        matrix[:self._size] = self._matrix[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._sq_norms, self._ids = matrix, sq_norms, ids
+
+    def load(self, ids: List[int], embeddings: np.ndarray, metadata: List[Dict]):
+        """Replace the index contents with a full snapshot of known people"""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if not (len(ids) == embeddings.shape[0] == len(metadata)):
+            raise ValueError("ids, embeddings and metadata must have the same length")
+
+        with self.lock:
+            self.clear()
+            self._reserve(len(ids))
+            self._size = len(ids)
+            self._matrix[:self._size] = embeddings
+            self._sq_norms[:self._size] = np.einsum('ij,ij->i', embeddings, embeddings)
+            self._ids[:self._size] = ids
+            self._metadata = list(metadata)
+            self.loaded = True
+
+    def add(self, person_id: int, embedding: np.ndarray, metadata: Dict):
+        """Append a single person to the index"""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        with self.lock:
+            if person_id in self._ids[:self._size]:
+                return
+            self._reserve(self._size + 1)
+            self._matrix[self._size] = embedding
+            self._sq_norms[self._size] = embedding @ embedding
+            self._ids[self._size] = person_id
+            self._metadata.append(metadata)
+            self._size += 1
+
+    def _position(self, person_id: int) -> int:
+        positions = np.flatnonzero(self._ids[:self._size] == person_id)
+        return int(positions[0]) if len(positions) else -1
+
+    def upsert(self, person_id: int, embedding: np.ndarray, metadata: Dict):
+        """Insert a person or replace their embedding and metadata in place"""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        with self.lock:
+            position = self._position(person_id)
+            if position < 0:
+                self.add(person_id, embedding, metadata)
+                return
+            self._matrix[position] = embedding
+            self._sq_norms[position] = embedding @ embedding
+            self._metadata[position] = metadata
+
+    def remove(self, person_id: int) -> bool:
+        """Drop a person by moving the last row into their slot"""
+        with self.lock:
+            position = self._position(person_id)
+            if position < 0:
+                return False
+            last = self._size - 1
+            self._matrix[position] = self._matrix[last]
+            self._sq_norms[position] = self._sq_norms[last]
+            self._ids[position] = self._ids[last]
+            self._metadata[position] = self._metadata[last]
+            self._metadata.pop()
+            self._size = last
+            return True
+
+    def search(self,
+               face_embedding: np.ndarray,
+               threshold: float = 0.55,
+               k: int = 5) -> List[Dict]:
+        """Return up to k people whose embedding distance is below threshold"""
+        return self.search_batch(np.asarray(face_embedding).reshape(1, self.dim), threshold, k)[0]
+
+    def search_batch(self,
+                     face_embeddings: np.ndarray,
+                     threshold: float = 0.55,
+                     k: int = 5) -> List[List[Dict]]:
+        """Match several query faces at once; one result list per query row"""
+        queries = np.asarray(face_embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if queries.shape[0] == 0:
+            return []
+
+        with self.lock:
+            size = self._size
+            if size == 0:
+                return [[] for _ in range(queries.shape[0])]
+            matrix = self._matrix[:size]
+            sq_norms = self._sq_norms[:size]
+            ids = self._ids[:size].copy()
+            metadata = self._metadata[:size]
+
+            # ||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2, evaluated for every (query, row) pair at once
+            sq_distances = (sq_norms[np.newaxis, :]
+                            - 2.0 * (queries @ matrix.T)
+                            + np.einsum('ij,ij->i', queries, queries)[:, np.newaxis])
+
+        np.maximum(sq_distances, 0.0, out=sq_distances)
+        distances = np.sqrt(sq_distances)
+
+        if size > k:
+            candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(size), (queries.shape[0], size))
+        candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+        order = np.argsort(candidate_distances, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_distances = np.take_along_axis(candidate_distances, order, axis=1)
+
+        all_results = []
+        for row_candidates, row_distances in zip(candidates, candidate_distances):
+            results = []
+            for i, distance in zip(row_candidates, row_distances):
+                if distance >= threshold:
+                    break
+                results.append(match_result(ids[i], metadata[i], distance))
+            all_results.append(results)
+        return all_results
@@ -1,16 +1,9 @@
 import json
-import requests
+from typing import AsyncIterator, Iterable, Iterator, Optional
+from usecases.llm_cache import ResponseCache, context_cache_key
+from usecases.llm_client import llm_client
 
-
-def generate_message_with_llm(image_path: str, context: dict) -> dict:
-    """
-    Generate a message using the LLM API based on the provided context and image.
-
-    :param image_path: Path to the image file.
-    :param context: Dictionary containing context about the person.
-    :return: Response from the LLM API.
-    """
-    prompt_template = '''
+FACE_PROMPT_TEMPLATE = '''
 System Instruction: You are assisting a dementia patient in identifying and recalling people they see. Given context about the person in front of them, provide a friendly, comforting message to help the patient recognize who it is.
 
 Context:
@@ -30,37 +23,10 @@ Few-shot Examples:
 New Instance:
 Given the context: {context}
 Provide a comforting message that reminds the patient of the person's name, relationship, and something familiar about them.
+If the context lists several people, mention each of them.
 '''
-    # Inject the context into the prompt
-    context_str = json.dumps(context)
-    prompt = prompt_template.format(context=context_str)
 
-    # LLM API endpoint
-    llm_api_url = 'https://recallme-flask-service-1031256824093.us-central1.run.app/recall-svc/api/v1/reinforce_memory/gemini-media-inference'
-
-    # Send the request to the LLM API with the image and prompt
-    with open(image_path, 'rb') as img_file:
-        files = {'file': img_file}
-        data = {'input_text': prompt}
-        response = requests.post(llm_api_url, files=files, data=data)
-
-    if response.status_code == 200:
-        return response.json()
-    else:
-        # Raise an exception to be handled by the calling function
-        raise Exception(f"Failed to call LLM API: {response.status_code}, {response.text}")
-
-
-def assist_dementia_patient(image_path: str, context: dict) -> dict:
-    """
-    Generate assistance based on non-face image frames for a dementia patient,
-    providing context or reminders based on the scene.
-
-    :param image_path: Path to the image file.
-    :param context: Dictionary containing context about the scene, e.g., detected objects or situational cues.
-    :return: Response from the LLM API.
-    """
-    prompt_template = '''
+SCENE_PROMPT_TEMPLATE = '''
 System Instruction: You are assisting a dementia patient by providing reminders or helping them navigate their environment based on non-face image frames.
 
 Context:
@@ -104,21 +70,149 @@ Provide a useful reminder or assistance message that helps the patient navigate
 The context may include everyday household items. Ensure that your response is appropriate, 
 avoids sensitive topics, and is focused on helping the patient navigate their surroundings.
 '''
-    # Inject the context into the prompt
-    context_str = json.dumps(context)
-    prompt = prompt_template.format(context=context_str)
-
-    # LLM API endpoint
-    llm_api_url = 'https://recallme-flask-service-1031256824093.us-central1.run.app/recall-svc/api/v1/reinforce_memory/gemini-media-inference'
-
-    # Send the request to the LLM API with the image and prompt
-    with open(image_path, 'rb') as img_file:
-        files = {'file': img_file}
-        data = {'input_text': prompt}
-        response = requests.post(llm_api_url, files=files, data=data)
-
-    if response.status_code == 200:
-        return response.json()
-    else:
-        # Raise an exception to be handled by the calling function
-        raise Exception(f"Failed to call LLM API: {response.status_code}, {response.text}")
+
+
+def build_face_prompt(context: dict) -> str:
+    """Inject the person context into the recognition prompt"""
+    return FACE_PROMPT_TEMPLATE.format(context=json.dumps(context))
+
+
+def build_scene_prompt(context: dict) -> str:
+    """Inject the scene context into the assistance prompt"""
+    return SCENE_PROMPT_TEMPLATE.format(context=json.dumps(context))
+
+
+def _call_with_cache(cache: Optional[ResponseCache], prompt_kind: str, prompt: str, context: dict,
+                     person_ids: Optional[Iterable[int]], image_bytes: bytes, filename: str) -> dict:
+    if cache is None:
+        return llm_client.post_media(image_bytes, prompt, filename)
+    key = context_cache_key(prompt_kind, context, person_ids)
+    response = cache.get(key)
+    if response is None:
+        response = llm_client.post_media(image_bytes, prompt, filename)
+        cache.set(key, response)
+    return response
+
+
+async def _call_with_cache_async(cache: Optional[ResponseCache], prompt_kind: str, prompt: str, context: dict,
+                                 person_ids: Optional[Iterable[int]], image_bytes: bytes, filename: str) -> dict:
+    if cache is None:
+        return await llm_client.post_media_async(image_bytes, prompt, filename)
+    key = context_cache_key(prompt_kind, context, person_ids)
+    response = cache.get(key)
+    if response is None:
+        response = await llm_client.post_media_async(image_bytes, prompt, filename)
+        cache.set(key, response)
+    return response
+
+
+def generate_message_with_llm(image_bytes: bytes, context: dict, filename: str = 'frame.jpg',
+                              cache: Optional[ResponseCache] = None,
+                              person_ids: Optional[Iterable[int]] = None) -> dict:
+    """
+    Generate a message using the LLM API based on the provided context and image.
+
+    :param image_bytes: Encoded image (JPEG/PNG) as received from the client.
+    :param context: Dictionary containing context about the person, or {"people": [...]} for several.
+    :param filename: File name reported to the LLM API for the upload.
+    :param cache: Response cache to consult first; the image is not part of the cache key.
+    :param person_ids: Ids of the matched people, included in the cache key.
+    :return: Response from the LLM API.
+    """
+    prompt = build_face_prompt(context)
+    return _call_with_cache(cache, 'face', prompt, context, person_ids, image_bytes, filename)
+
+
+def assist_dementia_patient(image_bytes: bytes, context: dict, filename: str = 'frame.jpg',
+                            cache: Optional[ResponseCache] = None) -> dict:
+    """
+    Generate assistance based on non-face image frames for a dementia patient,
+    providing context or reminders based on the scene.
+
+    :param image_bytes: Encoded image (JPEG/PNG) as received from the client.
+    :param context: Dictionary containing context about the scene, e.g., detected objects or situational cues.
+    :param filename: File name reported to the LLM API for the upload.
+    :param cache: Response cache to consult first, keyed on the normalized object set.
+    :return: Response from the LLM API.
+    """
+    prompt = build_scene_prompt(context)
+    return _call_with_cache(cache, 'scene', prompt, context, None, image_bytes, filename)
+
+
+async def generate_message_with_llm_async(image_bytes: bytes, context: dict, filename: str = 'frame.jpg',
+                                          cache: Optional[ResponseCache] = None,
+                                          person_ids: Optional[Iterable[int]] = None) -> dict:
+    """Awaitable variant of generate_message_with_llm"""
+    prompt = build_face_prompt(context)
+    return await _call_with_cache_async(cache, 'face', prompt, context, person_ids, image_bytes, filename)
+
+
+async def assist_dementia_patient_async(image_bytes: bytes, context: dict, filename: str = 'frame.jpg',
+                                        cache: Optional[ResponseCache] = None) -> dict:
+    """Awaitable variant of assist_dementia_patient"""
+    prompt = build_scene_prompt(context)
+    return await _call_with_cache_async(cache, 'scene', prompt, context, None, image_bytes, filename)
+
+
+def _stream_with_cache(cache: Optional[ResponseCache], prompt_kind: str, prompt: str, context: dict,
+                       person_ids: Optional[Iterable[int]], image_bytes: bytes, filename: str) -> Iterator[str]:
+    key = context_cache_key(prompt_kind, context, person_ids) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        yield cached.get('response', '')
+        return
+
+    parts = []
+    for chunk in llm_client.stream_media(image_bytes, prompt, filename):
+        parts.append(chunk)
+        yield chunk
+    # Only complete messages are cached
+    if cache is not None:
+        cache.set(key, {'response': ''.join(parts)})
+
+
+async def _stream_with_cache_async(cache: Optional[ResponseCache], prompt_kind: str, prompt: str, context: dict,
+                                   person_ids: Optional[Iterable[int]], image_bytes: bytes,
+                                   filename: str) -> AsyncIterator[str]:
+    key = context_cache_key(prompt_kind, context, person_ids) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        yield cached.get('response', '')
+        return
+
+    parts = []
+    async for chunk in llm_client.stream_media_async(image_bytes, prompt, filename):
+        parts.append(chunk)
+        yield chunk
+    if cache is not None:
+        cache.set(key, {'response': ''.join(parts)})
+
+
+def stream_message_with_llm(image_bytes: bytes, context: dict, filename: str = 'frame.jpg',
+                            cache: Optional[ResponseCache] = None,
+                            person_ids: Optional[Iterable[int]] = None) -> Iterator[str]:
+    """Incremental variant of generate_message_with_llm that yields text as it is generated"""
+    prompt = build_face_prompt(context)
+    return _stream_with_cache(cache, 'face', prompt, context, person_ids, image_bytes, filename)
+
+
+def stream_assist_dementia_patient(image_bytes: bytes, context: dict, filename: str = 'frame.jpg',
+                                   cache: Optional[ResponseCache] = None) -> Iterator[str]:
+    """Incremental variant of assist_dementia_patient that yields text as it is generated"""
+    prompt = build_scene_prompt(context)
+    return _stream_with_cache(cache, 'scene', prompt, context, None, image_bytes, filename)
+
+
+def stream_message_with_llm_async(image_bytes: bytes, context: dict, filename: str = 'frame.jpg',
+                                  cache: Optional[ResponseCache] = None,
+                                  person_ids: Optional[Iterable[int]] = None) -> AsyncIterator[str]:
+    """Async iterator variant of stream_message_with_llm"""
+    prompt = build_face_prompt(context)
+    return _stream_with_cache_async(cache, 'face', prompt, context, person_ids, image_bytes, filename)
+
+
+def stream_assist_dementia_patient_async(image_bytes: bytes, context: dict, filename: str = 'frame.jpg',
+                                         cache: Optional[ResponseCache] = None) -> AsyncIterator[str]:
+    """Async iterator variant of stream_assist_dementia_patient"""
+    prompt = build_scene_prompt(context)
+    return _stream_with_cache_async(cache, 'scene', prompt, context, None, image_bytes, filename)
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from usecases.face_identification import face_iou
+from utilities.constants import (face_track_iou_threshold, face_track_refresh_seconds,
+                                 face_track_max_missing_seconds, scene_session_ttl_seconds, scene_max_sessions)
+
+Location = Tuple[int, int, int, int]
+
+
+def _centroid_distance(a: Location, b: Location) -> float:
+    """Distance between box centres relative to the width of box a"""
+    ay, ax = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2
+    by, bx = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+    width = max(a[1] - a[3], 1)
+    return float(np.hypot(ay - by, ax - bx)) / width
+
+
+class FaceTrack:
+    def __init__(self, track_id: int, location: Location, embedding: np.ndarray, matches: List[Dict], now: float):
+        self.track_id = track_id
+        self.location = location
+        self.embedding = embedding
+        self.matches = matches
+        self.encoded_at = now
+        self.last_seen = now
+
+
+class FaceTracker:
+    """Associates faces across frames so stable faces are not re-encoded every frame.
+
+    Faces are matched to existing tracks by IoU, falling back to centroid
+    distance for small fast-moving boxes. A matched track reuses its cached
+    embedding and identity until `refresh_seconds` have passed since it was
+    last encoded; new faces and stale tracks are encoded and matched again.
+    """
+
+    def __init__(self,
+                 iou_threshold: float = face_track_iou_threshold,
+                 refresh_seconds: float = face_track_refresh_seconds,
+                 max_missing_seconds: float = face_track_max_missing_seconds):
+        self.iou_threshold = iou_threshold
+        self.refresh_seconds = refresh_seconds
+        self.max_missing_seconds = max_missing_seconds
+        self.tracks: List[FaceTrack] = []
+        self.lock = threading.Lock()
+        self._next_track_id = 1
+
+    def _associate(self, locations: Sequence[Location]) -> List[Optional[FaceTrack]]:
+        """Greedily pair each location with the best unclaimed track"""
+        pairs = []
+        for i, location in enumerate(locations):
+            for track in self.tracks:
+                iou = face_iou(location, track.location)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, i, track))
+                elif _centroid_distance(track.location, location) < 0.5:
+                    pairs.append((self.iou_threshold * 0.5, i, track))
+        pairs.sort(key=lambda pair: pair[0], reverse=True)
+
+        assigned: List[Optional[FaceTrack]] = [None] * len(locations)
+        claimed = set()
+        for _, i, track in pairs:
+            if assigned[i] is None and track.track_id not in claimed:
+                assigned[i] = track
+                claimed.add(track.track_id)
+        return assigned
+
+    def process(self,
+                locations: Sequence[Location],
+                identify: Callable[[List[Location]], List[Tuple[np.ndarray, List[Dict]]]]
+                ) -> Tuple[List[List[Dict]], int, int]:
+        """Return the matches for every face, encoding only new or stale tracks.
+
+        :param locations: Face boxes found in the current frame.
+        :param identify: Encodes and matches a list of boxes, returning (embedding, matches) per box.
+        :return: Matches per location, the number of faces encoded, and the number reused from tracks.
+        """
+        now = time.monotonic()
+        with self.lock:
+            assigned = self._associate(locations)
+            to_encode = [i for i, track in enumerate(assigned)
+                         if track is None or now - track.encoded_at >= self.refresh_seconds]
+
+            if to_encode:
+                identified = identify([locations[i] for i in to_encode])
+                for i, (embedding, matches) in zip(to_encode, identified):
+                    track = assigned[i]
+                    if track is None:
+                        track = FaceTrack(self._next_track_id, locations[i], embedding, matches, now)
+                        self._next_track_id += 1
+                        self.tracks.append(track)
+                        assigned[i] = track
+                    else:
+                        track.embedding, track.matches, track.encoded_at = embedding, matches, now
+
+            for location, track in zip(locations, assigned):
+                track.location = location
+                track.last_seen = now
+
+            self.tracks = [track for track in self.tracks if now - track.last_seen <= self.max_missing_seconds]
+            return [track.matches for track in assigned], len(to_encode), len(locations) - len(to_encode)
+
+
+class SessionFaceTrackers:
+    """One FaceTracker per client session, with idle expiry and shared counters"""
+
+    def __init__(self,
+                 session_ttl_seconds: float = scene_session_ttl_seconds,
+                 max_sessions: int = scene_max_sessions,
+                 rate_window_seconds: float = 60.0):
+        self.session_ttl_seconds = session_ttl_seconds
+        self.max_sessions = max_sessions
+        self.rate_window_seconds = rate_window_seconds
+        self._trackers: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._encodings = 0
+        self._reused = 0
+        self._encode_times = deque()
+
+    def get(self, session_id: str) -> FaceTracker:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._trackers.pop(session_id, None)
+            tracker = entry[0] if entry else FaceTracker()
+            self._trackers[session_id] = (tracker, now)
+            while self._trackers:
+                oldest_id, (_, last_used) = next(iter(self._trackers.items()))
+                if now - last_used < self.session_ttl_seconds and len(self._trackers) <= self.max_sessions:
+                    break
+                self._trackers.pop(oldest_id)
+            return tracker
+
+    def record(self, encoded: int, reused: int):
+        now = time.monotonic()
+        with self._lock:
+            self._encodings += encoded
+            self._reused += reused
+            self._encode_times.extend([now] * encoded)
+            while self._encode_times and now - self._encode_times[0] > self.rate_window_seconds:
+                self._encode_times.popleft()
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            while self._encode_times and now - self._encode_times[0] > self.rate_window_seconds:
+                self._encode_times.popleft()
+            faces = self._encodings + self._reused
+            return {
+                'sessions': len(self._trackers),
+                'active_tracks': sum(len(tracker.tracks) for tracker, _ in self._trackers.values()),
+                'faces_encoded': self._encodings,
+                'faces_reused': self._reused,
+                'track_hit_rate': self._reused / faces if faces else 0.0,
+                'encodings_per_second': len(self._encode_times) / self.rate_window_seconds
+            }
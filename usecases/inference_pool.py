@@ -0,0 +1,261 @@
+"""Worker processes for the CPU-bound stages of /live_detection.
+
+YOLO, dlib face localization and face encoding hold the GIL for most of
+their run time, so concurrent Flask requests serialize on them. With
+INFERENCE_WORKERS > 0 each request hands its decoded frame to a pool of
+spawned workers that keep their own warmed models. The frame travels through
+multiprocessing.shared_memory rather than being pickled, and the request
+thread only orchestrates: tracking, database matching and the LLM call stay
+in the web process.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utilities.constants import inference_workers, inference_timeout
+
+logger = logging.getLogger(__name__)
+
+Location = Tuple[int, int, int, int]
+
+
+def _init_worker():
+    """Load and warm the models once per worker process"""
+    import face_recognition
+    from usecases.model_registry import model_registry, YOLO_MODEL
+
+    model_registry.warmup(YOLO_MODEL)
+    # Loads dlib's detector and encoder
+    face_recognition.face_locations(np.zeros((64, 64, 3), dtype=np.uint8))
+
+
+@contextmanager
+def _attached_frame(name: str, shape: Tuple[int, ...], dtype: str):
+    """View a frame in shared memory owned by the web process"""
+    # Spawned workers share the web process's resource tracker, which unlinks the block once
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        yield np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    finally:
+        shm.close()
+
+
+def _detect_and_locate(name: str, shape: Tuple[int, ...], dtype: str) -> Dict:
+    """Run YOLO on the shared BGR frame and, if a person is present, locate faces.
+
+    The frame is converted to RGB in place so the encode stage can read it directly.
+    """
+    import cv2
+    from usecases.live_detection import detect_objects, locate_faces, timed
+
+    timings = {}
+    with _attached_frame(name, shape, dtype) as frame:
+        with timed(timings, 'yolo'):
+            detected_objects, person_boxes = detect_objects(frame)
+        face_locations = []
+        if 'person' in detected_objects:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+            with timed(timings, 'face_locate'):
+                face_locations = locate_faces(frame, person_boxes)
+    return {
+        'objects': detected_objects,
+        'person_boxes': person_boxes,
+        'face_locations': [tuple(int(v) for v in location) for location in face_locations],
+        'timings': timings
+    }
+
+
+def _encode(name: str, shape: Tuple[int, ...], dtype: str, locations: List[Location]) -> Dict:
+    """Encode the given faces of the shared RGB frame"""
+    from usecases.face_identification import encode_all_faces
+    from usecases.live_detection import timed
+
+    timings = {}
+    with _attached_frame(name, shape, dtype) as rgb_frame:
+        with timed(timings, 'face_encode'):
+            _, face_encodings = encode_all_faces(rgb_frame, locations)
+    return {'encodings': face_encodings, 'timings': timings}
+
+
+def _release_when_done(shm: shared_memory.SharedMemory, futures: List[Future]):
+    """Unlink the frame once no task can still attach to it.
+
+    A task that timed out keeps running in its worker, so its segment is
+    released from the future's done callback instead of straight away.
+    """
+    running = [future for future in futures if not future.done()]
+    if not running:
+        shm.close()
+        shm.unlink()
+        return
+
+    lock = threading.Lock()
+    remaining = [len(running)]
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            shm.close()
+            shm.unlink()
+
+    for future in running:
+        future.add_done_callback(on_done)
+
+
+class SharedFrameAnalyzer:
+    """Frame analyzer whose stages run in the worker pool on a shared-memory frame"""
+
+    def __init__(self, pool: 'InferencePool', shm: shared_memory.SharedMemory, shape, dtype: str):
+        self.pool = pool
+        self.shm = shm
+        self.shape = shape
+        self.dtype = dtype
+        self.face_locations: List[Location] = []
+        # Every task given the frame; the segment must outlive those still running
+        self.futures: List[Future] = []
+
+    def _run(self, fn, *args, timings: Dict[str, float]) -> Dict:
+        start = time.perf_counter()
+        result = self.pool.submit(fn, self.shm.name, self.shape, self.dtype, *args, futures=self.futures)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for stage, ms in result['timings'].items():
+            timings[stage] = timings.get(stage, 0.0) + ms
+        # Queueing and transfer time on top of the worker's own compute
+        timings['worker_overhead'] = timings.get('worker_overhead', 0.0) + elapsed_ms - sum(result['timings'].values())
+        return result
+
+    def detect(self, timings: Dict[str, float]) -> Tuple[List[str], np.ndarray]:
+        result = self._run(_detect_and_locate, timings=timings)
+        self.face_locations = result['face_locations']
+        return result['objects'], result['person_boxes']
+
+    def locate(self, person_boxes: np.ndarray, timings: Dict[str, float]) -> List[Location]:
+        # Located in the same worker call as detection
+        return self.face_locations
+
+    def encode(self, locations: List[Location], timings: Dict[str, float]) -> np.ndarray:
+        return self._run(_encode, list(locations), timings=timings)['encodings']
+
+
+class InferencePool:
+    """Spawned worker processes with warmed models for frame analysis"""
+
+    def __init__(self, workers: int = inference_workers, timeout: float = inference_timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._tasks = 0
+        self._task_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forked children would inherit model and thread state from the web process
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def start(self):
+        """Spawn and warm every worker now instead of on the first requests"""
+        executor = self._get_executor()
+        for future in [executor.submit(time.sleep, 0.1) for _ in range(self.workers)]:
+            future.result()
+        logger.info(f"Inference pool started with {self.workers} workers")
+
+    def submit(self, fn, *args, futures: Optional[List[Future]] = None):
+        """Run fn in a worker and wait for it; the future is appended to futures when given.
+
+        A timed-out task is cancelled if it has not started yet. A broken pool
+        (a worker died) is dropped so the next call spawns a fresh one.
+        """
+        with self._lock:
+            self._in_flight += 1
+        start = time.perf_counter()
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+            if futures is not None:
+                futures.append(future)
+            try:
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                future.cancel()
+                raise
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            if executor is not None:
+                executor.shutdown(wait=False)
+            logger.error("Inference pool broke, its workers will be respawned")
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._tasks += 1
+                self._task_seconds += time.perf_counter() - start
+
+    @contextmanager
+    def analyzer(self, frame: np.ndarray):
+        """Copy a frame into shared memory and yield an analyzer that runs on it"""
+        shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        analyzer = None
+        try:
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+            analyzer = SharedFrameAnalyzer(self, shm, frame.shape, frame.dtype.str)
+            yield analyzer
+        finally:
+            _release_when_done(shm, analyzer.futures if analyzer else [])
+
+    def recycle(self, warm: bool = True) -> bool:
+        """Replace the workers so they load the models from disk again; returns whether any were running.
+
+        Tasks already submitted finish on the old workers, new ones go to the replacements.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return False
+        executor.shutdown(wait=False)
+        if warm:
+            self.start()
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'started': self._executor is not None,
+                'in_flight': self._in_flight,
+                'tasks': self._tasks,
+                'avg_task_ms': self._task_seconds / self._tasks * 1000 if self._tasks else 0.0
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+inference_pool = InferencePool()
@@ -0,0 +1,218 @@
+import base64
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import face_recognition
+
+from usecases.face_database import FaceDatabase
+from usecases.face_identification import encode_all_faces, locate_faces_in_regions
+from usecases.face_tracker import FaceTracker
+from usecases.model_registry import model_registry, YOLO_MODEL
+from utilities.constants import face_detection_mode, person_box_padding
+
+logger = logging.getLogger(__name__)
+
+SENSITIVE_WORDS = {'toilet', 'bathroom', 'weapon', 'knife', 'gun'}  # Add more words as needed
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """Accumulate the wall time of a block, in milliseconds, under `stage`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def filter_sensitive_words(detected_objects):
+    filtered_objects = [obj for obj in detected_objects if obj.lower() not in SENSITIVE_WORDS]
+    return filtered_objects
+
+
+def decode_frame(frame_data: str) -> Tuple[bytes, np.ndarray]:
+    """Decode a base64 JPEG into its encoded bytes and a BGR frame"""
+    frame_bytes = base64.b64decode(frame_data)
+    np_frame = np.frombuffer(frame_bytes, np.uint8)
+    frame = cv2.imdecode(np_frame, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Frame could not be decoded")
+    return frame_bytes, frame
+
+
+def detect_objects(frame: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """Run YOLO on a frame and return object names plus (x1, y1, x2, y2) person boxes"""
+    results = model_registry.predict(YOLO_MODEL, frame, imgsz=640)
+    result = results[0]  # Process the first result
+    model_names = model_registry.get(YOLO_MODEL).names
+
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return [], np.empty((0, 4))
+    cls_indices = boxes.cls.cpu().numpy().astype(int)
+    detected_objects = [model_names[i] for i in cls_indices]
+    person_boxes = boxes.xyxy.cpu().numpy()[[name == 'person' for name in detected_objects]]
+    return detected_objects, person_boxes
+
+
+def locate_faces(rgb_frame: np.ndarray, person_boxes: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Find faces inside the YOLO person boxes, falling back to the full frame"""
+    if face_detection_mode == 'cascade' and len(person_boxes):
+        face_locations = locate_faces_in_regions(rgb_frame, person_boxes, padding=person_box_padding)
+        if face_locations:
+            return face_locations
+    return face_recognition.face_locations(rgb_frame)
+
+
+def identified_person(location, matches):
+    """Describe one detected face, its bounding box and best match if any"""
+    top, right, bottom, left = location
+    person = {
+        "bounding_box": {"top": int(top), "right": int(right), "bottom": int(bottom), "left": int(left)},
+        "id": None,
+        "name": None,
+        "relationship": None,
+        "personal_information": None,
+        "similarity": None
+    }
+    if matches:
+        matched_face = matches[0]
+        person.update({
+            "id": matched_face['id'],
+            "name": f"{matched_face['first_name']} {matched_face['last_name']}",
+            "relationship": matched_face['relationship'],
+            "personal_information": matched_face.get('personal context') or '',
+            "similarity": matched_face['similarity']
+        })
+    return person
+
+
+def people_context(identified_people):
+    """Build the LLM context for every face in the frame"""
+    contexts = []
+    seen_ids = set()
+    for person in identified_people:
+        if person['id'] is None:
+            contexts.append({
+                "name": "an unfamiliar person",
+                "relation": "unknown",
+                "personal_information": "No additional information available."
+            })
+        elif person['id'] not in seen_ids:
+            seen_ids.add(person['id'])
+            contexts.append({
+                "name": person['name'],
+                "relation": person['relationship'],
+                "personal_information": person['personal_information']
+            })
+    if len(contexts) == 1:
+        return contexts[0]
+    return {"people": contexts}
+
+
+class LocalFrameAnalyzer:
+    """Runs the detection stages for one BGR frame in this process"""
+
+    def __init__(self, frame: np.ndarray):
+        self.frame = frame
+        self.rgb_frame = None
+
+    def detect(self, timings: Dict[str, float]) -> Tuple[List[str], np.ndarray]:
+        with timed(timings, 'yolo'):
+            return detect_objects(self.frame)
+
+    def locate(self, person_boxes: np.ndarray, timings: Dict[str, float]) -> List[Tuple[int, int, int, int]]:
+        # face_recognition expects RGB
+        self.rgb_frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
+        with timed(timings, 'face_locate'):
+            return locate_faces(self.rgb_frame, person_boxes)
+
+    def encode(self, locations: List[Tuple[int, int, int, int]], timings: Dict[str, float]) -> np.ndarray:
+        with timed(timings, 'face_encode'):
+            _, face_encodings = encode_all_faces(self.rgb_frame, locations)
+        return face_encodings
+
+
+def analyze_frame(face_db: FaceDatabase,
+                  frame: np.ndarray,
+                  timings: Optional[Dict[str, float]] = None,
+                  face_tracker: Optional[FaceTracker] = None,
+                  analyzer=None,
+                  patient_id: Optional[int] = None) -> Dict:
+    """Detect objects and identify every face in a BGR frame.
+
+    With a face tracker, faces that continue a stable track reuse its cached
+    identity and only new or stale tracks are encoded and matched. The
+    detection stages run in this process unless another analyzer, such as
+    an inference worker pool, is given. With a patient_id, faces are only
+    matched against that patient's people.
+
+    :return: The filtered objects, whether a person was seen, the identified
+             people with bounding boxes, and per-stage timings in milliseconds.
+    """
+    timings = {} if timings is None else timings
+    analyzer = analyzer or LocalFrameAnalyzer(frame)
+
+    detected_objects, person_boxes = analyzer.detect(timings)
+
+    identified_people = []
+    faces_encoded, faces_reused = 0, 0
+    person_detected = 'person' in detected_objects
+    if person_detected:
+        face_locations = analyzer.locate(person_boxes, timings)
+
+        def identify(locations):
+            face_encodings = analyzer.encode(locations, timings)
+            if not len(face_encodings):
+                return []
+            # Match all faces against the known people in one batched lookup
+            with timed(timings, 'db_match'):
+                all_matches = face_db.find_similar_faces(face_encodings, patient_id=patient_id)
+            return list(zip(face_encodings, all_matches))
+
+        if face_locations:
+            if face_tracker is not None:
+                all_matches, faces_encoded, faces_reused = face_tracker.process(face_locations, identify)
+            else:
+                all_matches = [matches for _, matches in identify(face_locations)]
+                faces_encoded = len(all_matches)
+            identified_people = [
+                identified_person(location, matches)
+                for location, matches in zip(face_locations, all_matches)
+            ]
+
+    return {
+        'objects': filter_sensitive_words(detected_objects),
+        'person_detected': person_detected,
+        'identified_people': identified_people,
+        'faces_encoded': faces_encoded,
+        'faces_reused': faces_reused,
+        'timings': timings
+    }
+
+
+def frame_context(analysis: Dict) -> Tuple[bool, Dict]:
+    """Pick the LLM prompt for an analyzed frame.
+
+    :return: (True, context) for the face recognition prompt, or (False, context)
+             for the scene assistance prompt.
+    """
+    if analysis['identified_people']:
+        return True, people_context(analysis['identified_people'])
+    if analysis['person_detected']:
+        # No face encodings found
+        return False, {
+            "name": "a person",
+            "relation": "unknown",
+            "personal_information": "No additional information available."
+        }
+    return False, {'objects': analysis['objects']}
+
+
+def log_timings(timings: Dict[str, float]):
+    logger.info("live_detection timings (ms): " +
+                ", ".join(f"{stage}={ms:.1f}" for stage, ms in timings.items()))
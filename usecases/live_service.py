@@ -0,0 +1,184 @@
+"""Live detection orchestration shared by the Flask and ASGI endpoints.
+
+The web adapters (webserver/endpoints.py, webserver/asgi.py) only parse
+requests and build responses. Analyzing a frame, gating on scene changes,
+choosing the LLM prompt and producing server-sent events happen here, with
+a blocking and an async variant wherever the LLM is called.
+"""
+import json
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from usecases.face_database import FaceDatabase
+from usecases.face_prompt_llm import (generate_message_with_llm, assist_dementia_patient,
+                                      stream_message_with_llm, stream_assist_dementia_patient,
+                                      generate_message_with_llm_async, assist_dementia_patient_async,
+                                      stream_message_with_llm_async, stream_assist_dementia_patient_async)
+from usecases.face_tracker import SessionFaceTrackers
+from usecases.inference_pool import inference_pool
+from usecases.live_detection import analyze_frame, decode_frame, frame_context, log_timings, timed
+from usecases.llm_cache import llm_caches
+from usecases.metrics import observe_timings
+from usecases.scene_state import SceneStateTracker
+from utilities.constants import face_tracking_enabled
+
+
+def sse_event(event: str, payload) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+class LiveFrame:
+    """One analyzed live frame, with the session's last message when its scene is unchanged"""
+
+    def __init__(self, frame_bytes: bytes, analysis: Dict, is_face_frame: bool, context: Dict,
+                 session_id: Optional[str], timings: Dict[str, float], last_response, llm_cache):
+        self.frame_bytes = frame_bytes
+        self.analysis = analysis
+        self.is_face_frame = is_face_frame
+        self.context = context
+        self.session_id = session_id
+        self.timings = timings
+        self.last_response = last_response
+        self.llm_cache = llm_cache
+
+    @property
+    def scene_changed(self) -> bool:
+        return self.last_response is None
+
+    @property
+    def person_ids(self) -> List[int]:
+        return [person['id'] for person in self.analysis['identified_people'] if person['id']]
+
+    def prompt(self, face_prompt, scene_prompt):
+        """Call whichever prompt fits the frame: the face prompt for identified people, else the scene one"""
+        if self.is_face_frame:
+            return face_prompt(self.frame_bytes, self.context, cache=self.llm_cache, person_ids=self.person_ids)
+        return scene_prompt(self.frame_bytes, self.context, cache=self.llm_cache)
+
+    def payload(self, response):
+        """The message with the frame's people and whether it is new attached"""
+        if isinstance(response, dict):
+            return {**response, "identified_people": self.analysis['identified_people'],
+                    "scene_changed": self.scene_changed}
+        return response
+
+    def observe(self, endpoint: str):
+        log_timings(self.timings)
+        observe_timings(endpoint, self.timings)
+
+
+class LiveDetectionService:
+    """Frame analysis, scene gating and LLM messages for the live detection endpoints"""
+
+    def __init__(self, face_db: FaceDatabase, scene_tracker: SceneStateTracker, face_trackers: SessionFaceTrackers):
+        self.face_db = face_db
+        self.scene_tracker = scene_tracker
+        self.face_trackers = face_trackers
+
+    def analyze(self, frame_data: str, session_id: Optional[str], patient_id: Optional[int] = None) -> LiveFrame:
+        """Decode and analyze a base64 frame and look up the session's last message; CPU-bound.
+
+        Without a session id every frame is analyzed from scratch and gets a new
+        message: clients behind one NAT or load balancer must not share scene state
+        or face tracks, so the client address is never used in its place.
+        """
+        timings = {}
+        with timed(timings, 'decode'):
+            frame_bytes, frame = decode_frame(frame_data)
+
+        # Detect objects, then locate, encode and match faces; stable faces reuse their track identity
+        face_tracker = self.face_trackers.get(session_id) if face_tracking_enabled and session_id else None
+        if inference_pool.enabled:
+            # CPU-bound stages run in the worker pool; this thread only orchestrates
+            with inference_pool.analyzer(frame) as analyzer:
+                analysis = analyze_frame(self.face_db, frame, timings, face_tracker=face_tracker,
+                                         analyzer=analyzer, patient_id=patient_id)
+        else:
+            analysis = analyze_frame(self.face_db, frame, timings, face_tracker=face_tracker, patient_id=patient_id)
+        self.face_trackers.record(analysis['faces_encoded'], analysis['faces_reused'])
+        is_face_frame, context = frame_context(analysis)
+
+        # Reuse the last message while the scene for this session is unchanged
+        last_response, cooldown_expired = None, False
+        if session_id:
+            last_response, cooldown_expired = self.scene_tracker.lookup(session_id, analysis['identified_people'],
+                                                                        analysis['objects'])
+        # After the cooldown the caller wants a new message, not the cached copy of the old one
+        llm_cache = llm_caches.get('live_detection')
+        if cooldown_expired and llm_cache is not None:
+            llm_cache = llm_cache.refreshing()
+        return LiveFrame(frame_bytes, analysis, is_face_frame, context, session_id, timings,
+                         last_response, llm_cache)
+
+    def _remember(self, live: LiveFrame, response):
+        if not live.session_id:
+            return
+        self.scene_tracker.update(live.session_id, live.analysis['identified_people'], live.analysis['objects'],
+                                  response)
+
+    def message(self, live: LiveFrame):
+        """The session's last message while the scene is unchanged, otherwise a new one from the LLM"""
+        if not live.scene_changed:
+            return live.last_response
+        with timed(live.timings, 'llm'):
+            response = live.prompt(generate_message_with_llm, assist_dementia_patient)
+        self._remember(live, response)
+        return response
+
+    async def message_async(self, live: LiveFrame):
+        if not live.scene_changed:
+            return live.last_response
+        with timed(live.timings, 'llm'):
+            response = await live.prompt(generate_message_with_llm_async, assist_dementia_patient_async)
+        self._remember(live, response)
+        return response
+
+    @staticmethod
+    def _opening_events(live: LiveFrame) -> List[str]:
+        """The analysis event, followed by the whole last message when the scene is unchanged"""
+        events = [sse_event('analysis', {
+            "identified_people": live.analysis['identified_people'],
+            "objects": live.analysis['objects'],
+            "scene_changed": live.scene_changed
+        })]
+        if not live.scene_changed:
+            last = live.last_response
+            text = last.get('response', '') if isinstance(last, dict) else str(last)
+            events += [sse_event('token', {"text": text}), sse_event('done', {"response": text})]
+        return events
+
+    def _closing_event(self, live: LiveFrame, parts: List[str]) -> str:
+        text = ''.join(parts)
+        self._remember(live, {"response": text})
+        live.observe('live_detection_stream')
+        return sse_event('done', {"response": text})
+
+    def stream(self, live: LiveFrame) -> Iterator[str]:
+        """Server-sent events: `analysis`, one `token` per generated fragment, then `done` (or `error`)"""
+        try:
+            yield from self._opening_events(live)
+            if not live.scene_changed:
+                return
+            parts = []
+            with timed(live.timings, 'llm'):
+                for chunk in live.prompt(stream_message_with_llm, stream_assist_dementia_patient):
+                    parts.append(chunk)
+                    yield sse_event('token', {"text": chunk})
+            yield self._closing_event(live, parts)
+        except Exception as e:
+            yield sse_event('error', {"error": str(e)})
+
+    async def stream_async(self, live: LiveFrame) -> AsyncIterator[str]:
+        try:
+            for event in self._opening_events(live):
+                yield event
+            if not live.scene_changed:
+                return
+            parts = []
+            with timed(live.timings, 'llm'):
+                async for chunk in live.prompt(stream_message_with_llm_async, stream_assist_dementia_patient_async):
+                    parts.append(chunk)
+                    yield sse_event('token', {"text": chunk})
+            yield self._closing_event(live, parts)
+        except Exception as e:
+            yield sse_event('error', {"error": str(e)})
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from utilities.constants import llm_cache_endpoints, llm_cache_max_entries, llm_cache_dir
+
+
+def _normalize(value: Any, key: Optional[str] = None) -> Any:
+    """Canonical form of a context value: trimmed lowercase text, sorted object sets"""
+    if isinstance(value, str):
+        return ' '.join(value.split()).lower()
+    if isinstance(value, dict):
+        return {k: _normalize(v, k) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple, set)):
+        items = [_normalize(v) for v in value]
+        if key == 'objects':
+            # Detections come in arbitrary order and repeat per instance
+            return sorted(set(items))
+        return items
+    return value
+
+
+def context_cache_key(prompt: str, context: Dict, person_ids: Optional[Iterable[int]] = None) -> str:
+    """Stable key for a prompt kind, its normalized context and the matched person ids"""
+    payload = {
+        'prompt': prompt,
+        'context': _normalize(context),
+        'person_ids': sorted(set(person_ids or []))
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """TTL + LRU cache for LLM responses with an optional SQLite backing store"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL,
+                    value TEXT NOT NULL
+                )
+            """)
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def _remember(self, key: str, expires_at: float, value: Dict):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a fresh cached response, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[0] > now:
+                    value = json.loads(row[1])
+                    self._remember(key, row[0], value)
+                    self._hits += 1
+                    return value
+
+            self._misses += 1
+            return None
+
+    def set(self, key: str, value: Dict):
+        """Store a response for ttl_seconds"""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps(value))
+                )
+                self._db.commit()
+
+    def refreshing(self) -> 'RefreshingCache':
+        """A view that never serves a hit but stores what the caller fetches"""
+        return RefreshingCache(self)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'persistent': self._db is not None
+            }
+
+
+class RefreshingCache:
+    """Write-through view of a ResponseCache used to force a fresh LLM message"""
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+
+    def get(self, key: str) -> Optional[Dict]:
+        return None
+
+    def set(self, key: str, value: Dict):
+        self.cache.set(key, value)
+
+
+def _build_caches() -> Dict[str, ResponseCache]:
+    """One cache per endpoint listed in LLM_CACHE_ENDPOINTS as name[:ttl_seconds]"""
+    caches = {}
+    for item in filter(None, (part.strip() for part in llm_cache_endpoints.split(','))):
+        name, _, ttl = item.partition(':')
+        disk_path = os.path.join(llm_cache_dir, f'{name}.sqlite3') if llm_cache_dir else None
+        caches[name] = ResponseCache(
+            max_entries=llm_cache_max_entries,
+            ttl_seconds=float(ttl) if ttl else 300.0,
+            disk_path=disk_path
+        )
+    return caches
+
+
+llm_caches = _build_caches()
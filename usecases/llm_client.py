@@ -0,0 +1,288 @@
+import asyncio
+import io
+import json
+import logging
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from usecases.metrics import llm_errors_total, llm_retries_total
+from utilities.constants import (llm_api_url, llm_pool_size, llm_max_concurrency, llm_connect_timeout,
+                                 llm_read_timeout, llm_max_retries, llm_backoff_base, llm_backoff_max)
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMClientError(Exception):
+    """Raised when the LLM API call fails after all retries"""
+
+
+class LLMClient:
+    """Shared HTTP client for the Gemini media inference service.
+
+    Keeps connections alive in a pooled session, bounds the number of
+    concurrent calls, applies connect/read timeouts and retries transient
+    failures with jittered exponential backoff. The *_async methods do the
+    same on an httpx.AsyncClient, so an in-flight call holds a coroutine
+    rather than a thread.
+    """
+
+    def __init__(self,
+                 url: str = llm_api_url,
+                 pool_size: int = llm_pool_size,
+                 max_concurrency: int = llm_max_concurrency,
+                 connect_timeout: float = llm_connect_timeout,
+                 read_timeout: float = llm_read_timeout,
+                 max_retries: int = llm_max_retries,
+                 backoff_base: float = llm_backoff_base,
+                 backoff_max: float = llm_backoff_max):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        # Created on first use, inside the event loop that will drive them
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_slots: Optional[asyncio.Semaphore] = None
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, honouring a numeric Retry-After"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _status_error(self, status_code: int, text: str, retry_after: Optional[str]) -> LLMClientError:
+        """The error for a non-200 reply; raised at once unless the status is worth retrying"""
+        llm_errors_total.inc(f"http_{status_code}")
+        error = LLMClientError(f"Failed to call LLM API: {status_code}, {text}")
+        if status_code not in RETRY_STATUSES:
+            raise error
+        error.retry_after = retry_after
+        return error
+
+    @staticmethod
+    def _final_error(last_error: Exception) -> LLMClientError:
+        if isinstance(last_error, LLMClientError):
+            return last_error
+        return LLMClientError(f"Failed to call LLM API: {last_error}")
+
+    def post_media(self, image_bytes: bytes, prompt: str, filename: str = 'frame.jpg') -> Dict:
+        """Send an image and prompt to the LLM API and return its JSON response"""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self._backoff(attempt - 1, getattr(last_error, 'retry_after', None))
+                logger.warning(f"Retrying LLM call in {delay:.2f}s (attempt {attempt + 1}): {last_error}")
+                llm_retries_total.inc()
+                time.sleep(delay)
+
+            # Each attempt re-reads the image from the start
+            files = {'file': (filename, io.BytesIO(image_bytes))}
+            data = {'input_text': prompt}
+            try:
+                with self._slots:
+                    response = self.session.post(self.url, files=files, data=data, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                llm_errors_total.inc(type(e).__name__)
+                last_error = e
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+            last_error = self._status_error(response.status_code, response.text,
+                                            response.headers.get('Retry-After'))
+
+        raise self._final_error(last_error)
+
+    def stream_media(self, image_bytes: bytes, prompt: str, filename: str = 'frame.jpg') -> Iterator[str]:
+        """Send an image and prompt and yield the response text as it arrives.
+
+        Server-sent events and chunked plain text are forwarded piece by
+        piece; a plain JSON reply is yielded as one chunk. Retries only
+        happen before the first byte of the body has been read.
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self._backoff(attempt - 1, getattr(last_error, 'retry_after', None))
+                logger.warning(f"Retrying LLM stream in {delay:.2f}s (attempt {attempt + 1}): {last_error}")
+                llm_retries_total.inc()
+                time.sleep(delay)
+
+            files = {'file': (filename, io.BytesIO(image_bytes))}
+            data = {'input_text': prompt, 'stream': 'true'}
+            self._slots.acquire()
+            try:
+                try:
+                    response = self.session.post(self.url, files=files, data=data,
+                                                 timeout=self.timeout, stream=True)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    llm_errors_total.inc(type(e).__name__)
+                    last_error = e
+                    continue
+
+                with response:
+                    if response.status_code != 200:
+                        last_error = self._status_error(response.status_code, response.text,
+                                                        response.headers.get('Retry-After'))
+                        continue
+
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'charset=' not in content_type:
+                        response.encoding = 'utf-8'
+                    if content_type.startswith('application/json'):
+                        yield response.json().get('response', '')
+                    elif content_type.startswith('text/event-stream'):
+                        yield from self._iter_sse_text(response)
+                    else:
+                        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                            if chunk:
+                                yield chunk
+                    return
+            finally:
+                self._slots.release()
+
+        raise self._final_error(last_error)
+
+    @staticmethod
+    def _sse_text(line: str) -> Optional[str]:
+        """The text of one `data:` line (JSON payloads contribute their text/response field);
+        '' for lines without text and None at the end of the stream"""
+        if not line or not line.startswith('data:'):
+            return ''
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            return None
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return payload
+        if isinstance(message, dict):
+            return message.get('text') or message.get('response') or ''
+        return str(message)
+
+    @classmethod
+    def _iter_sse_text(cls, response: requests.Response) -> Iterator[str]:
+        """Yield the text of each `data:` line"""
+        for line in response.iter_lines(decode_unicode=True):
+            text = cls._sse_text(line)
+            if text is None:
+                return
+            if text:
+                yield text
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            connect_timeout, read_timeout = self.timeout
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._async_client
+
+    async def _async_backoff(self, attempt: int, last_error: Optional[Exception]):
+        delay = self._backoff(attempt - 1, getattr(last_error, 'retry_after', None))
+        logger.warning(f"Retrying LLM call in {delay:.2f}s (attempt {attempt + 1}): {last_error}")
+        llm_retries_total.inc()
+        await asyncio.sleep(delay)
+
+    async def post_media_async(self, image_bytes: bytes, prompt: str, filename: str = 'frame.jpg') -> Dict:
+        """Awaitable post_media on the async client"""
+        client = self._get_async_client()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await self._async_backoff(attempt, last_error)
+
+            files = {'file': (filename, image_bytes)}
+            data = {'input_text': prompt}
+            try:
+                async with self._async_slots:
+                    response = await client.post(self.url, files=files, data=data)
+            except httpx.TransportError as e:
+                llm_errors_total.inc(type(e).__name__)
+                last_error = e
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+            last_error = self._status_error(response.status_code, response.text,
+                                            response.headers.get('Retry-After'))
+
+        raise self._final_error(last_error)
+
+    async def stream_media_async(self, image_bytes: bytes, prompt: str,
+                                 filename: str = 'frame.jpg') -> AsyncIterator[str]:
+        """Awaitable stream_media on the async client"""
+        client = self._get_async_client()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await self._async_backoff(attempt, last_error)
+
+            files = {'file': (filename, image_bytes)}
+            data = {'input_text': prompt, 'stream': 'true'}
+            started = False
+            async with self._async_slots:
+                try:
+                    async with client.stream('POST', self.url, files=files, data=data) as response:
+                        if response.status_code != 200:
+                            body = (await response.aread()).decode('utf-8', 'replace')
+                            last_error = self._status_error(response.status_code, body,
+                                                            response.headers.get('Retry-After'))
+                            continue
+
+                        # Retries only happen before the first byte of the body has been read
+                        started = True
+                        content_type = response.headers.get('Content-Type', '')
+                        if content_type.startswith('application/json'):
+                            yield json.loads(await response.aread()).get('response', '')
+                        elif content_type.startswith('text/event-stream'):
+                            async for line in response.aiter_lines():
+                                text = self._sse_text(line)
+                                if text is None:
+                                    break
+                                if text:
+                                    yield text
+                        else:
+                            async for chunk in response.aiter_text():
+                                if chunk:
+                                    yield chunk
+                        return
+                except httpx.TransportError as e:
+                    llm_errors_total.inc(type(e).__name__)
+                    if started:
+                        raise LLMClientError(f"LLM stream interrupted: {e}") from e
+                    last_error = e
+                    continue
+
+        raise self._final_error(last_error)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+llm_client = LLMClient()
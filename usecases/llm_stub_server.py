@@ -0,0 +1,102 @@
+"""Local stand-in for the Gemini media inference service.
+
+Accepts the same multipart POST the LLM client sends and answers with a
+canned {"response": ...} after a configurable delay (or, when the request
+asks to stream, the same text as server-sent events), so the client and the
+endpoints can be exercised without network access:
+
+    python -m usecases.llm_stub_server --port 8090 --latency 0.5
+    LLM_API_URL=http://127.0.0.1:8090/gemini-media-inference python app.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        # Drain the multipart body so keep-alive connections stay usable
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        streaming = b'name="stream"' in body
+
+        with server.lock:
+            server.requests_seen += 1
+            failing = server.requests_seen <= server.fail_first
+
+        if failing:
+            time.sleep(server.latency)
+            self._send_json(503, {"error": "stub failure"})
+        elif streaming:
+            self._send_event_stream(server.reply, server.latency)
+        else:
+            time.sleep(server.latency)
+            self._send_json(200, {"response": server.reply})
+
+    def _send_event_stream(self, reply: str, latency: float):
+        """Emit the reply word by word as server-sent events spread over `latency` seconds"""
+        words = reply.split(' ')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, word in enumerate(words):
+            time.sleep(latency / len(words))
+            text = word if i == 0 else ' ' + word
+            self._write_chunk(f"data: {json.dumps({'text': text})}\n\n".encode('utf-8'))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port: int = 0,
+                      latency: float = 0.0,
+                      fail_first: int = 0,
+                      reply: str = "This is a stub response.") -> ThreadingHTTPServer:
+    """Start the stub in a background thread; port 0 picks a free port"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_first = fail_first
+    server.reply = reply
+    server.requests_seen = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering')
+    parser.add_argument('--fail-first', type=int, default=0, help='Answer 503 to the first N requests')
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.latency, args.fail_first)
+    print(f"Stub LLM server listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Process-wide counters and latency histograms, rendered in the Prometheus text format.
+
+Recording is a dict lookup and a bisect under a per-metric lock, cheap
+enough to leave on for every request. Component stats that already exist
+(connection pool, model registry, caches, trackers) are pulled in by
+collectors only when /metrics is scraped.
+"""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# Seconds; covers sub-millisecond index lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum, count
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    labels = _format_labels(self.label_names, label_values, f'le="{le}"')
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f'{self.name}_sum{labels} {total}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+# A collector returns gauge samples as (name, help, labels, value)
+Collector = Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]
+
+
+class MetricsRegistry:
+    def __init__(self, namespace: str = 'recallme'):
+        self.namespace = namespace
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        full_name = f'{self.namespace}_{name}'
+        with self._lock:
+            if full_name not in self._metrics:
+                self._metrics[full_name] = cls(full_name, *args, **kwargs)
+            return self._metrics[full_name]
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, label_names)
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, label_names, buckets)
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        gauges: Dict[str, Tuple[str, List[str]]] = {}
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                # A failing component must not break the scrape
+                continue
+            for name, documentation, labels, value in samples:
+                if value is None:
+                    continue
+                full_name = f'{self.namespace}_{name}'
+                label_text = _format_labels(list(labels), list(labels.values()))
+                gauges.setdefault(full_name, (documentation, []))[1].append(f'{full_name}{label_text} {float(value)}')
+        for full_name, (documentation, samples) in gauges.items():
+            lines.append(f'# HELP {full_name} {documentation}')
+            lines.append(f'# TYPE {full_name} gauge')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def stats_collector(prefix: str, documentation: str, stats: Callable[[], Dict],
+                    labels: Optional[Dict[str, str]] = None) -> Collector:
+    """Expose every numeric field of a component's stats() dict as a gauge"""
+    labels = labels or {}
+
+    def collect():
+        for field, value in stats().items():
+            if isinstance(value, (bool, int, float)):
+                yield f'{prefix}_{field}', f'{documentation}: {field}', labels, float(value)
+    return collect
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram('stage_seconds', 'Time spent in each request stage',
+                                  ('endpoint', 'stage'))
+request_seconds = metrics.histogram('request_seconds', 'HTTP request latency', ('endpoint', 'method', 'status'))
+requests_total = metrics.counter('requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status'))
+db_errors_total = metrics.counter('db_errors_total', 'Database errors by kind', ('kind',))
+llm_errors_total = metrics.counter('llm_errors_total', 'Failed LLM API attempts by reason', ('reason',))
+llm_retries_total = metrics.counter('llm_retries_total', 'LLM API attempts that were retried')
+
+
+def observe_timings(endpoint: str, timings: Dict[str, float]):
+    """Record a request's per-stage timings, given in milliseconds"""
+    for stage, ms in timings.items():
+        stage_seconds.observe(ms / 1000, endpoint, stage)
@@ -0,0 +1,8 @@
+-- Native pgvector storage for face embeddings.
+-- The FLOAT8[] column is kept as the source for the batched backfill in
+-- FaceDatabase.backfill_vector_embeddings; new rows write both columns.
+ALTER TABLE people ADD COLUMN IF NOT EXISTS face_embedding_vec vector(128);
+-- Approximate nearest-neighbour index on Euclidean distance
+CREATE INDEX IF NOT EXISTS people_face_embedding_vec_hnsw_idx
+    ON people USING hnsw (face_embedding_vec vector_l2_ops)
+    WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,3 @@
+-- Packed float32 face embeddings (128 x 4 bytes, big-endian as produced by
+-- float4send). Existing rows are filled by FaceDatabase.backfill_binary_embeddings.
+ALTER TABLE people ADD COLUMN IF NOT EXISTS face_embedding_f32 BYTEA;
@@ -0,0 +1,2 @@
+-- Patient-scoped face lookups read one patient's people at a time
+CREATE INDEX IF NOT EXISTS people_patient_id_idx ON people (patient_id, id);
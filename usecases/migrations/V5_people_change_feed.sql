@@ -0,0 +1,52 @@
+-- Change feed for replicas that keep embeddings in memory.
+-- Every write to people appends to people_changes and notifies listeners
+-- on the people_changes channel with the new change_id; replicas apply
+-- changes after the last change_id they have seen (see usecases/change_feed.py).
+CREATE TABLE IF NOT EXISTS people_changes (
+    change_id BIGSERIAL PRIMARY KEY,
+    person_id INTEGER NOT NULL,
+    patient_id INTEGER,
+    op CHAR(1) NOT NULL,  -- 'U' insert or update, 'D' delete
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS people_changes_changed_at_idx ON people_changes (changed_at);
+
+CREATE OR REPLACE FUNCTION record_people_change() RETURNS trigger AS $$
+DECLARE
+    new_change_id BIGINT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO people_changes (person_id, patient_id, op)
+        VALUES (OLD.id, OLD.patient_id, 'D')
+        RETURNING change_id INTO new_change_id;
+    ELSE
+        IF TG_OP = 'UPDATE' AND NEW.patient_id IS DISTINCT FROM OLD.patient_id THEN
+            -- Leaving the old patient's shard
+            INSERT INTO people_changes (person_id, patient_id, op) VALUES (OLD.id, OLD.patient_id, 'D');
+        END IF;
+        INSERT INTO people_changes (person_id, patient_id, op)
+        VALUES (NEW.id, NEW.patient_id, 'U')
+        RETURNING change_id INTO new_change_id;
+    END IF;
+    PERFORM pg_notify('people_changes', new_change_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Databases set up before schema_migrations existed re-run this script once: only create the trigger
+-- when it is missing, so that run takes no ACCESS EXCLUSIVE lock on people and drops nothing
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger
+        WHERE tgname = 'people_change_feed' AND tgrelid = 'people'::regclass AND NOT tgisinternal
+    ) THEN
+        CREATE TRIGGER people_change_feed
+            AFTER INSERT OR DELETE OR UPDATE OF patient_id, first_name, last_name, relationship, notes,
+                face_embedding_f32
+            ON people
+            FOR EACH ROW EXECUTE FUNCTION record_people_change();
+    END IF;
+END
+$$;
@@ -0,0 +1,4 @@
+-- Where a bulk-imported person came from, so an interrupted import can resume
+ALTER TABLE people ADD COLUMN IF NOT EXISTS source TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS people_patient_source_idx
+    ON people (patient_id, source) WHERE source IS NOT NULL;
@@ -0,0 +1,6 @@
+-- Transaction that recorded each change. change_id comes from a sequence, so a transaction can commit
+-- a lower change_id after a higher one is already visible. Replicas therefore follow the feed in
+-- (txid, change_id) order and only read changes from transactions older than every transaction still
+-- in flight, whose rows can no longer appear behind them (see usecases/change_feed.py).
+ALTER TABLE people_changes ADD COLUMN IF NOT EXISTS txid xid8 NOT NULL DEFAULT pg_current_xact_id();
+CREATE INDEX IF NOT EXISTS people_changes_txid_idx ON people_changes (txid, change_id);
@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import numpy as np
+from ultralytics import YOLO
+
+from utilities.constants import yolo_model_path
+
+YOLO_MODEL = 'yolov8n'
+
+logger = logging.getLogger(__name__)
+
+
+def _model_bytes(model: Any) -> int:
+    """Approximate memory held by a model's parameters and buffers"""
+    torch_model = getattr(model, 'model', model)
+    total = 0
+    for attr in ('parameters', 'buffers'):
+        tensors = getattr(torch_model, attr, None)
+        if callable(tensors):
+            total += sum(t.numel() * t.element_size() for t in tensors())
+    return total
+
+
+class ModelRegistry:
+    """Process-wide registry of lazily loaded, shared models.
+
+    Each model is loaded at most once per process. Inference goes through
+    `predict`, which serializes calls per model because the ultralytics
+    predictor keeps per-call state and is not safe to share across threads.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._inference_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register how to build a model without loading it"""
+        with self._lock:
+            self._loaders[name] = loader
+            self._load_locks.setdefault(name, threading.Lock())
+            self._inference_locks.setdefault(name, threading.Lock())
+
+    def _load(self, name: str) -> Any:
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model '{name}'")
+        start = time.perf_counter()
+        model = self._loaders[name]()
+        load_seconds = time.perf_counter() - start
+        self._stats[name] = {
+            'load_seconds': load_seconds,
+            'memory_bytes': _model_bytes(model),
+            'loaded_at': time.time(),
+            'loads': self._stats.get(name, {}).get('loads', 0) + 1,
+            'warmup_seconds': None
+        }
+        logger.info(f"Loaded model {name} in {load_seconds:.2f}s "
+                    f"({self._stats[name]['memory_bytes'] / 1e6:.1f} MB)")
+        return model
+
+    def get(self, name: str) -> Any:
+        """Return the shared model, loading it on first use"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._load_locks:
+            raise KeyError(f"Unknown model '{name}'")
+        with self._load_locks[name]:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+            return self._models[name]
+
+    def predict(self, name: str, *args, **kwargs):
+        """Run inference on the shared model, one call at a time"""
+        model = self.get(name)
+        with self._inference_locks[name]:
+            return model.predict(*args, **kwargs)
+
+    def warmup(self, name: str, imgsz: int = 640):
+        """Load a model and run a dummy inference so the first request is not slow"""
+        self.get(name)
+        start = time.perf_counter()
+        self.predict(name, np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+        self._stats[name]['warmup_seconds'] = time.perf_counter() - start
+
+    def reload(self, name: str, warm: bool = False) -> Dict:
+        """Load a fresh copy of a model and swap it in without a restart.
+
+        In-flight predictions finish on the old instance; the swap waits for them.
+        """
+        with self._load_locks[name]:
+            model = self._load(name)
+            with self._inference_locks[name]:
+                self._models[name] = model
+        if warm:
+            self.warmup(name)
+        return self.stats()[name]
+
+    def stats(self) -> Dict[str, Dict]:
+        """Load time and memory footprint for every registered model"""
+        with self._lock:
+            names = list(self._loaders)
+        return {
+            name: {'loaded': name in self._models, **self._stats.get(name, {})}
+            for name in names
+        }
+
+
+model_registry = ModelRegistry()
+model_registry.register(YOLO_MODEL, lambda: YOLO(yolo_model_path))
@@ -0,0 +1,324 @@
+"""Detection over several cameras with one batched YOLO call per round.
+
+Each source (device index, video file or RTSP URL) gets a capture thread that
+keeps only its latest frame. A single inference thread gathers the fresh
+frames from every source, runs them through YOLO as one batch and hands the
+annotated JPEG back to that camera's listeners.
+
+Run headless against local video files to check throughput:
+
+    python -m usecases.multi_stream lobby=videos/lobby.mp4 kitchen=videos/kitchen.mp4 --seconds 20
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Union
+
+import cv2
+import numpy as np
+
+from usecases.detection_stream import AdaptiveScheduler
+from usecases.model_registry import model_registry, YOLO_MODEL
+from utilities.constants import stream_sources
+
+logger = logging.getLogger(__name__)
+
+FrameListener = Callable[[str, int, bytes], None]
+
+
+def parse_sources(spec: str) -> Dict[str, Union[int, str]]:
+    """Parse "id=source,source,..." into {camera_id: source}; bare digits are device indices"""
+    sources = {}
+    for i, entry in enumerate(part.strip() for part in spec.split(',')):
+        if not entry:
+            continue
+        camera_id, sep, source = entry.partition('=')
+        # RTSP URLs may contain '=' in their query string, so only treat a plain name as an id
+        if not sep or '://' in camera_id:
+            camera_id, source = f"cam{i}", entry
+        sources[camera_id] = int(source) if source.isdigit() else source
+    return sources
+
+
+class CameraSource:
+    """Capture thread for one source that keeps only the most recent frame.
+
+    Video files are read at their native frame rate and loop at the end, so
+    they stand in for live cameras; devices and network streams reconnect
+    after a failed read. Failures back off exponentially, and a file that
+    still yields no frame after `max_failures` attempts is given up on.
+    """
+
+    def __init__(self, camera_id: str, source: Union[int, str], width: int = 640, height: int = 480,
+                 max_failures: int = 5, max_backoff: float = 5.0):
+        self.camera_id = camera_id
+        self.source = source
+        self.size = (width, height)
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        self.max_failures = max_failures
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.failed = False
+        self.running = False
+        self.lock = threading.Lock()
+        self.latest_frame = None
+        self.captured_at = None
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.thread = None
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not self.is_file:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        return cap
+
+    def capture_frames(self):
+        cap = self._open()
+        fps = cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+        frame_interval = 1.0 / fps if fps and fps > 0 else 0
+        next_frame_at = time.perf_counter()
+        logger.info(f"Started capture on {self.camera_id} ({self.source})")
+
+        try:
+            while self.running:
+                ret, frame = cap.read()
+                if not ret:
+                    self.failures += 1
+                    if self.is_file and self.failures >= self.max_failures:
+                        logger.error(f"Giving up on {self.camera_id} ({self.source}) after "
+                                     f"{self.failures} failed reads")
+                        self.failed = True
+                        break
+                    if self.failures > 1 or not self.is_file:
+                        # A file that fails right after rewinding is unreadable, not at its end
+                        time.sleep(min(self.max_backoff, 0.1 * 2 ** self.failures))
+                    if self.is_file:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    else:
+                        logger.warning(f"Failed to capture frame from {self.camera_id}, reconnecting")
+                        cap.release()
+                        cap = self._open()
+                    continue
+                self.failures = 0
+
+                if frame.shape[1::-1] != self.size:
+                    frame = cv2.resize(frame, self.size)
+                with self.lock:
+                    if self.latest_frame is not None:
+                        self.frames_dropped += 1
+                    self.latest_frame = frame
+                    self.captured_at = time.perf_counter()
+                    self.frames_captured += 1
+
+                if frame_interval:
+                    # Pace files like a live camera
+                    next_frame_at += frame_interval
+                    delay = next_frame_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_frame_at = time.perf_counter()
+        finally:
+            cap.release()
+
+    def take_frame(self):
+        """Take the latest unprocessed frame and its capture time, or (None, None)"""
+        with self.lock:
+            frame, captured_at = self.latest_frame, self.captured_at
+            self.latest_frame = None
+            return frame, captured_at
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.capture_frames, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            self.thread.join()
+
+
+class MultiStreamManager:
+    """Runs every camera through one YOLO model with batched inference.
+
+    Each round takes the fresh frame from every camera that has one and
+    predicts them together. The adaptive scheduler from the single-camera
+    stream sets the batch rate and imgsz; on skipped rounds each camera
+    redraws its last detections onto the new frame.
+    """
+
+    def __init__(self, sources: Dict[str, Union[int, str]], scheduler: Optional[AdaptiveScheduler] = None,
+                 max_batch_wait: float = 0.005):
+        self.cameras = {camera_id: CameraSource(camera_id, source) for camera_id, source in sources.items()}
+        self.scheduler = scheduler or AdaptiveScheduler()
+        self.max_batch_wait = max_batch_wait
+        self.running = False
+        self.lock = threading.Lock()
+        self.listeners: List[FrameListener] = []
+        self.last_results: Dict[str, object] = {}
+        self.processed_frames: Dict[str, bytes] = {}
+        self.frame_seqs: Dict[str, int] = {camera_id: 0 for camera_id in self.cameras}
+        self.latencies_ms: Dict[str, deque] = {camera_id: deque(maxlen=500) for camera_id in self.cameras}
+        self.batches = 0
+        self.batch_sizes = deque(maxlen=500)
+        self.frames_detected = 0
+        self.frames_reused = 0
+        self.process_thread = None
+
+    @classmethod
+    def from_config(cls) -> 'MultiStreamManager':
+        """Cameras from STREAM_SOURCES, or the first working local camera when unset"""
+        sources = parse_sources(stream_sources) if stream_sources else {}
+        if not sources:
+            for index in range(10):
+                cap = cv2.VideoCapture(index)
+                found = cap.isOpened() and cap.read()[0]
+                cap.release()
+                if found:
+                    sources = {'cam0': index}
+                    break
+        if not sources:
+            logger.error("No cameras found!")
+        return cls(sources)
+
+    def add_frame_listener(self, callback: FrameListener):
+        """Call `callback(camera_id, seq, jpeg_bytes)` from the processing thread for every new frame"""
+        self.listeners.append(callback)
+
+    def remove_frame_listener(self, callback: FrameListener):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _collect(self):
+        camera_ids, frames, captured_at = [], [], []
+        for camera_id, camera in self.cameras.items():
+            frame, captured = camera.take_frame()
+            if frame is not None:
+                camera_ids.append(camera_id)
+                frames.append(frame)
+                captured_at.append(captured)
+        return camera_ids, frames, captured_at
+
+    def process_frames(self):
+        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
+        while self.running:
+            camera_ids, frames, captured_at = self._collect()
+            if not frames:
+                time.sleep(self.max_batch_wait)
+                continue
+            try:
+                need_detection = any(camera_id not in self.last_results for camera_id in camera_ids)
+                if need_detection or self.scheduler.should_detect():
+                    start = time.perf_counter()
+                    results = model_registry.predict(YOLO_MODEL, frames, imgsz=self.scheduler.imgsz, verbose=False)
+                    # Budget is per camera frame, so scale the batch time back to one frame
+                    self.scheduler.record_inference((time.perf_counter() - start) * 1000 / len(frames))
+                    self.batches += 1
+                    self.batch_sizes.append(len(frames))
+                    self.frames_detected += len(frames)
+                    annotated = []
+                    for camera_id, result in zip(camera_ids, results):
+                        self.last_results[camera_id] = result
+                        annotated.append(result.plot())
+                else:
+                    annotated = [self.last_results[camera_id].plot(img=frame.copy())
+                                 for camera_id, frame in zip(camera_ids, frames)]
+                    self.frames_reused += len(frames)
+
+                for camera_id, image, captured in zip(camera_ids, annotated, captured_at):
+                    _, buffer = cv2.imencode('.jpg', image, encode_param)
+                    jpeg_bytes = buffer.tobytes()
+                    with self.lock:
+                        self.frame_seqs[camera_id] += 1
+                        seq = self.frame_seqs[camera_id]
+                        self.processed_frames[camera_id] = jpeg_bytes
+                        self.latencies_ms[camera_id].append((time.perf_counter() - captured) * 1000)
+                    for listener in list(self.listeners):
+                        listener(camera_id, seq, jpeg_bytes)
+            except Exception as e:
+                logger.error(f"Error processing batch from {camera_ids}: {e}")
+
+    def latest_frame(self, camera_id: str):
+        """(seq, jpeg_bytes) of the last processed frame for a camera"""
+        with self.lock:
+            return self.frame_seqs.get(camera_id, 0), self.processed_frames.get(camera_id)
+
+    def stats(self) -> Dict:
+        """Per-camera counters and latency, plus queue depth and scheduler state for the whole batch"""
+        cameras = {}
+        all_latencies = []
+        with self.lock:
+            for camera_id, camera in self.cameras.items():
+                latencies = np.array(self.latencies_ms[camera_id]) if self.latencies_ms[camera_id] else None
+                all_latencies.extend(self.latencies_ms[camera_id])
+                with camera.lock:
+                    queue_depth = int(camera.latest_frame is not None)
+                cameras[camera_id] = {
+                    "source": str(camera.source),
+                    "failed": camera.failed,
+                    "queue_depth": queue_depth,
+                    "frames_captured": camera.frames_captured,
+                    "frames_dropped": camera.frames_dropped,
+                    "frames_processed": self.frame_seqs[camera_id],
+                    "latency_ms_p50": float(np.percentile(latencies, 50)) if latencies is not None else None,
+                    "latency_ms_p95": float(np.percentile(latencies, 95)) if latencies is not None else None
+                }
+        return {
+            "cameras": cameras,
+            "queue_depth": sum(camera["queue_depth"] for camera in cameras.values()),
+            "batches": self.batches,
+            "avg_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else None,
+            "frames_detected": self.frames_detected,
+            "frames_reused": self.frames_reused,
+            "detect_interval": self.scheduler.detect_interval,
+            "imgsz": self.scheduler.imgsz,
+            "inference_ms_ema": self.scheduler.inference_ms_ema,
+            "latency_budget_ms": self.scheduler.latency_budget_ms,
+            "latency_ms_p50": float(np.percentile(all_latencies, 50)) if all_latencies else None,
+            "latency_ms_p95": float(np.percentile(all_latencies, 95)) if all_latencies else None
+        }
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            for camera in self.cameras.values():
+                camera.start()
+            self.process_thread = threading.Thread(target=self.process_frames, daemon=True)
+            self.process_thread.start()
+            logger.info(f"Multi-camera stream started with {list(self.cameras)}")
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            for camera in self.cameras.values():
+                camera.stop()
+            self.process_thread.join()
+            logger.info("Multi-camera stream stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='Sources as id=source or source (device index, file or URL)')
+    parser.add_argument('--seconds', type=float, default=10, help='How long to run before printing stats')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    manager = MultiStreamManager(parse_sources(','.join(args.sources)))
+    manager.start()
+    try:
+        time.sleep(args.seconds)
+    finally:
+        manager.stop()
+    print(json.dumps(manager.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Bulk import and export of the people table.
+
+Import streams photos from a directory (one sub-directory per person, named
+"First Last" or "First_Last") or a CSV manifest with the columns image,
+first_name, last_name, relationship and optionally notes and patient_id.
+Images are encoded across the enrollment worker pool and each batch is
+loaded with COPY and committed. Every row records its image path as
+`source`, so re-running an interrupted import skips what is already in:
+
+    python -m usecases.people_bulk import photos/ --patient-id 1 --relationship family
+    python -m usecases.people_bulk import manifest.csv --patient-id 1
+
+Export writes every embedding and its metadata to an .npz snapshot. Set
+FACE_INDEX_SNAPSHOT to it and the service loads its face index from the
+file, then replays the change feed since the export instead of reading
+every row from the database:
+
+    python -m usecases.people_bulk export snapshot.npz --dtype float16
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import psycopg2
+
+from usecases.change_feed import ChangeFeed, FeedPosition
+from usecases.embedding_codec import decode_embeddings, encode_embedding
+from usecases.face_database import FaceDatabase, to_vector_literal
+from usecases.face_identification import encode_images_parallel
+from utilities.constants import bulk_import_batch_size, change_feed_retention_hours
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+COPY_COLUMNS = ('patient_id', 'first_name', 'last_name', 'relationship',
+                'face_embedding_f32', 'face_embedding_vec', 'notes', 'source')
+
+
+def iter_directory(root: str, patient_id: Optional[int], relationship: Optional[str]) -> Iterator[Dict]:
+    """One entry per image under root/<person name>/"""
+    for person_dir in sorted((entry for entry in os.scandir(root) if entry.is_dir()), key=lambda entry: entry.name):
+        first_name, _, last_name = person_dir.name.replace('_', ' ').strip().partition(' ')
+        for file_name in sorted(os.listdir(person_dir.path)):
+            if os.path.splitext(file_name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            yield {
+                'path': os.path.join(person_dir.path, file_name),
+                'source': f'{person_dir.name}/{file_name}',
+                'patient_id': patient_id,
+                'first_name': first_name,
+                'last_name': last_name.strip(),
+                'relationship': relationship,
+                'notes': None
+            }
+
+
+def iter_manifest(manifest_path: str, patient_id: Optional[int], relationship: Optional[str]) -> Iterator[Dict]:
+    """One entry per CSV row; image paths are relative to the manifest"""
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield {
+                'path': os.path.join(base, row['image']),
+                'source': row['image'],
+                'patient_id': int(row['patient_id']) if row.get('patient_id') else patient_id,
+                'first_name': row['first_name'],
+                'last_name': row.get('last_name') or '',
+                'relationship': row.get('relationship') or relationship,
+                'notes': row.get('notes') or row.get('personal_context') or None
+            }
+
+
+def batches(entries: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_field(value) -> str:
+    """A value in COPY's text format"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_people(face_db: FaceDatabase, rows: List[Tuple]) -> int:
+    """COPY rows into a staging table and insert those not already imported; returns the count inserted"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_field(value) for value in row) + '\n')
+    buffer.seek(0)
+    columns = ', '.join(COPY_COLUMNS)
+    with face_db.pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE people_import (
+                    patient_id INTEGER, first_name VARCHAR(50), last_name VARCHAR(50),
+                    relationship VARCHAR(50), face_embedding_f32 BYTEA,
+                    face_embedding_vec vector(128), notes TEXT, source TEXT
+                ) ON COMMIT DROP
+            """)
+            cur.copy_expert(f"COPY people_import ({columns}) FROM STDIN", buffer)
+            cur.execute(f"""
+                INSERT INTO people ({columns})
+                SELECT {columns} FROM people_import
+                ON CONFLICT (patient_id, source) WHERE source IS NOT NULL DO NOTHING
+            """)
+            inserted = cur.rowcount
+            conn.commit()
+    return inserted
+
+
+def already_imported(face_db: FaceDatabase, batch: List[Dict]) -> set:
+    """(patient_id, source) pairs of the batch that an earlier run loaded"""
+    with face_db.pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT patient_id, source FROM people WHERE source = ANY(%s)",
+                        ([entry['source'] for entry in batch],))
+            return set(cur.fetchall())
+
+
+def import_people(face_db: FaceDatabase, entries: Iterator[Dict], batch_size: int = bulk_import_batch_size) -> Dict:
+    """Encode and load entries batch by batch, printing throughput as it goes"""
+    totals = {'inserted': 0, 'skipped': 0, 'failed': 0}
+    start = time.perf_counter()
+    for batch in batches(entries, batch_size):
+        for entry in batch:
+            if entry['patient_id'] is None or not entry['relationship'] or not entry['first_name']:
+                raise ValueError(f"{entry['source']}: needs a patient_id, first_name and relationship")
+
+        done = already_imported(face_db, batch)
+        pending = [entry for entry in batch if (entry['patient_id'], entry['source']) not in done]
+        totals['skipped'] += len(batch) - len(pending)
+
+        images = []
+        for entry in pending:
+            with open(entry['path'], 'rb') as f:
+                images.append(f.read())
+        rows = []
+        for entry, (embedding, error) in zip(pending, encode_images_parallel(images)):
+            if error:
+                totals['failed'] += 1
+                print(f"{entry['source']}: {error}", file=sys.stderr)
+                continue
+            rows.append((entry['patient_id'], entry['first_name'], entry['last_name'], entry['relationship'],
+                         '\\x' + encode_embedding(embedding).hex(), to_vector_literal(embedding),
+                         entry['notes'], entry['source']))
+        if rows:
+            totals['inserted'] += copy_people(face_db, rows)
+
+        elapsed = time.perf_counter() - start
+        processed = sum(totals.values())
+        print(f"{processed} images: {totals['inserted']} inserted, {totals['skipped']} already imported, "
+              f"{totals['failed']} failed ({processed / elapsed:.1f} images/s)")
+    totals['seconds'] = time.perf_counter() - start
+    return totals
+
+
+def export_snapshot(face_db: FaceDatabase, path: str, dtype: str = 'float32', chunk_rows: int = 10000) -> int:
+    """Stream every embedded person into an .npz snapshot; returns the number exported"""
+    ids, patient_ids, embeddings, metadata = [], [], [], []
+    with face_db.pool.connection() as conn:
+        with conn.cursor() as cur:
+            # Read first: every change from a transaction older than xmin is already in the scan below;
+            # later ones committed during the scan are replayed again, which is harmless
+            cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text, EXTRACT(EPOCH FROM now())")
+            feed_txid, exported_at = cur.fetchone()
+        with conn.cursor(name='people_export') as cur:
+            cur.itersize = chunk_rows
+            cur.execute("""
+                SELECT p.id, p.patient_id, p.first_name, p.last_name,
+                       p.relationship, p.notes, p.face_embedding_f32
+                FROM people p
+                WHERE p.face_embedding_f32 IS NOT NULL
+                ORDER BY p.id
+            """)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                ids.extend(row[0] for row in rows)
+                patient_ids.extend(-1 if row[1] is None else row[1] for row in rows)
+                metadata.extend([row[2], row[3], row[4], row[5]] for row in rows)
+                embeddings.append(decode_embeddings(row[6] for row in rows).astype(dtype))
+
+    # Through a file object so numpy writes exactly `path` without appending .npz
+    with open(path, 'wb') as f:
+        np.savez(f,
+                 ids=np.asarray(ids, dtype=np.int64),
+                 patient_ids=np.asarray(patient_ids, dtype=np.int64),
+                 embeddings=np.concatenate(embeddings) if embeddings else np.empty((0, 128), dtype=dtype),
+                 # JSON bytes rather than object arrays, so loading never needs pickle
+                 metadata=np.frombuffer(json.dumps(metadata).encode('utf-8'), dtype=np.uint8),
+                 feed_txid=np.int64(feed_txid),
+                 exported_at=np.float64(exported_at))
+    return len(ids)
+
+
+def load_snapshot(path: str) -> Dict:
+    """Read a snapshot into FaceIndex.load arguments plus its change feed position"""
+    with np.load(path) as snapshot:
+        rows = json.loads(snapshot['metadata'].tobytes().decode('utf-8'))
+        return {
+            'ids': snapshot['ids'].tolist(),
+            'patient_ids': snapshot['patient_ids'],
+            'embeddings': snapshot['embeddings'].astype(np.float32),
+            'metadata': [{'first_name': first_name, 'last_name': last_name,
+                          'relationship': relationship, 'notes': notes}
+                         for first_name, last_name, relationship, notes in rows],
+            'position': (int(snapshot['feed_txid']), 0),
+            'exported_at': float(snapshot['exported_at'])
+        }
+
+
+def warm_face_index(face_db: FaceDatabase, path: str) -> Optional[FeedPosition]:
+    """Load the global face index from a snapshot and catch up on changes since it was taken.
+
+    Returns the change feed position the index is current to, for ChangeFeed.start, or
+    None when the snapshot cannot be used and the index is left to load
+    from the database as usual.
+    """
+    try:
+        snapshot = load_snapshot(path)
+        with face_db.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT EXTRACT(EPOCH FROM now())")
+                age_hours = (float(cur.fetchone()[0]) - snapshot['exported_at']) / 3600
+        if age_hours > change_feed_retention_hours:
+            logger.warning(f"Face index snapshot {path} is {age_hours:.0f}h old, "
+                           f"older than the change log keeps; ignoring it")
+            return None
+
+        with face_db.face_index.lock:
+            face_db.face_index.load(snapshot['ids'], snapshot['embeddings'], snapshot['metadata'])
+            feed = ChangeFeed(face_db)
+            feed.position = snapshot['position']
+            replayed = feed.apply_pending()
+        logger.info(f"Warmed the face index with {len(snapshot['ids'])} people from {path}, "
+                    f"replayed {replayed} later changes")
+        return feed.position
+    except (OSError, KeyError, ValueError, psycopg2.Error) as e:
+        logger.warning(f"Could not warm the face index from {path}: {e}")
+        with face_db.face_index.lock:
+            face_db.face_index.clear()
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('import', help='Import photos from a directory or CSV manifest')
+    load.add_argument('source', help='Directory with one folder per person, or a CSV manifest')
+    load.add_argument('--patient-id', type=int, help='Patient for entries without their own patient_id')
+    load.add_argument('--relationship', help='Relationship for entries without their own')
+    load.add_argument('--batch-size', type=int, default=bulk_import_batch_size)
+    export = commands.add_parser('export', help='Write every embedding to an .npz snapshot')
+    export.add_argument('output')
+    export.add_argument('--dtype', choices=['float32', 'float16'], default='float32')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    face_db = FaceDatabase()
+    if args.command == 'import':
+        if os.path.isdir(args.source):
+            entries = iter_directory(args.source, args.patient_id, args.relationship)
+        else:
+            entries = iter_manifest(args.source, args.patient_id, args.relationship)
+        totals = import_people(face_db, entries, args.batch_size)
+        print(f"Done in {totals['seconds']:.1f}s: {totals['inserted']} inserted, "
+              f"{totals['skipped']} already imported, {totals['failed']} failed")
+    else:
+        start = time.perf_counter()
+        count = export_snapshot(face_db, args.output, args.dtype)
+        print(f"Exported {count} people to {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compare quantized face indexes against exact float64 search.
+
+For each mode it reports recall@k of the true nearest neighbours, top-1
+agreement, how often the match decision at the threshold agrees with the
+exact one, resident bytes and per-query latency:
+
+    python -m usecases.quantization_report --people 100000 --queries 500
+    python -m usecases.quantization_report --embeddings known_faces.npy --modes int8,pq
+
+Without --embeddings the data is synthetic: a cluster of samples per
+identity, queried with fresh samples of known people and with strangers.
+With --embeddings each query is a stored embedding plus a little noise.
+Re-ranking uses the exact embeddings held by the report itself, standing in
+for the database fetch the service makes.
+"""
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from usecases.face_index import EMBEDDING_DIM, FaceIndex
+from usecases.quantized_face_index import QuantizedFaceIndex, CODECS
+from utilities.constants import face_index_rerank
+
+
+def synthetic_people(people: int, queries: int, rng: np.random.Generator):
+    """Known embeddings and queries; half the queries are unseen strangers"""
+    # face_recognition: same person ~0.3-0.45 apart, different people ~0.7-1.0
+    centers = rng.normal(0, 0.055, size=(people, EMBEDDING_DIM))
+    known = centers + rng.normal(0, 0.022, size=centers.shape)
+    targets = rng.integers(0, people, size=queries)
+    strangers = rng.normal(0, 0.055, size=(queries, EMBEDDING_DIM))
+    own_samples = centers[targets] + rng.normal(0, 0.022, size=(queries, EMBEDDING_DIM))
+    query_vectors = np.where((np.arange(queries) % 2 == 0)[:, np.newaxis], own_samples, strangers)
+    return known, query_vectors
+
+
+def exact_search(known: np.ndarray, queries: np.ndarray, k: int):
+    """Ground truth in float64: (ids, distances) of the k nearest per query"""
+    distances = np.sqrt(np.maximum(
+        np.einsum('ij,ij->i', queries, queries)[:, np.newaxis]
+        - 2.0 * queries @ known.T
+        + np.einsum('ij,ij->i', known, known)[np.newaxis, :], 0.0))
+    nearest = np.argsort(distances, axis=1)[:, :k]
+    return nearest + 1, np.take_along_axis(distances, nearest, axis=1)
+
+
+def evaluate(index, known: np.ndarray, queries: np.ndarray, truth_ids: np.ndarray,
+             truth_distances: np.ndarray, threshold: float, k: int) -> Dict:
+    metadata = [{'first_name': '', 'last_name': '', 'relationship': '', 'notes': None}] * len(known)
+    start = time.perf_counter()
+    index.load(list(range(1, len(known) + 1)), known.astype(np.float32), metadata)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # Threshold of infinity returns all k neighbours so recall can be measured
+    results = index.search_batch(queries, threshold=float('inf'), k=k)
+    search_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    recall, top1, decisions = 0.0, 0, 0
+    for found, ids, distances in zip(results, truth_ids, truth_distances):
+        found_ids = [match['id'] for match in found]
+        recall += len(set(found_ids) & set(ids.tolist())) / k
+        top1 += bool(found_ids) and found_ids[0] == ids[0]
+        exact_match = ids[0] if distances[0] < threshold else None
+        approx_match = found_ids[0] if found and 1 - found[0]['similarity'] < threshold else None
+        decisions += exact_match == approx_match
+    return {
+        f'recall@{k}': recall / len(queries),
+        'top1_agreement': top1 / len(queries),
+        'decision_agreement': decisions / len(queries),
+        'bytes': index.nbytes,
+        'load_s': load_seconds,
+        'query_ms': search_ms
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--people', type=int, default=20000, help='Synthetic known people')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--embeddings', help='(n, 128) .npy of real embeddings to use instead of synthetic ones')
+    parser.add_argument('--modes', default=','.join(CODECS), help='Comma-separated quantization modes')
+    parser.add_argument('--rerank', type=int, default=face_index_rerank,
+                        help='Candidates re-scored exactly; 0 disables')
+    parser.add_argument('--threshold', type=float, default=0.55)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.embeddings:
+        known = np.load(args.embeddings).astype(np.float64).reshape(-1, EMBEDDING_DIM)
+        picks = rng.integers(0, len(known), size=args.queries)
+        queries = known[picks] + rng.normal(0, 0.02, size=(args.queries, EMBEDDING_DIM))
+    else:
+        known, queries = synthetic_people(args.people, args.queries, rng)
+    truth_ids, truth_distances = exact_search(known, queries, args.k)
+    exact_rows = known.astype(np.float32)
+
+    def rerank_loader(person_ids: List[int]) -> np.ndarray:
+        return exact_rows[np.asarray(person_ids) - 1]
+
+    indexes = {'float32': FaceIndex()}
+    for mode in args.modes.split(','):
+        indexes[mode] = QuantizedFaceIndex(mode, rerank=args.rerank)
+        if args.rerank:
+            indexes[f'{mode}+rerank'] = QuantizedFaceIndex(mode, rerank=args.rerank, rerank_loader=rerank_loader)
+
+    print(f"{len(known)} people, {len(queries)} queries, threshold {args.threshold}; "
+          f"exact float64 matrix is {known.nbytes / 1e6:.1f} MB")
+    print(f"{'index':<16}{'recall@' + str(args.k):>10}{'top-1':>8}{'decision':>10}{'MB':>8}{'x smaller':>11}"
+          f"{'load s':>8}{'query ms':>10}")
+    for name, index in indexes.items():
+        report = evaluate(index, known, queries, truth_ids, truth_distances, args.threshold, args.k)
+        print(f"{name:<16}{report[f'recall@{args.k}']:>10.4f}{report['top1_agreement']:>8.4f}"
+              f"{report['decision_agreement']:>10.4f}{report['bytes'] / 1e6:>8.2f}"
+              f"{known.nbytes / report['bytes']:>11.1f}{report['load_s']:>8.2f}{report['query_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from usecases.face_index import EMBEDDING_DIM, FaceIndex, match_result
+from utilities.constants import (face_index_quantization, face_index_pq_subspaces, face_index_rerank,
+                                 face_index_rerank_modes)
+
+# Fetches exact embeddings for person ids, in order, to re-rank approximate candidates
+RerankLoader = Callable[[List[int]], np.ndarray]
+
+
+class Float16Codec:
+    """Half precision: 2 bytes per dimension, error far below the match threshold"""
+    name = 'float16'
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.min_training_rows = 0
+
+    def fit(self, embeddings: np.ndarray):
+        pass
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        return np.asarray(embeddings, dtype=np.float16)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32)
+
+    def empty(self, rows: int) -> np.ndarray:
+        return np.empty((rows, self.dim), dtype=np.float16)
+
+    @property
+    def nbytes(self) -> int:
+        return 0
+
+
+class Int8Codec:
+    """Per-dimension affine scalar quantization to one byte per dimension"""
+    name = 'int8'
+
+    def __init__(self, dim: int, min_training_rows: int = 64):
+        self.dim = dim
+        self.min_training_rows = min_training_rows
+        self.offset = np.zeros(dim, dtype=np.float32)
+        # face_recognition encodings stay within about +-0.5 per dimension
+        self.scale = np.full(dim, 0.5 / 127, dtype=np.float32)
+
+    def fit(self, embeddings: np.ndarray):
+        """Fit the range of each dimension"""
+        low, high = embeddings.min(axis=0), embeddings.max(axis=0)
+        self.offset = ((high + low) / 2).astype(np.float32)
+        self.scale = np.maximum((high - low) / 254, 1e-6).astype(np.float32)
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(embeddings, dtype=np.float32) - self.offset) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def empty(self, rows: int) -> np.ndarray:
+        return np.empty((rows, self.dim), dtype=np.int8)
+
+    @property
+    def nbytes(self) -> int:
+        return self.offset.nbytes + self.scale.nbytes
+
+
+class ProductQuantizationCodec:
+    """Splits each embedding into subspaces and stores the nearest of 256 centroids per subspace.
+
+    Distances are approximated with per-query lookup tables (asymmetric
+    distance computation), so a vector costs one byte per subspace.
+    """
+    name = 'pq'
+
+    def __init__(self, dim: int, subspaces: int = 32, centroids: int = 256, iterations: int = 15,
+                 training_rows: int = 65536, seed: int = 0):
+        if dim % subspaces:
+            raise ValueError(f"Embedding dimension {dim} is not divisible by {subspaces} subspaces")
+        self.dim = dim
+        self.subspaces = subspaces
+        self.sub_dim = dim // subspaces
+        self.centroids = centroids
+        self.iterations = iterations
+        self.training_rows = training_rows
+        self.seed = seed
+        # Fewer rows than centroids would leave most codes unused
+        self.min_training_rows = centroids
+        self.codebooks = np.zeros((subspaces, 1, self.sub_dim), dtype=np.float32)
+
+    def _split(self, embeddings: np.ndarray) -> np.ndarray:
+        return np.asarray(embeddings, dtype=np.float32).reshape(-1, self.subspaces, self.sub_dim)
+
+    def fit(self, embeddings: np.ndarray):
+        """k-means per subspace, on a sample of at most `training_rows` embeddings"""
+        rng = np.random.default_rng(self.seed)
+        parts = self._split(embeddings)
+        if parts.shape[0] > self.training_rows:
+            parts = parts[rng.choice(parts.shape[0], self.training_rows, replace=False)]
+        k = min(self.centroids, parts.shape[0])
+        codebooks = np.empty((self.subspaces, k, self.sub_dim), dtype=np.float32)
+        for j in range(self.subspaces):
+            points = np.ascontiguousarray(parts[:, j, :])
+            centers = points[rng.choice(points.shape[0], k, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._nearest(points, centers)
+                counts = np.bincount(assignment, minlength=k)[:, np.newaxis]
+                sums = np.stack([np.bincount(assignment, weights=points[:, d], minlength=k)
+                                 for d in range(self.sub_dim)], axis=1)
+                # Empty clusters keep their previous centre
+                centers = np.where(counts > 0, sums / np.maximum(counts, 1), centers)
+            codebooks[j] = centers
+        self.codebooks = codebooks
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        sq = (np.einsum('ij,ij->i', centers, centers)[np.newaxis, :] - 2.0 * points @ centers.T)
+        return np.argmin(sq, axis=1)
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        parts = self._split(embeddings)
+        codes = np.empty((parts.shape[0], self.subspaces), dtype=np.uint8)
+        for j in range(self.subspaces):
+            codes[:, j] = self._nearest(parts[:, j, :], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = self.codebooks[np.arange(self.subspaces)[np.newaxis, :], codes.astype(np.intp)]
+        return parts.reshape(codes.shape[0], self.dim)
+
+    def empty(self, rows: int) -> np.ndarray:
+        return np.empty((rows, self.subspaces), dtype=np.uint8)
+
+    def sq_distances(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate squared distances from every query to every code via lookup tables"""
+        parts = self._split(queries)
+        # tables[q, j, c] = ||query_j - centroid_jc||^2
+        tables = (np.einsum('qjd,qjd->qj', parts, parts)[:, :, np.newaxis]
+                  - 2.0 * np.einsum('qjd,jcd->qjc', parts, self.codebooks)
+                  + np.einsum('jcd,jcd->jc', self.codebooks, self.codebooks)[np.newaxis, :, :])
+        distances = np.zeros((queries.shape[0], codes.shape[0]), dtype=np.float32)
+        for j in range(self.subspaces):
+            distances += tables[:, j, codes[:, j]]
+        return distances
+
+    @property
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes
+
+
+CODECS = {'float16': Float16Codec, 'int8': Int8Codec, 'pq': ProductQuantizationCodec}
+
+
+class QuantizedFaceIndex:
+    """FaceIndex with compact codes in place of the float32 matrix.
+
+    Approximate distances pick a shortlist of `rerank` candidates; when a
+    rerank loader is given those are re-scored with exact embeddings, so the
+    0.55 match decision is made on exact distances. With the service's loader,
+    FaceDatabase.load_exact_embeddings, that is one database round trip per
+    lookup; rerank=0 keeps lookups in memory.
+
+    The quantizer is trained on each load; people added afterwards use it
+    until the next reload. Until there are enough rows to train it
+    (`min_training_rows` of the codec, 256 for pq) rows are kept as exact
+    float32 and searched exactly; the add that reaches the threshold trains
+    the quantizer and encodes every row. Has the same interface as FaceIndex.
+    """
+
+    def __init__(self,
+                 mode: str = 'int8',
+                 dim: int = EMBEDDING_DIM,
+                 rerank: int = face_index_rerank,
+                 rerank_loader: Optional[RerankLoader] = None,
+                 pq_subspaces: int = face_index_pq_subspaces,
+                 chunk_rows: int = 16384,
+                 initial_capacity: int = 64):
+        if mode not in CODECS:
+            raise ValueError(f"Unknown quantization mode {mode!r}; expected one of {sorted(CODECS)}")
+        self.mode = mode
+        self.dim = dim
+        self.rerank = rerank
+        self.rerank_loader = rerank_loader
+        self.chunk_rows = chunk_rows
+        self.codec = ProductQuantizationCodec(dim, pq_subspaces) if mode == 'pq' else CODECS[mode](dim)
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._initial_capacity = initial_capacity
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self._codes.nbytes + self._ids.nbytes + self.codec.nbytes
+
+    def _empty(self, rows: int) -> np.ndarray:
+        return np.empty((rows, self.dim), dtype=np.float32) if self._exact else self.codec.empty(rows)
+
+    def _train(self):
+        """Fit the quantizer on the exact rows held so far and switch to codes"""
+        exact = self._codes[:self._size]
+        self.codec.fit(exact)
+        self._exact = False
+        codes = self._empty(self._codes.shape[0])
+        codes[:self._size] = self.codec.encode(exact)
+        self._codes = codes
+
+    def clear(self):
+        with self.lock:
+            # Exact rows until there are enough to train the quantizer
+            self._exact = self.codec.min_training_rows > 0
+            self._codes = self._empty(self._initial_capacity)
+            self._ids = np.empty(self._initial_capacity, dtype=np.int64)
+            self._metadata: List[Dict] = []
+            self._size = 0
+            self.loaded = False
+
+    def _reserve(self, capacity: int):
+        if capacity <= self._codes.shape[0]:
+            return
+        new_capacity = max(capacity, 2 * self._codes.shape[0])
+        codes = self._empty(new_capacity)
+        ids = np.empty(new_capacity, dtype=np.int64)
+        codes[:self._size] = self._codes[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        self._codes, self._ids = codes, ids
+
+    def load(self, ids: List[int], embeddings: np.ndarray, metadata: List[Dict]):
+        """Replace the contents, (re)training the quantizer on the full snapshot"""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if not (len(ids) == embeddings.shape[0] == len(metadata)):
+            raise ValueError("ids, embeddings and metadata must have the same length")
+
+        with self.lock:
+            self.clear()
+            if self._exact and len(ids) >= self.codec.min_training_rows:
+                self.codec.fit(embeddings)
+                self._exact = False
+                self._codes = self._empty(self._initial_capacity)
+            self._reserve(len(ids))
+            self._size = len(ids)
+            self._codes[:self._size] = self._encode(embeddings)
+            self._ids[:self._size] = ids
+            self._metadata = list(metadata)
+            self.loaded = True
+
+    def _encode(self, embeddings: np.ndarray) -> np.ndarray:
+        return embeddings if self._exact else self.codec.encode(embeddings)
+
+    def _position(self, person_id: int) -> int:
+        positions = np.flatnonzero(self._ids[:self._size] == person_id)
+        return int(positions[0]) if len(positions) else -1
+
+    def add(self, person_id: int, embedding: np.ndarray, metadata: Dict):
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, self.dim)
+        with self.lock:
+            if self._position(person_id) >= 0:
+                return
+            self._reserve(self._size + 1)
+            self._codes[self._size] = self._encode(embedding)[0]
+            self._ids[self._size] = person_id
+            self._metadata.append(metadata)
+            self._size += 1
+            if self._exact and self._size >= self.codec.min_training_rows:
+                self._train()
+
+    def upsert(self, person_id: int, embedding: np.ndarray, metadata: Dict):
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, self.dim)
+        with self.lock:
+            position = self._position(person_id)
+            if position < 0:
+                self.add(person_id, embedding, metadata)
+                return
+            self._codes[position] = self._encode(embedding)[0]
+            self._metadata[position] = metadata
+
+    def remove(self, person_id: int) -> bool:
+        with self.lock:
+            position = self._position(person_id)
+            if position < 0:
+                return False
+            last = self._size - 1
+            self._codes[position] = self._codes[last]
+            self._ids[position] = self._ids[last]
+            self._metadata[position] = self._metadata[last]
+            self._metadata.pop()
+            self._size = last
+            return True
+
+    def _approximate_sq_distances(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        if self._exact:
+            return (np.einsum('ij,ij->i', codes, codes)[np.newaxis, :] - 2.0 * (queries @ codes.T)
+                    + np.einsum('ij,ij->i', queries, queries)[:, np.newaxis])
+        if isinstance(self.codec, ProductQuantizationCodec):
+            return self.codec.sq_distances(queries, codes)
+        # Decode in chunks so the float32 copy never spans the whole index
+        query_sq = np.einsum('ij,ij->i', queries, queries)[:, np.newaxis]
+        distances = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], self.chunk_rows):
+            chunk = self.codec.decode(codes[start:start + self.chunk_rows])
+            distances[:, start:start + chunk.shape[0]] = (np.einsum('ij,ij->i', chunk, chunk)[np.newaxis, :]
+                                                          - 2.0 * (queries @ chunk.T) + query_sq)
+        return distances
+
+    def search(self, face_embedding: np.ndarray, threshold: float = 0.55, k: int = 5) -> List[Dict]:
+        return self.search_batch(np.asarray(face_embedding).reshape(1, self.dim), threshold, k)[0]
+
+    def search_batch(self, face_embeddings: np.ndarray, threshold: float = 0.55, k: int = 5) -> List[List[Dict]]:
+        queries = np.asarray(face_embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if queries.shape[0] == 0:
+            return []
+
+        with self.lock:
+            size = self._size
+            if size == 0:
+                return [[] for _ in range(queries.shape[0])]
+            ids = self._ids[:size].copy()
+            metadata = self._metadata[:size]
+            stored_exact = self._exact
+            sq_distances = self._approximate_sq_distances(queries, self._codes[:size])
+
+        rerank = self.rerank_loader is not None and not stored_exact
+        shortlist = min(size, max(k, self.rerank) if rerank else k)
+        if size > shortlist:
+            candidates = np.argpartition(sq_distances, shortlist - 1, axis=1)[:, :shortlist]
+        else:
+            candidates = np.broadcast_to(np.arange(size), (queries.shape[0], size))
+
+        if rerank:
+            # One fetch for every query's candidates, then exact distances
+            unique = np.unique(candidates)
+            exact = np.asarray(self.rerank_loader([int(i) for i in ids[unique]]), dtype=np.float32)
+            rows = {int(position): row for position, row in zip(unique, exact)}
+            candidate_vectors = np.stack([[rows[int(i)] for i in row] for row in candidates])
+            distances = np.linalg.norm(candidate_vectors - queries[:, np.newaxis, :], axis=2)
+        else:
+            distances = np.sqrt(np.maximum(np.take_along_axis(sq_distances, candidates, axis=1), 0.0))
+
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        all_results = []
+        for row_candidates, row_distances, row_order in zip(candidates, distances, order):
+            results = []
+            for j in row_order:
+                if row_distances[j] >= threshold:
+                    break
+                i = row_candidates[j]
+                results.append(match_result(ids[i], metadata[i], row_distances[j]))
+            all_results.append(results)
+        return all_results
+
+
+def make_face_index(mode: str = face_index_quantization,
+                    rerank: int = face_index_rerank,
+                    rerank_loader: Optional[RerankLoader] = None,
+                    rerank_modes: List[str] = face_index_rerank_modes):
+    """The configured resident index: a plain FaceIndex, or a quantized one.
+
+    Only modes listed in rerank_modes (pq by default) re-rank, and only when rerank is above 0.
+    """
+    if mode in ('none', 'float32', ''):
+        return FaceIndex()
+    rerank_loader = rerank_loader if rerank > 0 and mode in rerank_modes else None
+    return QuantizedFaceIndex(mode, rerank=rerank, rerank_loader=rerank_loader)
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from utilities.constants import (scene_cooldown_seconds, scene_object_change_threshold,
+                                 scene_session_ttl_seconds, scene_max_sessions)
+
+
+def jaccard_distance(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """1 - |a & b| / |a | b|; two empty sets are identical"""
+    union = a | b
+    if not union:
+        return 0.0
+    return 1.0 - len(a & b) / len(union)
+
+
+class SceneStateTracker:
+    """Per-session memory of the last scene so the LLM is only called when it changes.
+
+    A scene is the set of identified person ids (plus how many faces were
+    unknown) and the set of filtered object names. The last LLM message is
+    reused until the identities change, the object set drifts by more than
+    `object_change_threshold` (Jaccard distance), or `cooldown_seconds` pass.
+    """
+
+    def __init__(self,
+                 cooldown_seconds: float = scene_cooldown_seconds,
+                 object_change_threshold: float = scene_object_change_threshold,
+                 session_ttl_seconds: float = scene_session_ttl_seconds,
+                 max_sessions: int = scene_max_sessions):
+        self.cooldown_seconds = cooldown_seconds
+        self.object_change_threshold = object_change_threshold
+        self.session_ttl_seconds = session_ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._reused = 0
+        self._refreshed = 0
+
+    @staticmethod
+    def scene_key(identified_people: Iterable[Dict], objects: Iterable[str]):
+        people = list(identified_people)
+        identities = frozenset(person['id'] for person in people if person['id'] is not None)
+        unknown_faces = sum(1 for person in people if person['id'] is None)
+        return (identities, unknown_faces), frozenset(objects)
+
+    def _expire(self, now: float):
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state['last_seen'] < self.session_ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.pop(session_id)
+
+    def lookup(self, session_id: str, identified_people: Iterable[Dict],
+               objects: Iterable[str]) -> Tuple[Optional[Dict], bool]:
+        """The previous message if the scene has not meaningfully changed, else None.
+
+        The flag is True when the scene is the same but the cooldown has
+        passed: the caller wants a new message, so it should not be served
+        from the LLM response cache either.
+        """
+        identities, object_set = self.scene_key(identified_people, objects)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            state = self._sessions.get(session_id)
+            cooled_down = False
+            if state is not None:
+                state['last_seen'] = now
+                self._sessions.move_to_end(session_id)
+                same_scene = (
+                    state['identities'] == identities
+                    and jaccard_distance(state['objects'], object_set) <= self.object_change_threshold
+                )
+                if same_scene and now - state['updated_at'] < self.cooldown_seconds:
+                    self._reused += 1
+                    return state['response'], False
+                cooled_down = same_scene
+            self._refreshed += 1
+            return None, cooled_down
+
+    def last_response(self, session_id: str, identified_people: Iterable[Dict], objects: Iterable[str]) -> Optional[Dict]:
+        """The previous message if the scene has not meaningfully changed, else None"""
+        return self.lookup(session_id, identified_people, objects)[0]
+
+    def update(self, session_id: str, identified_people: Iterable[Dict], objects: Iterable[str], response: Dict):
+        """Remember the scene that produced a fresh LLM message"""
+        identities, object_set = self.scene_key(identified_people, objects)
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = {
+                'identities': identities,
+                'objects': object_set,
+                'response': response,
+                'updated_at': now,
+                'last_seen': now
+            }
+            self._sessions.move_to_end(session_id)
+            self._expire(now)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            decisions = self._reused + self._refreshed
+            return {
+                'sessions': len(self._sessions),
+                'llm_calls_skipped': self._reused,
+                'llm_calls_made': self._refreshed,
+                'skip_rate': self._reused / decisions if decisions else 0.0
+            }
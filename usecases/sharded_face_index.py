@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from usecases.face_index import FaceIndex
+from utilities.constants import face_shard_max_bytes
+
+# Loads one patient's people as (ids, embeddings, metadata)
+ShardLoader = Callable[[int], Tuple[List[int], np.ndarray, List[Dict]]]
+
+
+class ShardedFaceIndex:
+    """One resident FaceIndex per patient, loaded on first use and evicted LRU.
+
+    A lookup for a patient only scans that patient's contacts, so its cost
+    does not grow with the rest of the installation, and another family's
+    relatives can never match. Shards are evicted least recently used once
+    their arrays exceed `max_bytes`; the shard just used is always kept.
+    """
+
+    def __init__(self, loader: ShardLoader, max_bytes: int = face_shard_max_bytes):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._shards: 'OrderedDict[int, FaceIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[int, threading.Lock] = {}
+        # Writes that arrive while a patient's shard is loading, replayed before it is published
+        self._pending: Dict[int, List[Tuple[str, tuple]]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _evict(self, keep: int):
+        total = sum(shard.nbytes for shard in self._shards.values())
+        while total > self.max_bytes and len(self._shards) > 1:
+            patient_id, shard = next(iter(self._shards.items()))
+            if patient_id == keep:
+                self._shards.move_to_end(patient_id)
+                continue
+            self._shards.pop(patient_id)
+            total -= shard.nbytes
+            self._evictions += 1
+
+    def shard(self, patient_id: int) -> FaceIndex:
+        """The patient's shard, loading it if it is not resident"""
+        with self._lock:
+            shard = self._shards.get(patient_id)
+            if shard is not None:
+                self._shards.move_to_end(patient_id)
+                self._hits += 1
+                return shard
+            self._misses += 1
+            load_lock = self._load_locks.setdefault(patient_id, threading.Lock())
+
+        # Concurrent misses for one patient load it once; other patients are not blocked
+        with load_lock:
+            with self._lock:
+                shard = self._shards.get(patient_id)
+            if shard is None:
+                with self._lock:
+                    self._pending[patient_id] = []
+                try:
+                    shard = FaceIndex(initial_capacity=8)
+                    shard.load(*self.loader(patient_id))
+                    with self._lock:
+                        # Rows committed after the loader's SELECT reach the shard through these
+                        for method, args in self._pending[patient_id]:
+                            getattr(shard, method)(*args)
+                        self._shards[patient_id] = shard
+                        self._evict(keep=patient_id)
+                        self._load_locks.pop(patient_id, None)
+                finally:
+                    with self._lock:
+                        self._pending.pop(patient_id, None)
+            return shard
+
+    def _apply(self, patient_id: int, method: str, *args):
+        """Apply a write to the patient's resident shard, or queue it while the shard is loading"""
+        with self._lock:
+            shard = self._shards.get(patient_id)
+            if shard is None:
+                if patient_id in self._pending:
+                    self._pending[patient_id].append((method, args))
+                return
+        getattr(shard, method)(*args)
+
+    def search_batch(self, patient_id: int, face_embeddings: np.ndarray,
+                     threshold: float = 0.55, k: int = 5) -> List[List[Dict]]:
+        return self.shard(patient_id).search_batch(face_embeddings, threshold, k)
+
+    def add(self, patient_id: int, person_id: int, embedding: np.ndarray, metadata: Dict):
+        """Add a person to the patient's shard if it is resident or loading; otherwise the next load picks it up"""
+        self._apply(patient_id, 'add', person_id, embedding, metadata)
+
+    def upsert(self, patient_id: int, person_id: int, embedding: np.ndarray, metadata: Dict):
+        """Apply an insert or update to the patient's shard if it is resident or loading"""
+        self._apply(patient_id, 'upsert', person_id, embedding, metadata)
+
+    def remove(self, person_id: int, patient_id: Optional[int] = None):
+        """Drop a person from the patient's resident shard, or from any shard when no patient is given"""
+        with self._lock:
+            if patient_id is not None:
+                shards = [self._shards[patient_id]] if patient_id in self._shards else []
+                loading = [patient_id] if patient_id in self._pending else []
+            else:
+                shards = list(self._shards.values())
+                loading = list(self._pending)
+            for loading_patient in loading:
+                self._pending[loading_patient].append(('remove', (person_id,)))
+        for shard in shards:
+            if shard.remove(person_id):
+                return
+
+    def invalidate(self, patient_id: int):
+        with self._lock:
+            self._shards.pop(patient_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._shards.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'shards': len(self._shards),
+                'people': sum(len(shard) for shard in self._shards.values()),
+                'bytes': sum(shard.nbytes for shard in self._shards.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions
+            }
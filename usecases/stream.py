@@ -1,14 +1,12 @@
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
-import cv2
-import numpy as np
-from ultralytics import YOLO
-import base64
-import threading
+from usecases.multi_stream import MultiStreamManager
+from usecases.model_registry import model_registry, YOLO_MODEL
+from utilities.constants import warm_models_on_startup
+import struct
 import asyncio
 import logging
-import queue
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -68,8 +66,13 @@ HTML_CONTENT = """
             const img = document.getElementById('video-stream');
             let ws;
             
+            let frameUrl = null;
+            
             function connect() {
-                ws = new WebSocket("ws://" + window.location.host + "/ws");
+                // ?camera=<id> picks a camera; otherwise the first one is shown
+                const camera = new URLSearchParams(window.location.search).get("camera");
+                ws = new WebSocket("ws://" + window.location.host + (camera ? "/ws/" + camera : "/ws"));
+                ws.binaryType = "arraybuffer";
                 
                 ws.onopen = function() {
                     statusDiv.textContent = 'Connected';
@@ -88,7 +91,15 @@ HTML_CONTENT = """
                 };
                 
                 ws.onmessage = function(event) {
-                    img.src = "data:image/jpeg;base64," + event.data;
+                    // 8-byte big-endian sequence number, then the JPEG bytes
+                    const seq = new DataView(event.data).getBigUint64(0);
+                    const blob = new Blob([new Uint8Array(event.data, 8)], {type: "image/jpeg"});
+                    if (frameUrl) {
+                        URL.revokeObjectURL(frameUrl);
+                    }
+                    frameUrl = URL.createObjectURL(blob);
+                    img.src = frameUrl;
+                    img.dataset.seq = seq.toString();
                 };
             }
             
@@ -98,144 +109,135 @@ HTML_CONTENT = """
 </html>
 """
 
-class DetectionStream:
+# Each binary message is an 8-byte big-endian frame sequence number followed by the JPEG
+FRAME_HEADER = struct.Struct('>Q')
+
+
+class ClientChannel:
+    """Latest-frame slot for one WebSocket client; a newer frame replaces an unsent one"""
+
     def __init__(self):
-        self.model = YOLO('models/yolov8n.pt')
-        self.frame_queue = queue.Queue(maxsize=10)
-        self.processed_frame = None
-        self.running = True
-        self.lock = threading.Lock()
-        
-        # Configure logging
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
-
-    def list_cameras(self):
-        """List all available cameras"""
-        available_cameras = []
-        for i in range(10):
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                ret, _ = cap.read()
-                if ret:
-                    available_cameras.append(i)
-                cap.release()
-        return available_cameras
-
-    def capture_frames(self):
-        """Capture frames from camera"""
-        cameras = self.list_cameras()
-        if not cameras:
-            self.logger.error("No cameras found!")
-            return
-
-        cap = cv2.VideoCapture(cameras[0])
-        
-        # Set lower resolution for better performance
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        
-        self.logger.info(f"Started capture on camera {cameras[0]}")
-
-        try:
-            while self.running:
-                ret, frame = cap.read()
-                if ret:
-                    # Resize frame for better performance
-                    frame = cv2.resize(frame, (640, 480))
-                    
-                    if self.frame_queue.full():
-                        try:
-                            self.frame_queue.get_nowait()
-                        except queue.Empty:
-                            pass
-                    self.frame_queue.put(frame)
-                else:
-                    self.logger.warning("Failed to capture frame")
-                    break
-        finally:
-            cap.release()
-
-    def process_frames(self):
-        """Process frames with YOLO detection"""
-        while self.running:
-            try:
-                frame = self.frame_queue.get(timeout=1)
-                
-                # Run YOLO detection
-                results = self.model(frame)
-                
-                # Draw results on frame
-                annotated_frame = results[0].plot()
-                
-                # Convert to smaller JPEG for faster transmission
-                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
-                _, buffer = cv2.imencode('.jpg', annotated_frame, encode_param)
-                
-                # Update processed frame
-                with self.lock:
-                    self.processed_frame = buffer
-                    
-            except queue.Empty:
-                continue
-            except Exception as e:
-                self.logger.error(f"Error processing frame: {e}")
-
-    def get_latest_frame(self):
-        """Get the latest processed frame"""
-        with self.lock:
-            return self.processed_frame
-
-    def start(self):
-        """Start the detection stream"""
-        self.capture_thread = threading.Thread(target=self.capture_frames)
-        self.process_thread = threading.Thread(target=self.process_frames)
-        
-        self.capture_thread.start()
-        self.process_thread.start()
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, message: bytes):
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = message
+        self.ready.set()
+
+    async def next_message(self) -> bytes:
+        await self.ready.wait()
+        self.ready.clear()
+        message, self.pending = self.pending, None
+        return message
+
 
-    def stop(self):
-        """Stop the detection stream"""
-        self.running = False
-        if hasattr(self, 'capture_thread'):
-            self.capture_thread.join()
-        if hasattr(self, 'process_thread'):
-            self.process_thread.join()
+class FrameBroadcaster:
+    """Fans out each processed frame, encoded once, to every connected client.
 
-# Create detection stream instance
-detection_stream = DetectionStream()
+    Runs on the event loop. Slow clients never queue frames: each keeps only
+    the newest unsent frame and the rest are counted as dropped.
+    """
+
+    def __init__(self):
+        self.clients = set()
+        self.frames_published = 0
+
+    def publish(self, seq: int, jpeg_bytes: bytes):
+        message = FRAME_HEADER.pack(seq) + jpeg_bytes
+        self.frames_published += 1
+        for client in self.clients:
+            client.offer(message)
+
+    def stats(self):
+        return {
+            "clients": len(self.clients),
+            "frames_published": self.frames_published,
+            "frames_sent": sum(client.sent for client in self.clients),
+            "frames_dropped": sum(client.dropped for client in self.clients)
+        }
+
+
+# Create the multi-camera stream and one broadcaster per camera
+stream_manager = MultiStreamManager.from_config()
+broadcasters = {camera_id: FrameBroadcaster() for camera_id in stream_manager.cameras}
 
 @app.on_event("startup")
 async def startup_event():
     """Start the detection stream when the app starts"""
-    detection_stream.start()
+    if warm_models_on_startup:
+        model_registry.warmup(YOLO_MODEL)
+
+    # Hand frames from the processing thread to the event loop as they are produced
+    loop = asyncio.get_running_loop()
+    stream_manager.add_frame_listener(
+        lambda camera_id, seq, jpeg_bytes: loop.call_soon_threadsafe(
+            broadcasters[camera_id].publish, seq, jpeg_bytes)
+    )
+    stream_manager.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop the detection stream when the app shuts down"""
-    detection_stream.stop()
+    stream_manager.stop()
 
 @app.get("/", response_class=HTMLResponse)
 async def get_index():
     """Serve the HTML page"""
     return HTMLResponse(content=HTML_CONTENT)
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for streaming video"""
+@app.get("/cameras")
+async def get_cameras():
+    """Configured camera ids and their sources"""
+    return {camera_id: str(camera.source) for camera_id, camera in stream_manager.cameras.items()}
+
+@app.get("/stats")
+async def get_stats():
+    """Detection scheduler state plus frames published, sent and dropped per camera"""
+    return {
+        "detection": stream_manager.stats(),
+        "clients": {camera_id: broadcaster.stats() for camera_id, broadcaster in broadcasters.items()}
+    }
+
+async def stream_camera(websocket: WebSocket, camera_id: str):
+    """Send binary JPEG frames with a sequence number for one camera until the client leaves"""
     await websocket.accept()
-    
+    broadcaster = broadcasters.get(camera_id)
+    if broadcaster is None:
+        await websocket.close(code=4404, reason=f"Unknown camera {camera_id}")
+        return
+
+    client = ClientChannel()
+    broadcaster.clients.add(client)
     try:
+        # Start from the current frame so a new client does not wait for the next one
+        seq, frame_data = stream_manager.latest_frame(camera_id)
+        if frame_data is not None:
+            client.offer(FRAME_HEADER.pack(seq) + frame_data)
+
         while True:
-            frame_data = detection_stream.get_latest_frame()
-            if frame_data is not None:
-                # Send the JPEG buffer directly
-                await websocket.send_text(base64.b64encode(frame_data).decode('utf-8'))
-            await asyncio.sleep(0.033)  # ~30 FPS
+            message = await client.next_message()
+            await websocket.send_bytes(message)
+            client.sent += 1
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        logging.error(f"WebSocket error: {e}")
+        logging.error(f"WebSocket error on {camera_id}: {e}")
     finally:
-        await websocket.close()
+        broadcaster.clients.discard(client)
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    """WebSocket endpoint for the first configured camera"""
+    await stream_camera(websocket, next(iter(broadcasters), ''))
+
+@app.websocket("/ws/{camera_id}")
+async def camera_websocket_endpoint(websocket: WebSocket, camera_id: str):
+    """WebSocket endpoint for one camera"""
+    await stream_camera(websocket, camera_id)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,12 +1,114 @@
 import os
+import tomllib
 from dotenv import load_dotenv
 
 load_dotenv()
 
+PYPROJECT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pyproject.toml')
+
+with open(PYPROJECT_PATH, "rb") as f:
+    project_version = tomllib.load(f)['tool']['poetry']['version']
+
 gemini_url = os.environ.get('GEMINI_URL')
 anthropic_key = os.environ.get('ANTHROPIC_API_KEY')
 gemini_api_key = os.environ.get("GEMINI_API_KEY")
 
 db_password = os.environ.get('DB_PASSWORD')
 
-db_user = os.environ.get('DB_USER')
\ No newline at end of file
+db_user = os.environ.get('DB_USER')
+
+db_pool_min_size = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+db_pool_max_size = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+db_pool_checkout_timeout = float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT', 30))
+db_pool_health_check_interval = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+
+db_host = os.environ.get('DB_HOST', '34.42.252.84')
+db_port = int(os.environ.get('DB_PORT', 5432))
+
+# Face lookup backend: "memory" (resident index) or "pgvector" (ANN in Postgres)
+face_search_backend = os.environ.get('FACE_SEARCH_BACKEND', 'memory')
+hnsw_ef_search = int(os.environ.get('HNSW_EF_SEARCH', 40))
+vector_backfill_batch_size = int(os.environ.get('VECTOR_BACKFILL_BATCH_SIZE', 500))
+
+yolo_model_path = os.environ.get('YOLO_MODEL_PATH', 'models/yolov8n.pt')
+warm_models_on_startup = os.environ.get('WARM_MODELS_ON_STARTUP', 'false').lower() == 'true'
+admin_token = os.environ.get('ADMIN_TOKEN')
+
+enrollment_workers = int(os.environ.get('ENROLLMENT_WORKERS', os.cpu_count() or 1))
+bulk_enrollment_max_bytes = int(os.environ.get('BULK_ENROLLMENT_MAX_BYTES', 200 * 1024 * 1024))
+bulk_enrollment_max_image_bytes = int(os.environ.get('BULK_ENROLLMENT_MAX_IMAGE_BYTES', 20 * 1024 * 1024))
+
+# Face detection in /live_detection: "cascade" (inside YOLO person boxes) or "full" (whole frame)
+face_detection_mode = os.environ.get('FACE_DETECTION_MODE', 'cascade')
+person_box_padding = float(os.environ.get('PERSON_BOX_PADDING', 0.15))
+
+llm_api_url = os.environ.get(
+    'LLM_API_URL',
+    'https://recallme-flask-service-1031256824093.us-central1.run.app/recall-svc/api/v1/reinforce_memory/gemini-media-inference'
+)
+llm_pool_size = int(os.environ.get('LLM_POOL_SIZE', 10))
+llm_max_concurrency = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+llm_connect_timeout = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+llm_read_timeout = float(os.environ.get('LLM_READ_TIMEOUT', 60))
+llm_max_retries = int(os.environ.get('LLM_MAX_RETRIES', 2))
+llm_backoff_base = float(os.environ.get('LLM_BACKOFF_BASE', 0.5))
+llm_backoff_max = float(os.environ.get('LLM_BACKOFF_MAX', 8))
+
+# Comma-separated endpoint names with an optional TTL in seconds, e.g. "live_detection:300,detect_unknown_face"
+llm_cache_endpoints = os.environ.get('LLM_CACHE_ENDPOINTS', 'live_detection:300,detect_unknown_face:300')
+llm_cache_max_entries = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 256))
+# Directory for the on-disk cache store; unset keeps the cache in memory only
+llm_cache_dir = os.environ.get('LLM_CACHE_DIR')
+
+# /live_detection only calls the LLM when the scene changes or the cooldown expires
+scene_cooldown_seconds = float(os.environ.get('SCENE_COOLDOWN_SECONDS', 30))
+scene_object_change_threshold = float(os.environ.get('SCENE_OBJECT_CHANGE_THRESHOLD', 0.5))
+scene_session_ttl_seconds = float(os.environ.get('SCENE_SESSION_TTL_SECONDS', 600))
+scene_max_sessions = int(os.environ.get('SCENE_MAX_SESSIONS', 1000))
+
+# Temporal face tracking in /live_detection: reuse identities of stable faces between encodes
+face_tracking_enabled = os.environ.get('FACE_TRACKING_ENABLED', 'true').lower() == 'true'
+face_track_iou_threshold = float(os.environ.get('FACE_TRACK_IOU_THRESHOLD', 0.3))
+face_track_refresh_seconds = float(os.environ.get('FACE_TRACK_REFRESH_SECONDS', 5))
+face_track_max_missing_seconds = float(os.environ.get('FACE_TRACK_MAX_MISSING_SECONDS', 3))
+
+# Adaptive detection stream: target capture-to-encode latency and how far the scheduler may back off
+stream_latency_budget_ms = float(os.environ.get('STREAM_LATENCY_BUDGET_MS', 150))
+stream_max_detect_interval = int(os.environ.get('STREAM_MAX_DETECT_INTERVAL', 6))
+# Descending YOLO input sizes the scheduler steps through; a single value disables imgsz adaptation
+stream_imgsz_steps = [int(size) for size in os.environ.get('STREAM_IMGSZ_STEPS', '640,480,320').split(',')]
+
+# Cameras for the multi-camera stream: comma-separated "id=source" or bare sources
+# (device index, video file path or RTSP URL); unset uses the first local camera
+stream_sources = os.environ.get('STREAM_SOURCES', '')
+
+# Worker processes for /live_detection inference; 0 runs YOLO and face encoding in the request thread
+inference_workers = int(os.environ.get('INFERENCE_WORKERS', 0))
+inference_timeout = float(os.environ.get('INFERENCE_TIMEOUT', 30))
+
+# Threads the ASGI service uses for CPU-bound frame analysis
+asgi_cpu_workers = int(os.environ.get('ASGI_CPU_WORKERS', os.cpu_count() or 4))
+
+# Patient-scoped lookups: memory cap for the resident per-patient embedding shards
+face_shard_max_bytes = int(float(os.environ.get('FACE_SHARD_MAX_MB', 256)) * 1024 * 1024)
+
+# Change feed: apply people inserts/updates/deletes from other replicas to the in-memory indexes
+change_feed_enabled = os.environ.get('CHANGE_FEED_ENABLED', 'false').lower() == 'true'
+change_feed_poll_seconds = float(os.environ.get('CHANGE_FEED_POLL_SECONDS', 5))
+change_feed_batch_size = int(os.environ.get('CHANGE_FEED_BATCH_SIZE', 500))
+change_feed_retention_hours = float(os.environ.get('CHANGE_FEED_RETENTION_HOURS', 72))
+
+# Compact in-memory embeddings: none (float32), float16, int8 or pq (product quantization + exact rerank)
+face_index_quantization = os.environ.get('FACE_INDEX_QUANTIZATION', 'none')
+face_index_pq_subspaces = int(os.environ.get('FACE_INDEX_PQ_SUBSPACES', 32))
+# Candidates re-scored with exact embeddings before the threshold is applied
+face_index_rerank = int(os.environ.get('FACE_INDEX_RERANK', 64))
+# Modes whose lookups re-rank: float16/int8 distances stay close enough to exact that a database
+# round trip per lookup buys little recall, pq's coarser distances need it
+face_index_rerank_modes = [mode.strip() for mode in os.environ.get('FACE_INDEX_RERANK_MODES', 'pq').split(',')
+                           if mode.strip()]
+
+# python -m usecases.people_bulk: images encoded and copied per committed batch
+bulk_import_batch_size = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 256))
+# Snapshot from `python -m usecases.people_bulk export` used to warm the face index at startup
+face_index_snapshot = os.environ.get('FACE_INDEX_SNAPSHOT')
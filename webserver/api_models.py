@@ -1,5 +1,5 @@
 from flask_restx import fields
-from flask_restx import reqparse
+from flask_restx import reqparse, inputs
 from werkzeug.datastructures import FileStorage
 from webserver.extensions import api
 
@@ -15,15 +15,50 @@ add_face_parser.add_argument('last_name', type=str, required=True, help='Last na
 add_face_parser.add_argument('relationship', type=str, required=True, help='Relationship with the patient')
 add_face_parser.add_argument('personal_context', type=str, required=True, help='Mutual interest')
 add_face_parser.add_argument('image', type=FileStorage, location='files', required=True, help='Image file')
+add_face_parser.add_argument('patient_id', type=int, location='form', required=False,
+                             help='Existing patient the person belongs to; a new one is created if omitted')
+
+# Parser for /add_known_faces_bulk endpoint
+bulk_add_face_parser = reqparse.RequestParser()
+bulk_add_face_parser.add_argument('people', type=str, location='form', required=True,
+                                  help='JSON list of people: first_name, last_name, relationship, '
+                                       'personal_context and the image file names for each person '
+                                       '(paths inside the archive for zipped images)')
+bulk_add_face_parser.add_argument('images', type=FileStorage, location='files', action='append',
+                                  required=False, help='Image files referenced by the people list')
+bulk_add_face_parser.add_argument('archive', type=FileStorage, location='files', required=False,
+                                  help='Zip archive of image files referenced by the people list')
+bulk_add_face_parser.add_argument('average_embeddings', type=inputs.boolean, location='form', default=True,
+                                  help='Store one averaged embedding per person instead of one per photo')
+bulk_add_face_parser.add_argument('patient_id', type=int, location='form', required=True,
+                                  help='Existing patient the people belong to')
 
 # Parser for /detect_unknown_face endpoint
 detect_face_parser = reqparse.RequestParser()
 detect_face_parser.add_argument('image', type=FileStorage, location='files', required=True, help='Image file')
+detect_face_parser.add_argument('patient_id', type=int, location='form', required=False,
+                                help='Only match against this patient\'s people')
 
 live_detection_api_model = api.model('LiveDetection', {
     'frame': fields.String(
         required=True,
         description="Base64 encoded image frame from webcam",
         example="iVBORw0KGgoAAAANSUhEUgAA..."
+    ),
+    'session_id': fields.String(
+        required=False,
+        description="Client session id (or X-Session-Id header); the last message is reused while this "
+                    "session's scene is unchanged. Without one every frame gets a new message",
+        example="3f2b7c1e-living-room"
+    ),
+    'patient_id': fields.Integer(
+        required=False,
+        description="Only match faces against this patient's people",
+        example=1
     )
-})
\ No newline at end of file
+})
+
+reload_model_api_model = api.model('ReloadModel', {
+    'name': fields.String(required=False, description="Registered model name", example="yolov8n"),
+    'warm': fields.Boolean(required=False, default=True, description="Run a dummy inference after loading")
+})
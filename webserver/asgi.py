@@ -0,0 +1,230 @@
+"""Async (ASGI) service for the reinforce_memory endpoints.
+
+Serves the same routes under the same prefix as the Flask API, but an
+in-flight Gemini call no longer holds a worker thread: LLM calls and
+streams go through the client's httpx.AsyncClient. CPU-bound detection and
+encoding run in a bounded executor and database calls run in threads, so
+one process can serve many concurrent camera clients:
+
+    uvicorn webserver.asgi:app --host 0.0.0.0 --port 8081
+
+Interactive docs are served at /use-case-svc/api/v1/docs.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import APIRouter, FastAPI, File, Form, Header, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from werkzeug.utils import secure_filename
+
+from usecases.change_feed import ChangeFeed
+from usecases.people_bulk import warm_face_index
+from usecases.face_database import FaceDatabase
+from usecases.face_identification import add_person_from_image
+from usecases.face_prompt_llm import generate_message_with_llm_async
+from usecases.face_tracker import SessionFaceTrackers
+from usecases.inference_pool import inference_pool
+from usecases.live_detection import timed
+from usecases.live_service import LiveDetectionService, LiveFrame
+from usecases.llm_cache import llm_caches
+from usecases.llm_client import llm_client
+from usecases.metrics import metrics, observe_timings, request_seconds, requests_total
+from usecases.scene_state import SceneStateTracker
+from utilities.constants import asgi_cpu_workers, change_feed_enabled, face_index_snapshot, project_version
+
+API_VERSION = '/api/v1'
+CATALOG_MODULE = '/use-case-svc'
+CORE_PREFIX = CATALOG_MODULE + API_VERSION
+
+# Initialize components
+face_db = FaceDatabase()
+scene_tracker = SceneStateTracker()
+face_trackers = SessionFaceTrackers()
+live_service = LiveDetectionService(face_db, scene_tracker, face_trackers)
+change_feed = ChangeFeed(face_db)
+# Bounded so a burst of frames queues instead of oversubscribing the CPU
+cpu_executor = ThreadPoolExecutor(max_workers=asgi_cpu_workers, thread_name_prefix='inference')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Lifespan events only run in server processes (each uvicorn/gunicorn worker), never in the
+    # inference pool's workers. Warm the face index from an exported snapshot, then follow changes
+    # made by other replicas
+    snapshot_position = warm_face_index(face_db, face_index_snapshot) if face_index_snapshot else None
+    if change_feed_enabled:
+        change_feed.start(from_position=snapshot_position)
+    yield
+    await llm_client.aclose()
+    change_feed.stop()
+    cpu_executor.shutdown(wait=False)
+    inference_pool.shutdown()
+    face_db.pool.close()
+
+
+app = FastAPI(
+    title='ReCallMe',
+    description='AI ATL Hackathon Project',
+    version=project_version,
+    docs_url=CORE_PREFIX + '/docs',
+    openapi_url=CORE_PREFIX + '/openapi.json',
+    lifespan=lifespan
+)
+
+
+@app.middleware('http')
+async def record_request(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route pattern, not raw path, to keep the series count bounded
+    route = request.scope.get('route')
+    endpoint = route.path if route is not None else 'unmatched'
+    status = str(response.status_code)
+    requests_total.inc(endpoint, request.method, status)
+    request_seconds.observe(time.perf_counter() - start, endpoint, request.method, status)
+    return response
+
+
+router = APIRouter(prefix=CORE_PREFIX + '/reinforce_memory', tags=['reinforce_memory'])
+
+
+class LiveDetectionRequest(BaseModel):
+    frame: str = Field(..., description="Base64 encoded image frame from webcam",
+                       examples=["iVBORw0KGgoAAAANSUhEUgAA..."])
+    session_id: Optional[str] = Field(None, description="Client session id (or X-Session-Id header); the last "
+                                                        "message is reused while this session's scene is "
+                                                        "unchanged. Without one every frame gets a new message",
+                                      examples=["3f2b7c1e-living-room"])
+    patient_id: Optional[int] = Field(None, description="Only match faces against this patient's people",
+                                      examples=[1])
+
+
+async def run_cpu(fn, *args):
+    """Run blocking inference in the CPU executor without blocking the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, fn, *args)
+
+
+def error_response(e: Exception, status_code: int = 500) -> JSONResponse:
+    return JSONResponse({"error": str(e)}, status_code=status_code)
+
+
+@router.post('/add_known_face')
+async def add_known_face(first_name: str = Form(..., description='First name of the person'),
+                         last_name: str = Form(..., description='Last name of the person'),
+                         relationship: str = Form(..., description='Relationship with the patient'),
+                         personal_context: str = Form(..., description='Mutual interest'),
+                         image: UploadFile = File(..., description='Image file'),
+                         patient_id: Optional[int] = Form(None, description='Existing patient the person belongs '
+                                                                            'to; a new one is created if omitted')):
+    """Add a known face to the database"""
+    try:
+        image_bytes = await image.read()
+
+        # Create face embedding from image and add to DB
+        face_embedding = await run_cpu(add_person_from_image, image_bytes)
+        if patient_id is None:
+            patient_id = await asyncio.to_thread(face_db.add_patient, first_name, last_name)
+        person_id = await asyncio.to_thread(
+            face_db.add_person, patient_id, first_name, last_name, relationship, face_embedding, personal_context
+        )
+        return {"message": "Known face added", "person_id": person_id}
+    except Exception as e:
+        return error_response(e)
+
+
+@router.post('/detect_unknown_face')
+async def detect_unknown_face(image: UploadFile = File(..., description='Image file'),
+                              patient_id: Optional[int] = Form(None, description="Only match against this "
+                                                                                  "patient's people")):
+    """Detect an unknown face and match it with known faces"""
+    try:
+        image_filename = secure_filename(image.filename or '') or 'upload.jpg'
+        image_bytes = await image.read()
+
+        # Generate face embedding for unknown face
+        timings = {}
+        with timed(timings, 'face_encode'):
+            face_embedding = await run_cpu(add_person_from_image, image_bytes)
+        with timed(timings, 'db_match'):
+            similar_faces = await asyncio.to_thread(face_db.find_similar_face, face_embedding, 0.55, patient_id)
+
+        if not similar_faces:
+            observe_timings('detect_unknown_face', timings)
+            return {"message": "No similar faces found"}
+
+        best_match = similar_faces[0]
+        context = {
+            "name": best_match['first_name'],
+            "relation": best_match['relationship'],
+            "personal_information": best_match.get('personal context') or ''
+        }
+        with timed(timings, 'llm'):
+            llm_response = await generate_message_with_llm_async(
+                image_bytes, context, filename=image_filename,
+                cache=llm_caches.get('detect_unknown_face'), person_ids=[best_match['id']]
+            )
+        observe_timings('detect_unknown_face', timings)
+        return llm_response
+    except Exception as e:
+        return error_response(e)
+
+
+async def analyze_live_request(body: LiveDetectionRequest, x_session_id: Optional[str]) -> LiveFrame:
+    """Analyze a live frame in the CPU executor and look up the session's last message.
+
+    Only an explicit session id (body or X-Session-Id) enables scene gating and face tracking.
+    """
+    return await run_cpu(live_service.analyze, body.frame, body.session_id or x_session_id, body.patient_id)
+
+
+@router.post('/live_detection')
+async def live_detection(body: LiveDetectionRequest,
+                         x_session_id: Optional[str] = Header(None)):
+    """Process a single frame from the live webcam feed"""
+    if not body.frame:
+        return error_response(ValueError("No frame data provided"), 400)
+    try:
+        live = await analyze_live_request(body, x_session_id)
+        response = await live_service.message_async(live)
+        live.observe('live_detection')
+        return live.payload(response)
+    except Exception as e:
+        return error_response(e)
+
+
+@router.post('/live_detection/stream')
+async def live_detection_stream(body: LiveDetectionRequest,
+                                x_session_id: Optional[str] = Header(None)):
+    """Process a live frame and stream the LLM message as server-sent events.
+
+    Events: `analysis` (identified people, objects, scene_changed), then one
+    `token` per text fragment as it is generated, then `done` with the full
+    message, or `error`.
+    """
+    if not body.frame:
+        return error_response(ValueError("No frame data provided"), 400)
+    try:
+        live = await analyze_live_request(body, x_session_id)
+    except Exception as e:
+        return error_response(e)
+
+    return StreamingResponse(live_service.stream_async(live), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+app.include_router(router)
+
+
+@app.get('/check-alive')
+async def check_status():
+    return "I am here"
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
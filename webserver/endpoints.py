@@ -1,32 +1,64 @@
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, Response, stream_with_context
 from flask_restx import Resource
-from webserver.api_models import multiply_api_model, add_face_parser, detect_face_parser, live_detection_api_model
+from webserver.api_models import (multiply_api_model, add_face_parser, bulk_add_face_parser, detect_face_parser,
+                                  live_detection_api_model, reload_model_api_model)
 from webserver.extensions import api
 from flask_swagger_ui import get_swaggerui_blueprint
 import os
-import base64
-import requests
+import json
+import zipfile
 from usecases.face_database import FaceDatabase
 from usecases.face_identification import add_person_from_image
-import os
+from usecases.live_detection import timed
+from usecases.live_service import LiveDetectionService
+from usecases.bulk_enrollment import enroll_people, read_images_from_archive
 from werkzeug.utils import secure_filename
-import cv2
-from ultralytics import YOLO
-from usecases.face_prompt_llm import generate_message_with_llm, assist_dementia_patient
-from usecases.face_database import FaceDatabase
-import face_recognition
-import numpy as np
+from usecases.face_prompt_llm import generate_message_with_llm
+from usecases.llm_cache import llm_caches
+from usecases.scene_state import SceneStateTracker
+from usecases.face_tracker import SessionFaceTrackers
+from usecases.model_registry import model_registry, YOLO_MODEL
+from usecases.inference_pool import inference_pool
+from usecases.change_feed import ChangeFeed
+from usecases.people_bulk import warm_face_index
+from usecases.metrics import metrics, observe_timings, stats_collector
+from utilities.constants import admin_token, change_feed_enabled, face_index_snapshot
 
 # Initialize components
 face_db = FaceDatabase()
-
-# Define the temporary directory
-TEMP_DIR = 'tmp'
-
-# Create the directory if it doesn't exist
-if not os.path.exists(TEMP_DIR):
-    os.makedirs(TEMP_DIR)
-
+scene_tracker = SceneStateTracker()
+face_trackers = SessionFaceTrackers()
+live_service = LiveDetectionService(face_db, scene_tracker, face_trackers)
+
+change_feed = ChangeFeed(face_db)
+
+
+def start_face_index_sync():
+    """Warm the face index from an exported snapshot, then follow people changes made by other replicas.
+
+    Called by the app factory of each serving process (including every WSGI worker); tools that only
+    need the routes, such as the benchmarks, leave it out.
+    """
+    snapshot_position = warm_face_index(face_db, face_index_snapshot) if face_index_snapshot else None
+    if change_feed_enabled:
+        change_feed.start(from_position=snapshot_position)
+
+
+# Component stats exposed as gauges on /metrics
+metrics.register_collector(stats_collector('db_pool', 'Database connection pool', face_db.pool.stats))
+metrics.register_collector(stats_collector('face_shards', 'Per-patient face shards', face_db.patient_shards.stats))
+metrics.register_collector(stats_collector('change_feed', 'People change feed', change_feed.stats))
+metrics.register_collector(stats_collector('scene_state', 'Scene change gating', scene_tracker.stats))
+metrics.register_collector(stats_collector('face_tracking', 'Face tracking', face_trackers.stats))
+metrics.register_collector(stats_collector('inference_pool', 'Inference worker pool', inference_pool.stats))
+for cache_name, llm_cache in llm_caches.items():
+    metrics.register_collector(stats_collector('llm_cache', 'LLM response cache', llm_cache.stats,
+                                               {'endpoint': cache_name}))
+metrics.register_collector(lambda: (
+    (f'model_{field}', f'Model registry: {field}', {'model': name}, float(value))
+    for name, model_stats in model_registry.stats().items()
+    for field, value in model_stats.items() if isinstance(value, (bool, int, float))
+))
 
 API_VERSION = '/api/v1'
 CATALOG_MODULE = '/use-case-svc'
@@ -61,6 +93,74 @@ class Multiply(Resource):
             return jsonify({"error": str(e)}), 500
 
 
+@recall_namespace.route('/db_pool_metrics')
+class DbPoolMetrics(Resource):
+    def get(self):
+        """Connection pool checkout counts and wait times"""
+        return face_db.pool.stats()
+
+
+@recall_namespace.route('/llm_cache_metrics')
+class LlmCacheMetrics(Resource):
+    def get(self):
+        """Hit/miss counters of the per-endpoint LLM response caches"""
+        return {name: cache.stats() for name, cache in llm_caches.items()}
+
+
+@recall_namespace.route('/scene_state_metrics')
+class SceneStateMetrics(Resource):
+    def get(self):
+        """How many /live_detection LLM calls the scene tracker skipped"""
+        return scene_tracker.stats()
+
+
+@recall_namespace.route('/face_tracking_metrics')
+class FaceTrackingMetrics(Resource):
+    def get(self):
+        """Face encodings per second and track hit rate in /live_detection"""
+        return face_trackers.stats()
+
+
+@recall_namespace.route('/inference_pool_metrics')
+class InferencePoolMetrics(Resource):
+    def get(self):
+        """Inference worker pool size, in-flight frames and average task time"""
+        return inference_pool.stats()
+
+
+@recall_namespace.route('/models')
+class Models(Resource):
+    def get(self):
+        """Load time and memory footprint of the shared models"""
+        return model_registry.stats()
+
+
+@recall_namespace.route('/models/reload')
+class ReloadModel(Resource):
+    @api.expect(reload_model_api_model)
+    def post(self):
+        """Reload a model from disk without restarting the service.
+
+        Reloads this process's copy and replaces the inference workers, which
+        load their own. Other WSGI worker processes keep their copy until they restart.
+        """
+        # Fails closed: without a configured ADMIN_TOKEN nobody may reload
+        if not admin_token or request.headers.get('X-Admin-Token') != admin_token:
+            return {"error": "Forbidden"}, 403
+        try:
+            data = request.json or {}
+            name = data.get('name', YOLO_MODEL)
+            warm = data.get('warm', True)
+            stats = model_registry.reload(name, warm=warm)
+            workers_recycled = inference_pool.recycle(warm=warm) if name == YOLO_MODEL else False
+            return {"message": "Model reloaded", "name": name, "stats": stats,
+                    "inference_workers_recycled": workers_recycled}
+        except KeyError as e:
+            return {"error": str(e)}, 404
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+
 @recall_namespace.route('/add_known_face')
 class AddKnownFace(Resource):
     @api.expect(add_face_parser)
@@ -74,27 +174,57 @@ class AddKnownFace(Resource):
             image_file = args['image']
             notes = args['personal_context']
 
-            # Save the uploaded image to a temporary location
-            image_filename = secure_filename(image_file.filename)
-            image_path = os.path.join(TEMP_DIR, image_filename)
-            image_file.save(image_path)
+            # Read the uploaded image into memory
+            image_bytes = image_file.read()
 
             # Create face embedding from image and add to DB
-            face_embedding = add_person_from_image(image_path)
-            patient_id = face_db.add_patient(first_name, last_name)
+            face_embedding = add_person_from_image(image_bytes)
+            patient_id = args['patient_id']
+            if patient_id is None:
+                patient_id = face_db.add_patient(first_name, last_name)
             person_id = face_db.add_person(
                 patient_id, first_name, last_name, relationship, face_embedding, notes
             )
 
-            # Remove the temporary image file
-            os.remove(image_path)
-
             # Return data directly, not a Response object
             return {"message": "Known face added", "person_id": person_id}
         except Exception as e:
             return {"error": str(e)}, 500
 
 
+@recall_namespace.route('/add_known_faces_bulk')
+class AddKnownFacesBulk(Resource):
+    @api.expect(bulk_add_face_parser)
+    def post(self):
+        """Enroll one or more people from many images (or a zip) in one request"""
+        try:
+            args = bulk_add_face_parser.parse_args()
+            people = json.loads(args['people'])
+            if isinstance(people, dict):
+                people = [people]
+
+            # Collect every uploaded image in memory, keyed by file name (archive path for zipped ones)
+            images = {}
+            if args['archive'] is not None:
+                images.update(read_images_from_archive(args['archive'].read()))
+            for image_file in args['images'] or []:
+                name = os.path.basename(image_file.filename)
+                if name in images:
+                    raise ValueError(f"Image {name} was uploaded more than once")
+                images[name] = image_file.read()
+
+            result = enroll_people(
+                face_db, people, images,
+                patient_id=args['patient_id'],
+                average_embeddings=args['average_embeddings']
+            )
+            return {"message": "Known faces added", **result}
+        except (ValueError, zipfile.BadZipFile) as e:
+            return {"error": str(e)}, 400
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+
 @recall_namespace.route('/detect_unknown_face')
 class DetectUnknownFace(Resource):
     @api.expect(detect_face_parser)
@@ -104,39 +234,38 @@ class DetectUnknownFace(Resource):
             args = detect_face_parser.parse_args()
             image_file = args['image']
 
-            # Save the uploaded image to a temporary location
-            image_filename = secure_filename(image_file.filename)
-            image_path = os.path.join(TEMP_DIR, image_filename)
-            image_file.save(image_path)
+            # Read the uploaded image into memory
+            image_filename = secure_filename(image_file.filename) or 'upload.jpg'
+            image_bytes = image_file.read()
 
             # Generate face embedding for unknown face
-            face_embedding = add_person_from_image(image_path)
-            similar_faces = face_db.find_similar_face(face_embedding)
+            timings = {}
+            with timed(timings, 'face_encode'):
+                face_embedding = add_person_from_image(image_bytes)
+            with timed(timings, 'db_match'):
+                similar_faces = face_db.find_similar_face(face_embedding, patient_id=args['patient_id'])
 
             if similar_faces:
                 best_match = similar_faces[0]
                 context = {
                     "name": best_match['first_name'],
                     "relation": best_match['relationship'],
-                    "personal_information": best_match.get('notes', '')
+                    "personal_information": best_match.get('personal context') or ''
                 }
 
                 # Generate the message using the LLM
-                llm_response = generate_message_with_llm(image_path, context)
-
-                # Remove the temporary image file
-                os.remove(image_path)
+                with timed(timings, 'llm'):
+                    llm_response = generate_message_with_llm(
+                        image_bytes, context, filename=image_filename,
+                        cache=llm_caches.get('detect_unknown_face'), person_ids=[best_match['id']]
+                    )
+                observe_timings('detect_unknown_face', timings)
 
                 return llm_response
             else:
-                # Remove the temporary image file
-                os.remove(image_path)
+                observe_timings('detect_unknown_face', timings)
                 return {"message": "No similar faces found"}
         except Exception as e:
-            # if image_path:
-            #     # Remove the temporary image file if it exists
-            #     if os.path.exists(image_path):
-            #         os.remove(image_path)
             return {"error": str(e)}, 500
 
 
@@ -161,6 +290,15 @@ class DetectUnknownFace(Resource):
 #         detection_stream.stop()
 #         return jsonify({"error": "No frame available"}), 404
 
+def analyze_live_request(data):
+    """Decode and analyze a live frame, and look up the session's last message.
+
+    Only an explicit session id (body or X-Session-Id) enables scene gating and face tracking.
+    """
+    session_id = data.get("session_id") or request.headers.get('X-Session-Id')
+    return live_service.analyze(data["frame"], session_id, data.get("patient_id"))
+
+
 @recall_namespace.route('/live_detection')
 class LiveDetection(Resource):
     @api.expect(live_detection_api_model)
@@ -175,74 +313,35 @@ class LiveDetection(Resource):
             if not frame_data:
                 return {"error": "No frame data provided"}, 400
 
-            # Decode the base64 frame
-            frame_bytes = base64.b64decode(frame_data)
-            np_frame = np.frombuffer(frame_bytes, np.uint8)
-            frame = cv2.imdecode(np_frame, cv2.IMREAD_COLOR)
-
-            # Run YOLO prediction for object detection
-            model = YOLO('models/yolov8n.pt')
-            results = model.predict(frame, imgsz=640)
-            result = results[0]  # Process the first result
-            model_names = model.names
-
-            # Extract detected objects
-            boxes = result.boxes
-            detected_objects = []
-            if boxes is not None and len(boxes) > 0:
-                cls_indices = boxes.cls.cpu().numpy().astype(int)
-                detected_objects = [model_names[i] for i in cls_indices]
-
-            # Filter sensitive words and prepare the context
-            filtered_objects = filter_sensitive_words(detected_objects)
-            context = {'objects': filtered_objects}
-            image_path = 'current_frame.jpg'
-            cv2.imwrite(image_path, frame)
-
-            # Check if a face is among the detected objects
-            detected_faces = 'person' in detected_objects
-            if detected_faces:
-                # Detect and encode faces
-                face_locations = face_recognition.face_locations(frame)
-                face_encodings = face_recognition.face_encodings(frame, face_locations)
-
-                if face_encodings:
-                    face_embedding = face_encodings[0]
-                    similar_faces = face_db.find_similar_face(face_embedding)
-
-                    if similar_faces:
-                        matched_face = similar_faces[0]
-                        context = {
-                            "name": f"{matched_face['first_name']} {matched_face['last_name']}",
-                            "relation": matched_face['relationship'],
-                            "personal_information": matched_face.get('notes', '')
-                        }
-                    else:
-                        context = {
-                            "name": "an unfamiliar person",
-                            "relation": "unknown",
-                            "personal_information": "No additional information available."
-                        }
-
-                    # Generate message using the context for a detected face
-                    response = generate_message_with_llm(image_path, context)
-                else:
-                    # No face encodings found
-                    context = {
-                        "name": "a person",
-                        "relation": "unknown",
-                        "personal_information": "No additional information available."
-                    }
-                    response = assist_dementia_patient(image_path, context)
-            else:
-                # Generate message for non-face frames
-                response = assist_dementia_patient(image_path, context)
+            live = analyze_live_request(data)
+            response = live_service.message(live)
+
+            with timed(live.timings, 'serialize'):
+                response = jsonify(live.payload(response))
+            live.observe('live_detection')
+            return response
+        except Exception as e:
+            return {"error": str(e)}, 500
+
 
-            return jsonify(response)
+@recall_namespace.route('/live_detection/stream')
+class LiveDetectionStream(Resource):
+    @api.expect(live_detection_api_model)
+    def post(self):
+        """Process a live frame and stream the LLM message as server-sent events.
+
+        Events: `analysis` (identified people, objects, scene_changed), then one
+        `token` per text fragment as it is generated, then `done` with the full
+        message, or `error`.
+        """
+        data = request.json or {}
+        if not data.get("frame"):
+            return {"error": "No frame data provided"}, 400
+
+        try:
+            live = analyze_live_request(data)
         except Exception as e:
             return {"error": str(e)}, 500
 
-def filter_sensitive_words(detected_objects):
-    sensitive_words = {'toilet', 'bathroom', 'weapon', 'knife', 'gun'}  # Add more words as needed
-    filtered_objects = [obj for obj in detected_objects if obj.lower() not in sensitive_words]
-    return filtered_objects
\ No newline at end of file
+        return Response(stream_with_context(live_service.stream(live)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -1,9 +1,5 @@
-import tomllib
-
 from flask_restx import Api
 
-with open("pyproject.toml", "rb") as f:
-    data = tomllib.load(f)
-
-api = Api(version=data['tool']['poetry']['version'], title='ReCallMe', description='AI ATL Hackathon Project')
+from utilities.constants import project_version
 
+api = Api(version=project_version, title='ReCallMe', description='AI ATL Hackathon Project')